@@ -26,7 +26,7 @@ if errorlevel 1 (
 
 	cd ..
 
-	call python !cur_dir!\checkDevNet.py %virt_env%
+	call python !cur_dir!\checkDevNet.py %*
 
 	echo.
 	echo Python script finished execution
@@ -19,18 +19,70 @@ import platform
 import sys
 
 # Used for interacting with OS shell
-import subprocess
 import os
+import shell
+from shell import run_cmd, run_cmds, run_cmd_cached, run_cmds_cached, invalidate_cmd_cache
+
+# Used for checking files and folders without a shell
+import fsprobe
+
+# Used for checking installed Python packages without running pip
+import inventory
+
+# Used for caching compiled wheels between virtual environments
+import wheelcache
+
+# Used for reading requirements and lockfiles
+import lockfile
+
+# Used for cloning virtual environments from a provisioned template
+import virtenv
+import shutil
+import zipfile
+
+# Used for skipping checks when nothing has changed since the last successful run
+import fingerprint
+
+# Used for cloning and pulling the code samples repository
+import gitrepo
+
+# Used for picking the fastest package index and git remote
+import mirrors
+
+# Used for reusing the Spark room between runs
+import roomindex
+
+# Used for running independent checks at the same time
+import scheduler
 
 # Used for checking network connectivity
 import socket
 
+# Concurrent endpoint probe requires Python 3.5+, fall back to check_network
+try:
+	import netprobe
+except (ImportError, SyntaxError):
+	netprobe = None
+
 # Used for logging
 import time
 
+# Used for timing checks and shell commands
+import tracing
+import atexit
+
+# Used for parsing command line arguments
+import argparse
+
 # Used for parsing Spark REST API responses
 import json
 
+# Used for reading the wheelhouse index URL
+try:
+	from urllib.parse import urlsplit
+except ImportError:
+	from urlparse import urlsplit
+
 
 
 #####################################################################
@@ -47,9 +99,22 @@ userPython = sys.version_info
 # SPARK TOKEN
 SPARK_TOKEN = ""		## Paste your Cisco Spark Token here
 
+# Spark room checked by every run, reused while its id is in the room index
+SPARK_ROOM_TITLE = "Devnet Express v2 Preparation Script"
+SPARK_ROOM_INDEX = roomindex.default_index_file()
+SPARK_ROOM_TTL = roomindex.DEFAULT_TTL
+
 # GIT
 GIT_REPO = "https://github.com/CiscoDevNet/devnet-express-code-samples.git"
 
+# Code samples clone strategy (full, shallow, blobless, reference or mirror, see gitrepo.py)
+GIT_CLONE_STRATEGY = "blobless"
+GIT_CLONE_DEPTH = 1
+GIT_MIRROR = ""		## i.e. "/mnt/share/devnet-express-code-samples.git" or "git://10.10.20.5/devnet-express-code-samples.git"
+
+# Track manifest listing the repository folders to check out, "" checks out the whole tree
+GIT_TRACK_MANIFEST = ""
+
 # Logging
 log_file = time.strftime("%Y%m%d%H%M%S") + "_check_devnet_log.txt"
 verbose_logging = False
@@ -58,62 +123,77 @@ verbose_logging = False
 REMOTE_SERVER = "pypi.python.org"
 REMOTE_PORT = 443
 
+# Seconds allowed for resolving and connecting to each endpoint
+NETWORK_TIMEOUT = 3
+
+# Cisco Spark API host, probed when a Spark token is set
+SPARK_API_HOST = "api.ciscospark.com"
+
+# Default TCP port of each URL scheme
+url_scheme_ports = {"https": 443, "http": 80, "git": 9418, "ssh": 22}
+
+# Network benchmark (--netbench), samples per endpoint and the download timed for throughput
+NETBENCH_SAMPLES = 20
+NETBENCH_URL = ""		## i.e. a large wheel on the room wheelhouse or package index
+
 # Remediate Action
 REMEDIATION = False
 
+# Maximum number of independent shell commands run at the same time
+MAX_CONCURRENCY = 4
 
+# Maximum number of checks run at the same time, 1 runs them one after another
+CHECK_WORKERS = 4
 
-#####################################################################
-#						Function Definitions						#
-#####################################################################
+# Seconds before a shell command is stopped, and a shorter limit for --version probes
+CMD_TIMEOUT = 900
+PROBE_TIMEOUT = 30
 
-"""
-Function: 		run_cmd
+# Command cache tags, dropped when pip installs or git clones/pulls change the output
+PIP_INVENTORY_TAG = "pip-inventory"
+GIT_WORKTREE_TAG = "git-worktree"
 
-Description:	Used to send commands to underlying os shell.
-				This will be sent as a subprocess to a secondary shell.
-				Useful when os level operations are required.
+# Room wheelhouse (see 'checkDevNet.py wheelhouse'), preferred over the internet when reachable
+WHEELHOUSE_URL = ""		## i.e. "http://10.10.20.5:8080/simple/"
+WHEELHOUSE_DIR = ""		## i.e. a wheelhouse folder copied from USB
 
-Arguments:		cmd 	- command string to run in cmd
+# pip options selecting the package source, set by select_package_source
+pip_source_opts = ""
 
-Return:			result 	- output from running the command
-"""
-def run_cmd(cmd):
+# Next reachable package indexes, fastest first, tried in turn when installs fail
+package_index_fallbacks = []
 
-	# Initialize result array
-	result = []
-	print_result = False
+# Candidate package indexes and code samples remotes, i.e. LAN or regional mirrors. The fastest
+# reachable one is used, the public index and GIT_REPO are always candidates too
+PACKAGE_INDEXES = []		## i.e. ["http://10.10.20.5:8080/simple/"]
+GIT_REMOTES = []		## i.e. ["http://10.10.20.5/devnet-express-code-samples.git"]
+DEFAULT_INDEX_URL = "https://pypi.org/simple/"
 
-	# Open pipe in subprocess
-	process = subprocess.Popen(cmd,
-								shell=True,
-								stdout=subprocess.PIPE,
-								stderr=subprocess.PIPE,
-								universal_newlines=True)
+# Mirror rankings are reused for this many seconds
+MIRROR_CACHE_FILE = mirrors.default_cache_file()
+MIRROR_CACHE_TTL = 3600
 
-	# Check if verbose logging is enabled
-	if verbose_logging:
-		for stdout_line in iter(process.stdout.readline, ""):
-			result.append(stdout_line)
-			print(stdout_line)
-	else:
-		for line in process.stdout:
-			result.append(line)
-	errcode = process.returncode
+# Wheels for these libraries are built once per interpreter/platform tag and reused by later environments
+COMPILED_LIBRARIES = ["lxml","cryptography","cffi","pycparser"]
+WHEEL_CACHE_DIR = wheelcache.default_cache_dir()		## "" turns the wheel cache off
+WHEEL_SEED_DIR = ""		## i.e. a shared folder of wheels built by the proctor
+WHEEL_CACHE_MAX_MB = 1024
 
-	# Set print_result to True if full output to shell is desired
-	if print_result:
-		for line in result:
-			print(line)
+# Required libraries, and the lockfile of pinned versions and hashes generated from them with --lock
+REQUIREMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")
+LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.lock")
 
-	# If Error code is returned, raise exception
-	if errcode is not None:
-		raise Exception('cmd %s failed, see above for details', cmd)
-	return result
+# Build virtual environments in-process with venv.EnvBuilder when possible, seeding pip from local wheels
+VENV_IN_PROCESS = True
 
+# Provisioned template environments, one per interpreter/platform tag, cloned by --template
+TEMPLATE_ROOT = virtenv.default_template_root()
 
 
 
+#####################################################################
+#						Function Definitions						#
+#####################################################################
 
 """
 Function: 		text_colour
@@ -173,6 +253,90 @@ def text_colour(string, colour):
 
 
 
+"""
+Function: 		in_virt_env
+
+Description:	Checks whether the current working directory is the virtual environment folder.
+				An empty virtual environment name is treated as the current directory.
+
+Arguments:		virt_env_name 	- Name of virtual environment (passed from batch/sh script)
+
+Return:			result 			- Boolean value
+"""
+def in_virt_env(virt_env_name):
+
+	if not virt_env_name:
+		return True
+
+	work_dir = os.path.basename(os.path.normpath(fsprobe.current_dir()))
+	return work_dir == virt_env_name
+
+
+
+
+
+"""
+Function: 		check_venv_scripts
+
+Description:	Checks a virtual environment scripts folder (bin or Scripts) holds
+				the Python interpreter, pip, and an activate script.
+				The folder is listed once rather than probing each name in turn.
+
+Arguments:		scripts_dir 	- Path to the virtual environment scripts folder
+
+Return:			result 			- Boolean value
+"""
+def check_venv_scripts(scripts_dir):
+
+	entries = dict((os.path.normcase(name), entry) for name, entry in fsprobe.list_dir(scripts_dir).items())
+
+	def executable_exists(name):
+		return any(entries[candidate].is_executable for candidate in fsprobe.executable_names(name) if candidate in entries)
+
+	python_exists = executable_exists("python")
+	pip_exists = executable_exists("pip")
+	activate_exists = any(entries[name].is_file for name in ["activate", "activate.bat"] if name in entries)
+
+	return python_exists and activate_exists and pip_exists
+
+
+
+
+
+"""
+Function: 		run_streamed
+
+Description:	Runs a long running command such as pip install or git clone.
+				Output is printed as it arrives when verbose logging is enabled rather than
+				being held in memory. If the command fails or times out, its last few lines
+				of output are printed to help diagnose the failure.
+
+Arguments:		cmd 	- command string to run in cmd
+
+Return:			result 	- Boolean of whether the command succeeded
+"""
+def run_streamed(cmd):
+
+	def show_line(stream, line):
+		if verbose_logging:
+			print(line)
+
+	status = shell.stream_cmd(cmd, show_line)
+	if status.returncode == 0:
+		return True
+
+	if status.timed_out:
+		print(u"\t%s did not finish within %s seconds and was stopped" % (text_colour(cmd,"blue"), shell.default_timeout))
+	else:
+		print(u"\t%s exited with code %s" % (text_colour(cmd,"blue"), status.returncode))
+	for line in status.tail:
+		print(u"\t\t%s" % line.rstrip("\n"))
+	return False
+
+
+
+
+
 """
 Function: 		check_network
 
@@ -180,17 +344,20 @@ Description:	Used to check network connectivity
 
 Arguments:		remote_host - Remote host to check TCP network connectivity against
 				remote_port - Remote TCP port to check network connectivity against
+				timeout 	- Seconds to wait for the connection
 
 Return:			result 	- Boolean of whether connection was successfuly.
 """
-def check_network(remote_host, remote_port):
+@tracing.traced_check
+def check_network(remote_host, remote_port, timeout=2):
 
 	print(u"\tConnecting to %s on TCP port %s..." % (text_colour(remote_host,"blue"),text_colour(str(remote_port),"blue")))
 
 	# Try-catch to open tcp session with remote host
 	try:
 		host = socket.gethostbyname(remote_host)
-		s = socket.create_connection((host, remote_port), 2)
+		s = socket.create_connection((host, remote_port), timeout)
+		s.close()
 		print("\t%s\n" % text_colour("SUCCESS","green"))
 		return True
 
@@ -204,6 +371,95 @@ def check_network(remote_host, remote_port):
 
 
 
+"""
+Function: 		check_endpoints
+
+Description:	Checks every host the run will talk to at the same time, racing IPv4 and IPv6
+				addresses, and keeps the DNS answers for the rest of the run.
+				Only one package source has to answer, other unreachable hosts are reported
+				so the checks that use them explain their failure.
+				Falls back to check_network on the first package source without asyncio.
+
+Arguments:		endpoints 		- list of (host, port) tuples
+				package_sources - the endpoints packages can be installed from
+
+Return:			result 			- Boolean of whether a package source is reachable
+"""
+@tracing.traced_check
+def check_endpoints(endpoints, package_sources):
+
+	if netprobe is None:
+		return check_network(package_sources[0][0], package_sources[0][1], NETWORK_TIMEOUT)
+
+	print(u"\tConnecting to %s..." % ", ".join(text_colour("%s:%s" % endpoint,"blue") for endpoint in endpoints))
+	netprobe.install_dns_cache()
+	results = netprobe.probe(endpoints, NETWORK_TIMEOUT)
+
+	for result in results:
+		if result.error is None:
+			print(u"\t%s:%s %s (%s, DNS %.0f ms, connect %.0f ms)" % (result.host, result.port, text_colour("SUCCESS","green"),
+					result.address, result.dns_seconds * 1000, result.connect_seconds * 1000))
+		else:
+			print(u"\t%s:%s %s (%s)" % (result.host, result.port, text_colour("FAIL","red"), result.error))
+	print(u"")
+
+	return any(result.error is None for result in results if (result.host, result.port) in package_sources)
+
+
+
+
+
+"""
+Function: 		get_endpoints
+
+Description:	Lists the hosts the run will connect to: the package index (and room wheelhouse),
+				the code samples repository (or its mirror) and, with a token, the Spark API.
+
+Arguments:		index_url 	- room wheelhouse index URL, "" for the public index
+				git_url 	- repository or mirror URL the repository is cloned and pulled from
+				spark_token - Cisco Spark token, "" when Spark is not checked
+
+Return:			result 		- list of (host, port) tuples without duplicates, package sources first
+"""
+def get_endpoints(index_url, git_url, spark_token):
+
+	endpoints = get_url_endpoints([index_url]) + [(REMOTE_SERVER, REMOTE_PORT)] + get_url_endpoints([git_url])
+	if spark_token:
+		endpoints.append((SPARK_API_HOST, 443))
+
+	unique = []
+	for endpoint in endpoints:
+		if endpoint not in unique:
+			unique.append(endpoint)
+	return unique
+
+
+
+
+
+"""
+Function: 		get_url_endpoints
+
+Description:	Reads the host and TCP port of network URLs, local paths are skipped.
+
+Arguments:		urls 	- list of URL strings
+
+Return:			result 	- list of (host, port) tuples
+"""
+def get_url_endpoints(urls):
+
+	endpoints = []
+	for url in urls:
+		if "://" in url:
+			parts = urlsplit(url)
+			if parts.hostname:
+				endpoints.append((parts.hostname, parts.port or url_scheme_ports.get(parts.scheme, 443)))
+	return endpoints
+
+
+
+
+
 """
 Function: 		check_python_version
 
@@ -215,6 +471,7 @@ Arguments:		majorRelease 	- Major Python Release i.e 2 or 3
 
 Return:			result 			- Python string to run Python3 in shell
 """
+@tracing.traced_check
 def check_python_version(major_release, minor_release, sys_platform):
 
 	# Function Variables
@@ -262,13 +519,14 @@ def check_python_version(major_release, minor_release, sys_platform):
 			py3_str = "Python 3."
 
 			# Check for other common python path names (py or python3)
-			response = run_cmd("py --version")
+			py_response, python3_response = run_cmds(["py --version", "python3 --version"], MAX_CONCURRENCY, PROBE_TIMEOUT)
+			response = py_response
 			if len(response) > 0:
 				if py3_str in response[0]:		
 					print(u"\tYou are running python version %s, to run %s execute \'%s\' from cmd\n" % (text_colour(py_ver,"green"), response[0].rstrip('\n'), text_colour("py","blue")))
 					return "py"
 
-			response = run_cmd("python3 --version")
+			response = python3_response
 			if len(response) > 0:
 				if py3_str in response[0]: 
 					print(u"\tYou are running python version %s, to run %s execute \'%s\' from cmd\n" % (text_colour(py_ver,"green"), response[0].rstrip('\n'), text_colour("python3","blue")))
@@ -323,16 +581,20 @@ def check_python_version(major_release, minor_release, sys_platform):
 """
 Function: 		check_python_libraries
 
-Description:	Takes in a list of Python library names and attempts to install whichever are missing.
+Description:	Takes in a list of Python library requirements and attempts to install whichever are missing
+				or at a version the requirement does not allow.
 				If a virtual environment is defined, libraries will be installed for that virtual environment.
 
-Arguments:		majorRelease 	- Major Python Release i.e 2 or 3
-				minorRlease		- Minor Python release
-				venv_pip_str 	- String with path to pip contained in virtual environment
+Arguments:		required_libraries 	- list of lockfile.Requirement tuples
+				sys_platform 		- System platform (Windows,Linux,OSX[Darwin])
+				venv_pip_str 		- String with path to pip contained in virtual environment
+				locked 				- requirements are lockfile pins, install them without dependencies
+				with_hashes 		- also require the lockfile hashes when installing
 
-Return:			result 			- Boolean value (currently unused)
+Return:			result 				- Boolean value (currently unused)
 """
-def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False):
+@tracing.traced_check
+def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False, locked=False, with_hashes=False):
 
 	# Function Variables
 	py3_str = "python 3."
@@ -344,7 +606,15 @@ def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False)
 	if venv_pip_str:
 
 		# Condition is true if running in a virtual environment
-		response = run_cmd(u"%s --version" % venv_pip_str)
+		# pyvenv.cfg records the environment's Python version, only ask pip if it is missing
+		venv_root = inventory.env_root_from_pip(venv_pip_str)
+		venv_python = None
+		if venv_root:
+			venv_python = inventory.env_python_version(venv_root)
+		if venv_python:
+			response = [u"python %s" % venv_python]
+		else:
+			response = run_cmd_cached(u"%s --version" % venv_pip_str, [PIP_INVENTORY_TAG], PROBE_TIMEOUT)
 
 		# Check if response was returned from the shell
 		if len(response) > 0:
@@ -357,7 +627,11 @@ def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False)
 				print(u"\t\'pip\' in PATH is for Python version 2.x\n")
 
 	else:
-		response = run_cmd("pip --version")
+
+		# Probe pip and pip3 at the same time
+		pip_response, pip3_response = run_cmds_cached([("pip --version", [PIP_INVENTORY_TAG]),
+														("pip3 --version", [PIP_INVENTORY_TAG])], MAX_CONCURRENCY, PROBE_TIMEOUT)
+		response = pip_response
 		if len(response) > 0:
 			if py3_str in response[0]:		
 				pip_str = "pip"
@@ -365,7 +639,7 @@ def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False)
 				print(u"\t\'pip\' in PATH is for Python version 2.x\n")
 
 	if not venv_pip_str:
-		response = run_cmd("pip3 --version")
+		response = pip3_response
 		if len(response) > 0:
 			if py3_str in response[0]:		
 				pip_str = "pip3"
@@ -379,7 +653,8 @@ def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False)
 
 	# Upgrade pip installation
 	if REMEDIATION:
-		response = run_cmd(u"%s install --upgrade pip" % pip_str)
+		response = run_cmd(u"%s install --upgrade pip%s" % (pip_str, pip_source_opts))
+		invalidate_cmd_cache(PIP_INVENTORY_TAG)
 		print("\tChecking for pip updates...")
 		if len(response) > 0:
 
@@ -397,114 +672,508 @@ def check_python_libraries(required_libraries, sys_platform, venv_pip_str=False)
 
 
 
-	# Check library installation using pip
-	response = run_cmd("%s list" % pip_str)
+	# Check library installation
+	installed = get_package_inventory(pip_str)
 
-	if len(response) < 1:
+	if installed is None:
 
 		# Unable to find pip
 		print(u"\tUnable to find pip installation")
 		return False
 
-	# Check for each package
-	for library in required_libraries:
+	# Compare every requirement against the inventory in one pass
+	failing = dict((requirement.key, version) for requirement, version in lockfile.unsatisfied(required_libraries, installed))
 
-		# Install each required library by default
-		install = True
+	missing_libraries = []
+	for requirement in required_libraries:
+		library = requirement.name
 
-		# Check whether libraries already installed
-		for each in response:
-			if each.startswith(library):
+		# Library already exists at an allowed version - do not install this library
+		if requirement.key not in failing:
+			print(u"\t%s package already installed" % text_colour(library,"blue"))
+			print("\t%s\n" % text_colour("SUCCESS","green"))
+			continue
 
-				# Library already exists - do not install this library
-				print(u"\t%s package already installed" % text_colour(library,"blue"))
-				print("\t%s\n" % text_colour("SUCCESS","green"))
-				install = False
-				break
+		missing_libraries.append(requirement)
+		if failing[requirement.key] is None:
+			problem = u"\t%s package is missing" % text_colour(library,"blue")
+		else:
+			problem = u"\t%s package version %s does not match %s" % (text_colour(library,"blue"), failing[requirement.key], requirement.specifier)
+		if REMEDIATION:
+			print(problem + u", will be installed...")
+			print(u"")
+		else:
+			print(problem + u".")
+			print(u"\t%s\n" % text_colour("FAIL","red"))
 
-		# Install missing package
-		if install:
-			if REMEDIATION:
-				print(u"\t%s package is missing, attempting install..." % text_colour(library,"blue"))
-				pip_install = run_cmd("%s install %s" % (pip_str, library))
-
-				# Verify Successful install
-				response_inner = run_cmd("%s list" % pip_str)
-				install_success = False
-				for each in response_inner:
-					if each.startswith(library):
-						install_success = True
-						print("\t%s\n" % text_colour("SUCCESS","green"))
-				if not install_success:
-					print(u"\t%s\n" % text_colour("FAIL","red"))
-					print(u"\t%s package installation was unsuccessful.\n" % library)
+	# Install all missing packages in a single pip run
+	if REMEDIATION and missing_libraries:
+		install_libraries(missing_libraries, pip_str, sys_platform, locked, with_hashes)
+
+	return True
+
+
+
+
+
+"""
+Function: 		install_libraries
+
+Description:	Installs a list of Python libraries with a single pip run, so pip resolves
+				and downloads them in one pass, then checks every library against one fresh
+				package inventory.
+				pip abandons the whole run if any one package fails to install, so libraries
+				still missing afterwards are retried one at a time.
+				Lockfile pins already include every dependency, so pip skips resolving them.
+
+Arguments:		libraries 		- list of lockfile.Requirement tuples to install
+				pip_str 		- pip executable name or path
+				sys_platform 	- System platform (Windows,Linux,OSX[Darwin])
+				locked 			- libraries are lockfile pins, install them with --no-deps
+				with_hashes 	- check downloads against the lockfile hashes
+
+Return:			result 			- Boolean of whether every library was installed
+"""
+def install_libraries(libraries, pip_str, sys_platform, locked=False, with_hashes=False):
+
+	install_opts = ""
+	if locked:
+		install_opts += " --no-deps"
+	if with_hashes:
+		# Hashes are of the released files, wheels built for the cache would not match
+		install_opts += " --require-hashes"
+	else:
+		install_opts += prepare_wheel_cache(libraries, pip_str)
+
+	print(u"\tInstalling %s..." % text_colour(", ".join(library.name for library in libraries),"blue"))
+	pip_install_requirements(pip_str, pip_source_opts + install_opts, libraries, with_hashes)
+	invalidate_cmd_cache(PIP_INVENTORY_TAG)
+	installed = get_package_inventory(pip_str) or {}
+
+	# Retry anything the batch did not install on its own
+	failed = [requirement for requirement, version in lockfile.unsatisfied(libraries, installed)]
+	if failed and len(libraries) > 1:
+		for requirement in failed:
+			print(u"\tRetrying %s on its own..." % text_colour(requirement.name,"blue"))
+			pip_install_requirements(pip_str, pip_source_opts + install_opts, [requirement], with_hashes)
+		invalidate_cmd_cache(PIP_INVENTORY_TAG)
+		installed = get_package_inventory(pip_str) or {}
+		failed = [requirement for requirement, version in lockfile.unsatisfied(libraries, installed)]
+
+	# The ranked index may have gone down since it was measured, move on to the next one
+	while failed and next_package_source():
+		pip_install_requirements(pip_str, pip_source_opts + install_opts, failed, with_hashes)
+		invalidate_cmd_cache(PIP_INVENTORY_TAG)
+		installed = get_package_inventory(pip_str) or {}
+		failed = [requirement for requirement, version in lockfile.unsatisfied(libraries, installed)]
+	print(u"")
+
+	# Verify Successful install
+	install_success = True
+	for requirement in libraries:
+		library = requirement.name
+		if requirement not in failed:
+			print(u"\t%s package installed" % text_colour(library,"blue"))
+			print("\t%s\n" % text_colour("SUCCESS","green"))
+		else:
+			install_success = False
+			print(u"\t%s\n" % text_colour("FAIL","red"))
+			print(u"\t%s package installation was unsuccessful.\n" % library)
+
+	if not install_success:
+
+		# Remediation advice based on platform
+		if sys_platform == 'Linux':
+
+			# Common failure is missing openssl library
+			print(u"\tTry running %s from terminal" % text_colour("sudo pip3 install virtualenv","yellow"))
+			print(u"\tAlso then try running %s from terminal\n" % text_colour("sudo apt-get update && sudo apt-get install libssl-dev","yellow"))
+
+		elif sys_platform == 'Darwin':
+
+			# Common failure is missing xcode tools
+			print(u"\tWere you prompted to install %s? This is required, try installing %s and rerun this script\n" % (text_colour("Xcode","yellow"),text_colour("Xcode","yellow")))
+
+	return install_success
+
+
+
+
+
+"""
+Function: 		pip_install_requirements
+
+Description:	Runs pip install for a list of requirements, passed through a temporary
+				requirements file so version specifiers need no shell quoting.
+
+Arguments:		pip_str 		- pip executable name or path
+				install_opts 	- pip install options
+				requirements 	- list of lockfile.Requirement tuples
+				with_hashes 	- include the lockfile hashes
+
+Return:			result 			- Boolean of whether pip succeeded
+"""
+def pip_install_requirements(pip_str, install_opts, requirements, with_hashes):
+
+	requirements_path = lockfile.write_requirements_file(requirements, with_hashes)
+	try:
+		return run_streamed('%s install%s -r "%s"' % (pip_str, install_opts, requirements_path))
+	finally:
+		os.remove(requirements_path)
+
+
+
+
+
+"""
+Function: 		prepare_wheel_cache
+
+Description:	Makes sure the compiled libraries about to be installed have wheels in the
+				wheel cache for pip's interpreter/platform tag, building any that are missing
+				once with 'pip wheel'. Shared wheels in WHEEL_SEED_DIR are added first, and the
+				cache is pruned of the least recently used wheels afterwards.
+
+Arguments:		libraries 	- list of lockfile.Requirement tuples to install
+				pip_str 	- pip executable name or path
+
+Return:			result 		- pip install options preferring the cached wheels, empty if the cache is off
+"""
+def prepare_wheel_cache(libraries, pip_str):
+
+	if not WHEEL_CACHE_DIR:
+		return u""
+
+	tag = get_wheel_tag(pip_str)
+	if WHEEL_SEED_DIR and fsprobe.probe_path(WHEEL_SEED_DIR).is_dir:
+		seeded = wheelcache.seed(WHEEL_CACHE_DIR, tag, WHEEL_SEED_DIR)
+		if seeded:
+			print(u"\tAdded %d wheels from %s to the wheel cache" % (len(seeded), text_colour(WHEEL_SEED_DIR,"blue")))
+
+	cached = wheelcache.cached_projects(WHEEL_CACHE_DIR, tag)
+	to_build = [library for library in libraries
+				if library.key in COMPILED_LIBRARIES and library.key not in cached]
+	if to_build:
+		print(u"\tBuilding wheels for %s (%s), later environments reuse them..." % (text_colour(", ".join(library.name for library in to_build),"blue"), tag))
+		wheelcache.build_wheels(WHEEL_CACHE_DIR, tag, pip_str, [lockfile.requirement_line(library) for library in to_build], pip_source_opts, run_streamed)
+
+	wheelcache.touch(WHEEL_CACHE_DIR, tag, [library.key for library in libraries])
+	wheelcache.prune(WHEEL_CACHE_DIR, WHEEL_CACHE_MAX_MB * 1024 * 1024)
+
+	return u' --find-links "%s" --prefer-binary' % wheelcache.tag_dir(WHEEL_CACHE_DIR, tag)
+
+
+
+
+
+"""
+Function: 		get_wheel_tag
+
+Description:	Works out the interpreter/platform tag wheels are cached under for a pip executable.
+				A virtual environment's own interpreter is asked, otherwise the running one is used.
+
+Arguments:		pip_str 	- pip executable name or path
+
+Return:			result 		- tag string such as 'cp36-cp36m-linux_x86_64'
+"""
+def get_wheel_tag(pip_str):
+
+	scripts_dir = os.path.dirname(pip_str)
+	python = fsprobe.find_executable(scripts_dir, "python") if scripts_dir else None
+	if python:
+		return get_python_tag('"%s"' % python.path)
+
+	return wheelcache.current_tag()
+
+
+
+
+
+"""
+Function: 		get_python_tag
+
+Description:	Asks a Python interpreter for its interpreter/platform tag.
+
+Arguments:		python_str 	- command running the interpreter, i.e. 'python3' or 'py'
+
+Return:			result 		- tag string such as 'cp36-cp36m-linux_x86_64', the running interpreter's if it gave no answer
+"""
+def get_python_tag(python_str):
+
+	response = run_cmd_cached('%s -c "%s"' % (python_str, wheelcache.TAG_SNIPPET), [], PROBE_TIMEOUT)
+	if len(response) > 0 and response[0].strip():
+		return response[0].strip()
+
+	return wheelcache.current_tag()
+
+
+
+
+
+"""
+Function: 		load_requirements
+
+Description:	Reads the required libraries, switching to the lockfile pins when a lockfile
+				exists and still satisfies every requirement.
+
+Arguments:		requirements_path 	- requirements file path
+				lock_path 			- lockfile path
+				python_str 			- Python interpreter the libraries are for
+
+Return:			result 				- tuple of (list of lockfile.Requirement tuples, whether they are
+									  lockfile pins, whether the lockfile hashes apply to this interpreter)
+"""
+def load_requirements(requirements_path, lock_path, python_str):
+
+	required_libraries = lockfile.read_requirements(requirements_path)
+	if not fsprobe.probe_path(lock_path).is_file:
+		return required_libraries, False, False
+
+	locked_libraries = lockfile.read_requirements(lock_path)
+	stale = lockfile.stale_requirements(required_libraries, locked_libraries)
+	if stale:
+		print(u"\t%s is out of date for %s, rerun with --lock\n" % (text_colour(lock_path,"yellow"), ", ".join(requirement.name for requirement in stale)))
+		return required_libraries, False, False
+
+	with_hashes = all(requirement.hashes for requirement in locked_libraries) \
+					and lockfile.read_lock_tag(lock_path) == get_python_tag(python_str)
+	return locked_libraries, True, with_hashes
 
-					# Remediation advice based on platform
-					if sys_platform == 'Linux':
 
-						# Common failure is missing openssl library
-						print(u"\tTry running %s from terminal" % text_colour("sudo pip3 install virtualenv","yellow"))
-						print(u"\tAlso then try running %s from terminal\n" % text_colour("sudo apt-get update && sudo apt-get install libssl-dev","yellow"))
 
-					elif sys_platform == 'Darwin':
 
-						# Common failure is missing xcode tools
-						print(u"\tWere you prompted to install %s? This is required, try installing %s and rerun this script\n" % (text_colour("Xcode","yellow"),text_colour("Xcode","yellow")))
-			else:
-				print(u"\t%s package is missing." % text_colour(library,"blue"))
-				print(u"\t%s\n" % text_colour("FAIL","red"))
 
+"""
+Function: 		lock_libraries
+
+Description:	Resolves the requirements file and writes the lockfile of pinned versions and hashes.
+
+Arguments:		requirements_path 	- requirements file path
+				lock_path 			- lockfile path
+				pip_str 			- pip executable name or path
+
+Return:			result 				- Boolean of whether the lockfile was written
+"""
+def lock_libraries(requirements_path, lock_path, pip_str):
+
+	print(u"\tResolving %s..." % text_colour(requirements_path,"blue"))
+	count = lockfile.generate_lockfile(requirements_path, lock_path, pip_str, pip_source_opts, get_wheel_tag(pip_str), run_streamed)
+	if count is None:
+		print(u"\tUnable to resolve requirements, locking needs pip 22.2 or later")
+		print(u"\t%s\n" % text_colour("FAIL","red"))
+		return False
+
+	print(u"\t%d packages locked in %s" % (count, text_colour(lock_path,"blue")))
+	print("\t%s\n" % text_colour("SUCCESS","green"))
 	return True
 
 
 
 
 
+"""
+Function: 		select_package_source
+
+Description:	Picks where pip installs packages from. With candidate indexes the fastest
+				reachable one is used, otherwise a room wheelhouse index is used when it
+				answers, then a local wheelhouse folder, then the default package index.
+				The other reachable candidates are kept for next_package_source.
+
+Arguments:		index_url 			- room wheelhouse index URL, "" for none
+				find_links 			- local wheelhouse folder, "" for none
+				index_candidates 	- list of candidate index URLs, ranked with index_url and DEFAULT_INDEX_URL
+
+Return:			result 				- pip options string, empty for the default package index
+"""
+def select_package_source(index_url, find_links, index_candidates=()):
+
+	global package_index_fallbacks
+	if index_candidates:
+		print(u"\tRanking package indexes...")
+		ranking = rank_mirrors("pypi", ([index_url] if index_url else []) + list(index_candidates) + [DEFAULT_INDEX_URL])
+		best = [result["url"] for result in ranking if result["reachable"]]
+		package_index_fallbacks = best[1:]
+		if best and best[0] != DEFAULT_INDEX_URL:
+			print(u"\tUsing %s\n" % text_colour(best[0],"blue"))
+			return index_options(best[0])
+		index_url = ""
+
+	if index_url:
+		print(u"\tChecking wheelhouse %s..." % text_colour(index_url,"blue"))
+		url = urlsplit(index_url)
+		port = url.port or (443 if url.scheme == "https" else 80)
+		try:
+			connection = socket.create_connection((url.hostname, port), 2)
+			connection.close()
+			print(u"\t%s\n" % text_colour("SUCCESS","green"))
+			return index_options(index_url)
+		except (socket.error, socket.timeout):
+			print(u"\t%s, falling back to the default package index\n" % text_colour("UNREACHABLE","yellow"))
+
+	if find_links:
+		if fsprobe.probe_path(find_links).is_dir:
+			print(u"\tUsing wheelhouse folder %s\n" % text_colour(find_links,"blue"))
+			return u' --no-index --find-links "%s"' % find_links
+		print(u"\tWheelhouse folder %s not found, using the default package index\n" % text_colour(find_links,"yellow"))
+
+	return u""
+
+
+
+
+
+"""
+Function: 		next_package_source
+
+Description:	Switches pip to the next ranked package index after installs failed, and drops
+				the cached ranking so the next run measures the indexes again.
+
+Arguments:		None
+
+Return:			result 	- Boolean of whether there was another index to try
+"""
+def next_package_source():
+
+	global pip_source_opts
+	if not package_index_fallbacks:
+		return False
+
+	index_url = package_index_fallbacks.pop(0)
+	mirrors.forget("pypi", MIRROR_CACHE_FILE)
+	print(u"\tTrying the next package index %s..." % text_colour(index_url,"blue"))
+	pip_source_opts = index_options(index_url) if index_url != DEFAULT_INDEX_URL else u""
+	return True
+
+
+
+
+
+"""
+Function: 		index_options
+
+Description:	pip options installing from a package index, trusting plain HTTP room indexes.
+
+Arguments:		index_url 	- package index URL
+
+Return:			result 		- pip options string
+"""
+def index_options(index_url):
+
+	url = urlsplit(index_url)
+	options = u" --index-url %s" % index_url
+	if url.scheme == "http":
+		options += u" --trusted-host %s" % url.hostname
+	return options
+
+
+
+
+
+"""
+Function: 		rank_mirrors
+
+Description:	Ranks candidate package indexes or git remotes, fastest reachable first,
+				reusing a ranking measured within MIRROR_CACHE_TTL seconds.
+
+Arguments:		kind 		- "pypi" or "git"
+				candidates 	- list of URLs
+
+Return:			result 		- list of mirrors.probe dictionaries, best first
+"""
+def rank_mirrors(kind, candidates):
+
+	unique = []
+	for url in candidates:
+		if url not in unique:
+			unique.append(url)
+
+	ranking = mirrors.rank(kind, unique, MIRROR_CACHE_FILE, MIRROR_CACHE_TTL, NETWORK_TIMEOUT)
+	for position, result in enumerate(ranking):
+		if result["reachable"]:
+			speed = "%.1f Mbit/s" % result["mbit_per_s"] if result["mbit_per_s"] else "-"
+			print(u"\t%d. %s %.0f ms, %s" % (position + 1, text_colour(result["url"],"blue"), result["latency_ms"], speed))
+		else:
+			print(u"\t%d. %s %s (%s)" % (position + 1, text_colour(result["url"],"blue"), text_colour("UNREACHABLE","yellow"), result["error"]))
+	return ranking
+
+
+
+
+
+"""
+Function: 		get_package_inventory
+
+Description:	Lists the packages installed for a pip executable.
+				For a virtual environment pip the site-packages metadata is read directly,
+				otherwise a single 'pip list --format=json' is run (and cached).
+
+Arguments:		pip_str 	- pip executable name or path
+
+Return:			result 		- dictionary of normalised package name to version, None if pip gave no output
+"""
+def get_package_inventory(pip_str):
+
+	# Read the environment's metadata when pip belongs to a virtual environment
+	env_root = inventory.env_root_from_pip(pip_str)
+	if env_root:
+		settings = inventory.read_pyvenv_cfg(env_root)
+		site_dirs = inventory.find_site_packages(env_root)
+		if site_dirs and settings.get("include-system-site-packages", "false").lower() != "true":
+			return inventory.scan_site_packages(site_dirs)
+
+	# Older pip releases do not support --format
+	response = run_cmd_cached("%s list --format=json" % pip_str, [PIP_INVENTORY_TAG])
+	if len(response) < 1:
+		response = run_cmd_cached("%s list" % pip_str, [PIP_INVENTORY_TAG])
+	if len(response) < 1:
+		return None
+
+	return inventory.parse_pip_list(response)
+
+
+
+
+
 """
 Function: 		create_virt_env
 
 Description:	Creates a Python Virtual Environemnt
 
-Arguments:		virt_env_name 	- Name of virtual environment (passed from batch/sh script)
-				sys_platform	- Windows, Linux, OSX[Darwin]
-				python_str 		- Python interpreter to run when creating virtual environment
+Arguments:		virt_env_name 		- Name of virtual environment (passed from batch/sh script)
+				sys_platform		- Windows, Linux, OSX[Darwin]
+				python_str 			- Python interpreter to run when creating virtual environment
+				template_libraries 	- clone the environment from a template provisioned with these
+									  lockfile.Requirement tuples, None to create it from scratch
+				locked 				- template libraries are lockfile pins
+				with_hashes 		- install template libraries with the lockfile hashes
 
-Return:			result 			- Boolean value
+Return:			result 				- Boolean value
 """
-def create_virt_env(virt_env_name, sys_platform, python_str):
+@tracing.traced_check
+def create_virt_env(virt_env_name, sys_platform, python_str, template_libraries=None, locked=False, with_hashes=False):
 
 	# Function variables
 	venv_script_path = ""
 	venv_exists = False
 	venv_success = False
-	work_dir = ""
-	list_contents = ""
-	pwd = ""
 	dir_delim = ""
 	activate_dir = ""
 
 	# Execute based on system platform
 	if sys_platform == 'Windows':
-		
-		# Windows command sets
-		list_contents = "dir"
-		pwd = "cd"
+
+		# Windows layout
 		dir_delim = "\\"
-		activate_dir = "Scripts"	
+		activate_dir = "Scripts"
 
 	elif sys_platform == 'Darwin':
-		
-		# OSX command sets
-		list_contents = "ls"
-		pwd = "pwd"
+
+		# OSX layout
 		dir_delim = "/"
 		activate_dir = "bin"
 
 	elif sys_platform == 'Linux':
-		
-		# Linux command sets
-		list_contents = "ls"
-		pwd = "pwd"
+
+		# Linux layout
 		dir_delim = "/"
 		activate_dir = "bin"
 
@@ -515,44 +1184,18 @@ def create_virt_env(virt_env_name, sys_platform, python_str):
 		return False
 
 	# Check if current directory contains virtual environment
-	result = run_cmd(list_contents)
-	for entry in result:
-		if str(virt_env_name) in entry:
-			venv_script_path = str(virt_env_name) + dir_delim + activate_dir
+	if fsprobe.probe_path(str(virt_env_name)).is_dir:
+		venv_script_path = str(virt_env_name) + dir_delim + activate_dir
 
 	# Check if in virtual environment
-	result = run_cmd(pwd)
-
-	if len(result) > 0:
+	if in_virt_env(virt_env_name):
+		venv_script_path = activate_dir
 
-		work_dir = result[0]
-		wd = result[0].split(dir_delim)
-		wd_str = wd[-1]
-
-		if virt_env_name in wd_str:
-			venv_script_path = activate_dir
-
-
-	# Get Python Path
-	python_path = run_cmd("%s -c \"import sys; print(sys.executable)\"" % python_str)
 
 	# Check if virtual environment already exists
-	result = run_cmd("%s %s" % (list_contents,venv_script_path))
-	python_exists = False
-	activate_exists = False
-	pip_exists = False
-	for entry in result:
-		if "python" in entry:
-			python_exists = True
-		if "activate" in entry:
-			activate_exists = True
-		if "pip" in entry:
-			pip_exists = True
-
 	# Must include Python, Pip, and Activate to count as valid installation
-	if python_exists and activate_exists and pip_exists:
-		
-		result = run_cmd("%s%spip list" % (venv_script_path,dir_delim))
+	if venv_script_path and check_venv_scripts(venv_script_path):
+
 		print(u"\tVirtual Environment already exists...")
 		print(u"\t%s\n" % text_colour("SUCCESS","green"))
 		venv_exists = True
@@ -563,31 +1206,18 @@ def create_virt_env(virt_env_name, sys_platform, python_str):
 		print(u"\tCreating %s Virtual Environment..." % text_colour(virt_env_name,"blue"))
 		print(u"\tPython string is %s\n" % text_colour(python_str,"cyan"))
 
-		# Different commands for different system platforms to create virtual environment
-		if sys_platform == 'Windows':
-			result = run_cmd(python_str + (" -m venv %s" % virt_env_name))
-		elif sys_platform == 'Darwin':
-			#result = run_cmd("virtualenv %s" % virt_env_name)
-			result = run_cmd(python_str + (" -m virtualenv %s" % virt_env_name))
-		elif sys_platform == 'Linux':
-			#result = run_cmd("virtualenv %s" % virt_env_name)
-			result = run_cmd(python_str + (" -m virtualenv %s" % virt_env_name))	
+		# Clone a provisioned template when asked, otherwise build from scratch
+		cloned = False
+		if template_libraries is not None:
+			template = provision_template(python_str, sys_platform, template_libraries, locked, with_hashes)
+			if template:
+				cloned = clone_virt_env(template, virt_env_name)
+		if not cloned:
+			build_virt_env(virt_env_name, sys_platform, python_str)
 
 		# Check if Virtual Environment installation was successful
-		result = run_cmd("%s %s%s%s" % (list_contents, virt_env_name, dir_delim, activate_dir))
-		python_exists = False
-		activate_exists = False
-		pip_exists = False
-		for entry in result:
-			if "python" in entry:
-				python_exists = True
-			if "activate" in entry:
-				activate_exists = True
-			if "pip" in entry:
-				pip_exists = True
-
 		# Return validation of success or failure
-		if python_exists and activate_exists and pip_exists:
+		if check_venv_scripts(virt_env_name + dir_delim + activate_dir):
 			venv_success = True
 			print(u"\t%s\n" % text_colour("SUCCESS","green"))
 			print(u"\tVirtual Environment successfully created...")
@@ -606,35 +1236,170 @@ def create_virt_env(virt_env_name, sys_platform, python_str):
 
 
 
+"""
+Function: 		build_virt_env
+
+Description:	Creates a new Python Virtual Environment with pip and setuptools.
+				When python_str is the interpreter running this script the environment is built
+				in-process with venv.EnvBuilder and seeded from local wheels, otherwise, or when
+				no pip wheel is found, with the platform's usual tool.
+
+Arguments:		env_path 		- folder to create the virtual environment in
+				sys_platform	- Windows, Linux, OSX[Darwin]
+				python_str 		- Python interpreter to run when creating virtual environment
+
+Return:			result 			- Boolean of whether the creation succeeded
+"""
+def build_virt_env(env_path, sys_platform, python_str):
+
+	which = getattr(shutil, "which", None)
+	if VENV_IN_PROCESS and which and virtenv.can_create_in_process(which(python_str)):
+		seed_dirs = []
+		if WHEEL_CACHE_DIR:
+			seed_dirs.append(wheelcache.tag_dir(WHEEL_CACHE_DIR, wheelcache.current_tag()))
+		seed_wheels = virtenv.find_seed_wheels(seed_dirs)
+
+		# Some system Pythons (i.e. Debian and Ubuntu) ship without the ensurepip wheels
+		if not [wheel for wheel in seed_wheels if os.path.basename(wheel).startswith("pip-")]:
+			print(u"\tNo pip wheel to seed the environment with, running %s instead..." % text_colour(python_str,"cyan"))
+		else:
+			try:
+				virtenv.create_env(env_path, seed_wheels)
+				return True
+			except (OSError, IOError, zipfile.BadZipfile) as e:
+				print(u"\tIn-process creation failed (%s), running %s instead..." % (e, text_colour(python_str,"cyan")))
+				shutil.rmtree(env_path, True)
+
+	# Different commands for different system platforms to create virtual environment
+	if sys_platform == 'Windows':
+		return run_streamed(python_str + (' -m venv "%s"' % env_path))
+
+	return run_streamed(python_str + (' -m virtualenv "%s"' % env_path))
+
+
+
+
+
+"""
+Function: 		provision_template
+
+Description:	Makes sure the template environment for an interpreter exists and has every
+				required library installed, building it the first time.
+
+Arguments:		python_str 		- Python interpreter the template is for
+				sys_platform	- Windows, Linux, OSX[Darwin]
+				libraries 		- list of lockfile.Requirement tuples
+				locked 			- libraries are lockfile pins
+				with_hashes 	- install libraries with the lockfile hashes
+
+Return:			result 			- template folder, None if it could not be provisioned
+"""
+def provision_template(python_str, sys_platform, libraries, locked=False, with_hashes=False):
+
+	template = os.path.join(TEMPLATE_ROOT, get_python_tag(python_str))
+	scripts_dir = os.path.join(template, virtenv.scripts_dir_name())
+
+	if not check_venv_scripts(scripts_dir):
+		print(u"\tBuilding template environment %s..." % text_colour(template,"blue"))
+		shutil.rmtree(template, True)
+		build_virt_env(template, sys_platform, python_str)
+		if not check_venv_scripts(scripts_dir):
+			print(u"\tTemplate environment creation failed, creating %s from scratch...\n" % text_colour("virtual environment","blue"))
+			return None
+
+	template_pip = os.path.join(scripts_dir, "pip")
+	missing = [requirement for requirement, version in lockfile.unsatisfied(libraries, get_package_inventory(template_pip) or {})]
+	if missing:
+		print(u"\tProvisioning template environment...")
+		if not install_libraries(missing, template_pip, sys_platform, locked, with_hashes):
+			return None
+
+	return template
+
+
+
+
+
+"""
+Function: 		clone_virt_env
+
+Description:	Clones a template environment into a new virtual environment, sharing file contents
+				with copy-on-write clones or hard links where possible, then relocates its scripts.
+
+Arguments:		template 		- template environment folder
+				virt_env_name 	- new virtual environment folder
+
+Return:			result 			- Boolean of whether the clone succeeded
+"""
+def clone_virt_env(template, virt_env_name):
+
+	print(u"\tCloning %s..." % text_colour(template,"blue"))
+	start = time.time()
+	try:
+		counts = virtenv.clone_env(template, virt_env_name)
+		virtenv.relocate_env(virt_env_name, template)
+	except (OSError, IOError) as e:
+		print(u"\tClone failed (%s), creating from scratch..." % e)
+		shutil.rmtree(virt_env_name, True)
+		return False
+
+	print(u"\tCloned in %.2f seconds (%d copy-on-write, %d hard linked, %d copied files)"
+			% (time.time() - start, counts["reflink"], counts["hardlink"], counts["copy"]))
+	return True
+
+
+
+
+
 """
 Function: 		check_spark
 
 Description:	Attempts to create a Cisco Spark room using user-supplied Spark authentication token.
 				If room creation is successful, posts a message into room to verify.
+				The room is reused on later runs: its id is read from the room index, or
+				looked up by title once the index entry expires, so a repeat check only
+				posts the message.
 				Depends on spark.py import.
 
 Arguments:		spark_token 	- Cisco Spark REST API Authentication Token
 
 Return:			result 			- Boolean value
 """
+@tracing.traced_check
 def check_spark(spark_token):
 
 	try:
 
+		# Reuse the room of an earlier run
+		room_title = SPARK_ROOM_TITLE
+		room_id = roomindex.lookup(SPARK_ROOM_INDEX, spark_token, room_title, SPARK_ROOM_TTL)
+		if room_id:
+			print(u"\tReusing Spark room %s..." % text_colour(room_title,"blue"))
+		else:
+			print(u"\tLooking up Spark room %s..." % text_colour(room_title,"blue"))
+			room_id = spark.get_spark_room_id(room_title, spark_token, "group")
+
 		# Create a new room
-		print(u"\tCreating a new Spark room...")
-		room_title = "Devnet Express v2 Preparation Script"
-		room_id = spark.post_spark_create_room(room_title, spark_token)
+		if not room_id:
+			print(u"\tCreating a new Spark room...")
+			room_id = spark.post_spark_create_room(room_title, spark_token)
 		if room_id:
+			roomindex.remember(SPARK_ROOM_INDEX, spark_token, room_title, room_id)
 			print(u"\t%s\n" % text_colour("SUCCESS","green"))
 		else:
 			print(u"\t%s\n" % text_colour("FAIL","red"))
 			return False
 
-		# Post a message to the new room
-		print(u"\tPosting message to new Spark room...")
+		# Post a message to the room, creating it again if it was deleted since it was indexed
+		print(u"\tPosting message to Spark room...")
 		message = "Congratulations! Your Spark Token is working with the Cisco Spark REST APIs"
 		response = spark.post_spark_message(message,room_id,spark_token)
+		if response.status_code == 404:
+			print(u"\tRoom no longer exists, creating a new Spark room...")
+			roomindex.forget(SPARK_ROOM_INDEX, spark_token, room_title)
+			room_id = spark.post_spark_create_room(room_title, spark_token)
+			roomindex.remember(SPARK_ROOM_INDEX, spark_token, room_title, room_id)
+			response = spark.post_spark_message(message,room_id,spark_token)
 		response_json = response.json()
 		if response_json['text'] == message:
 			print(u"\t%s\n" % text_colour("SUCCESS","green"))
@@ -663,42 +1428,38 @@ Arguments:		git_repo 		- Repository to pull
 
 Return:			result 			- Boolean value
 """
+@tracing.traced_check
 def check_git(git_repo, repository_name, virt_env_name, sys_platform):
 
 	# Function variables
-	list_contents = ""
-	pwd = ""
 	dir_delim = ""
 	work_dir = ""
 	repo_name = repository_name
+	git_success = False
+	track_folders = []
+	if GIT_TRACK_MANIFEST:
+		track_folders = gitrepo.read_manifest(GIT_TRACK_MANIFEST)
 
 	# Execute based on system platform
 	if sys_platform == 'Windows':
-		
-		# Windows command sets
-		list_contents = "dir"
-		pwd = "cd"
+
+		# Windows layout
 		dir_delim = "\\"
 
 	elif sys_platform == 'Darwin':
-		
-		# OSX command sets
-		list_contents = "ls"
-		pwd = "pwd"
-		dir_delim = "/"
 
+		# OSX layout
+		dir_delim = "/"
 
 	elif sys_platform == 'Linux':
-		
-		# Linux command sets
-		list_contents = "ls"
-		pwd = "pwd"
+
+		# Linux layout
 		dir_delim = "/"
 
 
 	# Check if user has git installed
 	print(u"\tChecking for git installation...")
-	response = run_cmd("git --version")
+	response = run_cmd_cached("git --version", [], PROBE_TIMEOUT)
 
 	# Check if response was provided by shell
 	if len(response) > 0:
@@ -706,89 +1467,259 @@ def check_git(git_repo, repository_name, virt_env_name, sys_platform):
 		# Git should provide version information if exists
 		if "git version" in response[0]:
 			print(u"\t%s\n" % text_colour("SUCCESS","green"))
+			git_success = True
 
 			if REMEDIATION:
 				# Check which directory we are working in
-				response = run_cmd(pwd)
-
-				# Check if response was provided by shell
-				if len(response) > 0:
-					for each in response:
-						if virt_env_name in each:
-							work_dir = ""
-						else:
-							work_dir = virt_env_name + dir_delim
+				if in_virt_env(virt_env_name):
+					work_dir = ""
+				else:
+					work_dir = virt_env_name + dir_delim
 
 				# Check if Git Repository has already been pulled
-				response = run_cmd(list_contents + " " + work_dir)
+				repo_path = work_dir + repo_name
+
+				# Fastest reachable remote first, the default one when no candidate answers.
+				# The mirror strategy clones from the mirror, the others from the repository
+				default_remote = GIT_MIRROR if GIT_CLONE_STRATEGY == "mirror" else git_repo
+				remotes = [default_remote]
+				if GIT_REMOTES:
+					print(u"\tRanking repository remotes...")
+					remotes = [result["url"] for result in rank_mirrors("git", GIT_REMOTES + [default_remote]) if result["reachable"]] or [default_remote]
+
+				# Repository was found
+				if fsprobe.probe_path(repo_path).is_dir:
+
+					# Pull from the fastest remote when origin is one of the candidates
+					origin = gitrepo.read_config(repo_path).get("remote.origin.url")
+					if GIT_REMOTES and origin in GIT_REMOTES + [default_remote] and origin != remotes[0]:
+						print(u"\tSwitching origin to %s..." % text_colour(remotes[0],"blue"))
+						run_streamed(gitrepo.set_remote_command(repo_path, "origin", remotes[0]))
+
+					# Update the repo, only the track's folders are refreshed in a sparse checkout
+					update_sparse_checkout(repo_path, track_folders)
+					print(u"\tRepository found locally, checking for updates...")
+					update_repository(repo_path)
+
+				else:
+
+					# Clone the repo, moving on to the next remote if one fails
+					response = False
+					for remote in remotes:
+						print(u"\tPulling remote repository from %s (%s clone)..." % (text_colour(remote,"blue"), GIT_CLONE_STRATEGY))
+						mirror = remote if GIT_CLONE_STRATEGY == "mirror" else GIT_MIRROR
+						response = run_streamed(gitrepo.clone_command(remote, repo_path, GIT_CLONE_STRATEGY, GIT_CLONE_DEPTH, mirror, bool(track_folders)))
+						if response and track_folders:
+							response = update_sparse_checkout(repo_path, track_folders)
+						if response:
+							break
+						shutil.rmtree(repo_path, True)
+						if GIT_REMOTES:
+							mirrors.forget("git", MIRROR_CACHE_FILE)
+
+					# Older git releases and some servers do not support every strategy
+					if not response and GIT_CLONE_STRATEGY != "full":
+						print(u"\t%s clone failed, trying a full clone..." % GIT_CLONE_STRATEGY)
+						shutil.rmtree(repo_path, True)
+						response = run_streamed(gitrepo.clone_command(git_repo, repo_path))
+						update_sparse_checkout(repo_path, track_folders)
+					invalidate_cmd_cache(GIT_WORKTREE_TAG)
+
+				# Verify the repository has a commit checked out
+				if gitrepo.inspect(repo_path).head:
+					print(u"\t%s\n" % text_colour("SUCCESS","green"))
+				else:
+					git_success = False
+					print(u"\t%s\n" % text_colour("FAIL","red"))
 
-				# Check if response was provided by shell
-				if len(response) > 0:
+		else:
 
-					repo_found = False
+			# Git does not exist
+			print(u"\t%s\n" % text_colour("FAIL","red"))
 
-					for entry in response:
-						if repo_name in entry:
-							repo_found = True
+	else:
 
-					# Repository was found
-					if repo_found:
+		# Git does not exist
+		print(u"\t%s\n" % text_colour("FAIL","red"))
 
-						# Update the repo
-						print(u"\tRepository found locally, attempting to pull updates...")
-						response = run_cmd("git -C " + work_dir + dir_delim + repo_name + " pull")
+	return git_success
 
-						# Verify the update - lazy here, need to fix
-						response = run_cmd(list_contents + " " + work_dir)
 
-						# Check if response was provided by shell
-						if len(response) > 0:
 
-							repo_found = False
 
-							for entry in response:
-								if repo_name in entry:
-									repo_found = True
+"""
+Function: 		update_repository
 
-							if repo_found:
-								print(u"\t%s\n" % text_colour("SUCCESS","green"))
-							else:
-								print(u"\t%s\n" % text_colour("FAIL","red"))
+Description:	Brings an existing clone up to date with as little work as possible.
+				The local state is read from the .git folder and compared with the remote
+				tip from a single ls-remote, so an up to date clone needs one round-trip and
+				no fetch. Otherwise the branch is fetched and fast-forwarded when it has no
+				commits of its own. Ahead/behind counts and local changes are reported.
 
-					else:
+Arguments:		repo_path 	- repository folder
 
-						# Clone the repo
-						print(u"\tPulling remote repository...")
-						response = run_cmd("git clone " + git_repo + " " + work_dir + repo_name)
+Return:			result 		- Boolean of whether the checkout is at the remote tip
+"""
+def update_repository(repo_path):
 
-						# Verify the update - lazy here, need to fix
-						response = run_cmd(list_contents + " " + work_dir)
+	state = gitrepo.inspect(repo_path)
+	if not state.head:
+		print(u"\tNo commit checked out in %s" % text_colour(repo_path,"yellow"))
+		return False
 
-						# Check if response was provided by shell
-						if len(response) > 0:
+	remote_tip = gitrepo.parse_ls_remote(run_cmd(gitrepo.ls_remote_command(repo_path, state), PROBE_TIMEOUT))
+	if remote_tip is None:
+		print(u"\tUnable to reach the remote repository, keeping commit %s" % state.head[:10])
+	elif remote_tip == state.head:
+		print(u"\tUp to date at commit %s" % state.head[:10])
+	else:
 
-							repo_found = False
+		# Only fetch objects that are not already here
+		if remote_tip != state.upstream:
+			run_streamed(gitrepo.fetch_command(repo_path, state))
+			invalidate_cmd_cache(GIT_WORKTREE_TAG)
 
-							for entry in response:
-								if repo_name in entry:
-									repo_found = True
+	ahead, behind, dirty = gitrepo.parse_status(run_cmd_cached(gitrepo.status_command(repo_path), [GIT_WORKTREE_TAG], PROBE_TIMEOUT))
 
-							if repo_found:
-								print(u"\t%s\n" % text_colour("SUCCESS","green"))
-							else:
-								print(u"\t%s\n" % text_colour("FAIL","red"))
+	# Counts are against the last fetched upstream, which may be older than a matching remote tip
+	if remote_tip == state.head:
+		ahead, behind = 0, 0
+	if behind and not ahead:
+		if run_streamed(gitrepo.fast_forward_command(repo_path)):
+			print(u"\tUpdated %d commits to %s" % (behind, gitrepo.inspect(repo_path).head[:10]))
+			behind = 0
+		invalidate_cmd_cache(GIT_WORKTREE_TAG)
+
+	if ahead or behind:
+		print(u"\tBranch is %s commits ahead and %s commits behind the remote" % (text_colour(str(ahead),"yellow"), text_colour(str(behind),"yellow")))
+	if dirty:
+		print(u"\tRepository has %s" % text_colour("local changes","yellow"))
+
+	return remote_tip is not None and behind == 0 and not ahead
 
-		else:
 
-			# Git does not exist
-			print(u"\t%s\n" % text_colour("FAIL","red"))
 
+
+
+"""
+Function: 		update_sparse_checkout
+
+Description:	Makes the repository checkout match the track manifest. A changed manifest
+				only changes which folders are checked out, the repository is not cloned again.
+				An empty manifest restores the whole working tree of a sparse checkout.
+
+Arguments:		repo_path 		- repository folder
+				track_folders 	- list of folders from the track manifest, empty for the whole tree
+
+Return:			result 			- Boolean of whether the checkout matches the manifest
+"""
+def update_sparse_checkout(repo_path, track_folders):
+
+	current = gitrepo.sparse_paths(repo_path)
+	if not track_folders:
+		if current is None:
+			return True
+		print(u"\tNo track manifest, checking out the whole repository...")
+		invalidate_cmd_cache(GIT_WORKTREE_TAG)
+		return run_streamed(gitrepo.sparse_disable_command(repo_path))
+
+	# Compare what git keeps, a folder inside another tracked folder is not listed on its own
+	folders = gitrepo.cone_folders(track_folders)
+	if current == folders:
+		return True
+
+	print(u"\tChecking out track folders %s..." % text_colour(", ".join(folders),"blue"))
+	invalidate_cmd_cache(GIT_WORKTREE_TAG)
+	return run_streamed(gitrepo.sparse_set_command(repo_path, folders))
+
+
+
+
+
+"""
+Function: 		run_netbench
+
+Description:	Measures DNS, TCP connect, TLS handshake and time to first byte of each endpoint,
+				and download throughput, then prints the percentiles and writes a JSON report.
+				Shows whether slow installs at a venue come from name lookups, connection setup,
+				TLS or bandwidth.
+
+Arguments:		endpoints 		- list of (host, port) tuples
+				throughput_url 	- URL downloaded to measure throughput, "" to skip
+				samples 		- samples per endpoint
+				report_file 	- JSON report file path
+				stand_in 		- download from a local stand-in server instead of throughput_url
+
+Return:			result 			- Boolean of whether every sample succeeded
+"""
+def run_netbench(endpoints, throughput_url, samples, report_file, stand_in=False):
+
+	import netbench
+
+	server = None
+	if stand_in:
+		server, throughput_url = netbench.start_stand_in()
+	try:
+		print(u"\nBenchmarking %d endpoints, %d samples each...\n" % (len(endpoints), samples))
+		report = netbench.run(endpoints, throughput_url, samples, timeout=NETWORK_TIMEOUT)
+	finally:
+		if server:
+			server.shutdown()
+
+	success = True
+	columns = ["dns_ms", "connect_ms", "tls_ms", "ttfb_ms"]
+	print(u"\t%-32s %s" % ("p50 / p95 / p99 ms", "".join("%-24s" % column[:-len("_ms")].upper() for column in columns)))
+	for result in report["endpoints"]:
+		cells = []
+		for column in columns:
+			stats = result[column]
+			cells.append("%-24s" % ("%.1f / %.1f / %.1f" % (stats["p50"], stats["p95"], stats["p99"]) if stats["count"] else "-"))
+		print(u"\t%-32s %s" % ("%s:%s" % (result["host"], result["port"]), "".join(cells)))
+		if result["errors"]:
+			success = False
+			print(u"\t\t%s of %d samples failed, last error: %s" % (text_colour(str(len(result["errors"])),"red"), result["samples"], result["errors"][-1]))
+
+	throughput = report["throughput"]
+	if throughput:
+		rate = throughput["mbit_per_s"]
+		print(u"\n\tDownload %s (%d bytes)" % (text_colour(throughput["url"],"blue"), throughput["bytes"]))
+		if rate["count"]:
+			print(u"\t\tthroughput p50 %.1f, p95 %.1f, p99 %.1f Mbit/s, first byte p50 %.1f ms"
+					% (rate["p50"], rate["p95"], rate["p99"], throughput["ttfb_ms"]["p50"]))
+		if throughput["errors"]:
+			success = False
+			print(u"\t\t%s of %d downloads failed, last error: %s" % (text_colour(str(len(throughput["errors"])),"red"), throughput["samples"], throughput["errors"][-1]))
 	else:
+		print(u"\n\tNo download to time, set --netbench-url or --netbench-local")
+
+	netbench.write_report(report, report_file)
+	print(u"\nReport written to %s\n" % text_colour(report_file,"blue"))
+	return success
+
 
-		# Git does not exist
-		print(u"\t%s\n" % text_colour("FAIL","red"))
 
-	return False
+
+
+"""
+Function: 		save_trace
+
+Description:	Writes the recorded check and command timings.
+				The Chrome trace can be opened in chrome://tracing or https://ui.perfetto.dev,
+				the summary lists the slowest checks and commands first.
+
+Arguments:		trace_file 	- Chrome trace file path, the summary is written alongside
+
+Return:			None
+"""
+def save_trace(trace_file):
+
+	summary_file = os.path.splitext(trace_file)[0] + "_summary.json"
+	tracing.write_chrome_trace(trace_file)
+	summary = tracing.write_summary(summary_file)
+
+	print(u"\nTrace written to %s, summary written to %s" % (text_colour(trace_file,"blue"), text_colour(summary_file,"blue")))
+	for entry in summary[:5]:
+		print(u"\t%10.1f ms  %s" % (entry["total_ms"], entry["name"]))
 
 
 
@@ -798,80 +1729,251 @@ def check_git(git_repo, repository_name, virt_env_name, sys_platform):
 #####################################################################
 if __name__ == "__main__":
 
+	# Wheelhouse subcommand, fills and serves a package index for the room
+	if len(sys.argv) > 1 and sys.argv[1] == "wheelhouse":
+		import wheelhouse
+		sys.exit(wheelhouse.main(sys.argv[2:]))
+
+	# Onboard subcommand, adds a roster of attendees to the event Spark room
+	if len(sys.argv) > 1 and sys.argv[1] == "onboard":
+		import onboard
+		sys.exit(onboard.main(sys.argv[2:]))
+
+	# Command line arguments
+	parser = argparse.ArgumentParser(description="Check user workstation is prepared for DevNet Express DNA v2 track")
+	parser.add_argument("virt_env_name", nargs="?", default="",
+						help="Python virtual environment to check or create")
+	parser.add_argument("-v", dest="verbose", action="store_true",
+						help="print the output of shell commands")
+	parser.add_argument("--trace", metavar="FILE",
+						help="write a Chrome trace of checks and shell commands to FILE, and a summary ranked by time spent next to it")
+	parser.add_argument("--index-url", metavar="URL", default=WHEELHOUSE_URL,
+						help="room wheelhouse index to install packages from when reachable")
+	parser.add_argument("--find-links", metavar="DIR", default=WHEELHOUSE_DIR,
+						help="local wheelhouse folder to install packages from, without using any index")
+	parser.add_argument("--index-candidate", metavar="URL", action="append",
+						help="candidate package index, the fastest reachable one is used (repeatable)")
+	parser.add_argument("--git-remote", metavar="URL", action="append",
+						help="candidate remote for the code samples repository, the fastest reachable one is used (repeatable)")
+	parser.add_argument("--mirror-ttl", type=int, default=MIRROR_CACHE_TTL, metavar="SECONDS",
+						help="seconds a mirror ranking is reused before probing again (default: %(default)s)")
+	parser.add_argument("--requirements", metavar="FILE", default=REQUIREMENTS_FILE,
+						help="required Python libraries (default: %(default)s)")
+	parser.add_argument("--lockfile", metavar="FILE", default=LOCK_FILE,
+						help="pinned versions and hashes, used when present and still matching the requirements (default: %(default)s)")
+	parser.add_argument("--lock", action="store_true",
+						help="resolve the requirements with the environment's pip and write the lockfile")
+	parser.add_argument("--git-strategy", choices=gitrepo.CLONE_STRATEGIES, default=GIT_CLONE_STRATEGY,
+						help="how to clone the code samples repository (default: %(default)s)")
+	parser.add_argument("--git-depth", type=int, default=GIT_CLONE_DEPTH, metavar="N",
+						help="commits kept by the shallow strategy (default: %(default)s)")
+	parser.add_argument("--git-mirror", metavar="PATH_OR_URL", default=GIT_MIRROR,
+						help="local mirror folder for the reference strategy, or bare mirror URL for the mirror strategy")
+	parser.add_argument("--track-manifest", metavar="FILE", default=GIT_TRACK_MANIFEST,
+						help="only check out the repository folders listed in FILE, one per line")
+	parser.add_argument("--workers", type=int, default=CHECK_WORKERS, metavar="N",
+						help="checks run at the same time once their prerequisites pass (default: %(default)s)")
+	parser.add_argument("--netbench", action="store_true",
+						help="benchmark DNS, TCP, TLS, time to first byte and throughput of the endpoints the run uses, then exit")
+	parser.add_argument("--netbench-samples", type=int, default=NETBENCH_SAMPLES, metavar="N",
+						help="samples per endpoint for --netbench (default: %(default)s)")
+	parser.add_argument("--netbench-url", metavar="URL", default=NETBENCH_URL,
+						help="download timed by --netbench to measure throughput")
+	parser.add_argument("--netbench-local", action="store_true",
+						help="time downloads from a local stand-in server instead of --netbench-url, for testing")
+	parser.add_argument("--netbench-report", metavar="FILE", default=time.strftime("%Y%m%d%H%M%S") + "_netbench.json",
+						help="JSON report written by --netbench (default: %(default)s)")
+	parser.add_argument("--force", action="store_true",
+						help="run every check even if nothing has changed since the last successful run")
+	parser.add_argument("--template", action="store_true",
+						help="create the virtual environment by cloning a template provisioned with the required libraries")
+	parser.add_argument("--template-dir", metavar="DIR", default=TEMPLATE_ROOT,
+						help="folder holding template environments (default: %(default)s)")
+	parser.add_argument("--wheel-cache", metavar="DIR", default=WHEEL_CACHE_DIR,
+						help="cache of compiled wheels shared between virtual environments, empty to turn off (default: %(default)s)")
+	parser.add_argument("--wheel-seed", metavar="DIR", default=WHEEL_SEED_DIR,
+						help="shared folder of prebuilt wheels to add to the wheel cache")
+	args = parser.parse_args()
+	if args.git_strategy in gitrepo.MIRROR_STRATEGIES and not args.git_mirror:
+		parser.error("--git-strategy %s needs --git-mirror" % args.git_strategy)
+
 	# Environment Variables 
 	python_str = "python"			# Used to execute python interpreter
 	pip_str = "pip"
-	virt_env_name = ""
+	virt_env_name = args.virt_env_name
 	repo_name = "devnet-express-code-samples"
-	if len(sys.argv) > 1:
-		virt_env_name = sys.argv[1]
-	if len(sys.argv) > 2 and sys.argv[2] == "-v":
+	if args.verbose:
 		verbose_logging = True
+		shell.verbose_logging = True
+	shell.default_timeout = CMD_TIMEOUT
+	WHEEL_CACHE_DIR = args.wheel_cache
+	WHEEL_SEED_DIR = args.wheel_seed
+	TEMPLATE_ROOT = args.template_dir
+	GIT_CLONE_STRATEGY = args.git_strategy
+	GIT_CLONE_DEPTH = args.git_depth
+	GIT_MIRROR = args.git_mirror
+	GIT_TRACK_MANIFEST = args.track_manifest
+	PACKAGE_INDEXES = args.index_candidate or PACKAGE_INDEXES
+	GIT_REMOTES = args.git_remote or GIT_REMOTES
+	MIRROR_CACHE_TTL = args.mirror_ttl
+
+	# Record timings, written out however the script exits
+	if args.trace:
+		tracing.enable()
+		atexit.register(save_trace, args.trace)
+
+	# Benchmark mode, measures the network instead of checking the workstation
+	if args.netbench:
+		git_url = GIT_MIRROR if GIT_CLONE_STRATEGY == "mirror" else GIT_REPO
+		sys.exit(0 if run_netbench(get_endpoints(args.index_url, git_url, SPARK_TOKEN), args.netbench_url,
+									args.netbench_samples, args.netbench_report, args.netbench_local) else 1)
+
+	# Skip the workstation checks when nothing has changed since the last successful run
+	unchanged = False
+	env_root = os.curdir if in_virt_env(virt_env_name) else virt_env_name
+	repo_path = os.path.join(env_root, repo_name)
+	fingerprint_inputs = [os.path.abspath(__file__), args.requirements, args.lockfile]
+	if args.track_manifest:
+		fingerprint_inputs.append(args.track_manifest)
+	if not args.force and fsprobe.probe_path(os.path.join(env_root, "pyvenv.cfg")).is_file:
+		saved_fingerprint = fingerprint.read(env_root)
+		current_fingerprint = fingerprint.compute(env_root, fingerprint_inputs, repo_path)
+		if saved_fingerprint and not fingerprint.changed_components(saved_fingerprint, current_fingerprint):
+			print(u"\nNothing has changed since the last successful check at %s, checking the network and Spark token only" % time.ctime(saved_fingerprint["saved_at"]))
+			print(u"%s" % text_colour("Run with --force to check everything again","magenta"))
+			unchanged = True
+		if saved_fingerprint and verbose_logging:
+			print(u"\nChanged since the last successful check: %s" % ", ".join(fingerprint.changed_components(saved_fingerprint, current_fingerprint)))
+
+	# Results shared between checks
+	workstation = {"python_str": python_str, "pip_path": False, "required_libraries": [],
+					"locked": False, "with_hashes": False, "git_installed": False}
 
 	# Check Network Connectivity
-	print(u"\nChecking Network Connectivity...\n")
-	net_connected = check_network(REMOTE_SERVER, REMOTE_PORT)
-	if not net_connected:
-		exit()
+	def run_network_check():
+		print(u"\nChecking Network Connectivity...\n")
+		git_url = GIT_MIRROR if GIT_CLONE_STRATEGY == "mirror" else GIT_REPO
+		package_sources = get_url_endpoints([args.index_url]) + [(REMOTE_SERVER, REMOTE_PORT)]
+		return check_endpoints(get_endpoints(args.index_url, git_url, SPARK_TOKEN), package_sources)
+
+	# Prefer a room wheelhouse for package installs
+	def run_wheelhouse_check():
+		global pip_source_opts
+		print(u"\nChecking Wheelhouse...\n")
+		pip_source_opts = select_package_source(args.index_url, args.find_links, PACKAGE_INDEXES)
+		return True
 
 	# Check Python Installation
-	print(u"\nChecking Python installation...\n")
-	python_str = check_python_version(userPython.major, userPython.minor, userPlatform)
-	if python_str == False:
-		exit()
+	def run_python_check():
+		print(u"\nChecking Python installation...\n")
+		workstation["python_str"] = check_python_version(userPython.major, userPython.minor, userPlatform)
+		return workstation["python_str"]
+
+	def run_tools_check():
+		# Run the independent tool version probes together, later checks read them from the cache
+		run_cmds_cached([("pip --version", [PIP_INVENTORY_TAG]),
+						("pip3 --version", [PIP_INVENTORY_TAG]),
+						("git --version", [])], MAX_CONCURRENCY, PROBE_TIMEOUT)
 
-	if REMEDIATION:
 		# Check for Python Libraries required for Virtual Environment Installation
 		print(u"\nChecking for Virtual Environment Python Library...\n")
-		required_libraries = ["virtualenv","requests","wheel"]
-		virt_env_installed = check_python_libraries(required_libraries, userPlatform, False)
+		required_libraries = lockfile.parse_requirements(["virtualenv","requests","wheel"])
 
-		# Condition if pip not installed, virtual environment creation failed
-		if not virt_env_installed:
-			# Logging not yet implemented
-			#print(u"\nLogfile name is %s" % text_colour(log_file,"blue"))
-			exit()
+		return check_python_libraries(required_libraries, userPlatform, False)
 
 	# Create Virtual Environment
-	print(u"\nChecking for Python Virtual Environment...\n")
-	
-	pip_path = create_virt_env(virt_env_name, userPlatform, python_str)
-	if pip_path:
-		print(u"\nPIP PATH = %s\n" % text_colour(pip_path,"magenta"))
+	def run_virt_env_check():
+		print(u"\nChecking for Python Virtual Environment...\n")
+
+		# Required libraries, the lockfile pins while they still meet the requirements
+		workstation["required_libraries"], workstation["locked"], workstation["with_hashes"] = \
+			load_requirements(args.requirements, args.lockfile, workstation["python_str"])
+
+		workstation["pip_path"] = create_virt_env(virt_env_name, userPlatform, workstation["python_str"],
+										workstation["required_libraries"] if args.template else None,
+										workstation["locked"], workstation["with_hashes"])
+		if workstation["pip_path"]:
+			print(u"\nPIP PATH = %s\n" % text_colour(workstation["pip_path"],"magenta"))
+
+		# Libraries are checked outside of a missing Virtual Environment, so this never stops later checks
+		return True
 
 	# Check Python Libraries Installation
-	required_libraries = ["wheel",
-							"requests",
-							"netaddr",
-							"pyang",
-							"ncclient",
-							"cffi",
-							"cryptography",
-							"enum34",
-							"idna",
-							"ipaddress",
-							"lxml",
-							"netaddr",
-							"paramiko",
-							"pyasn1",
-							"pycparser",
-							"setuptools",
-							"six"]
-	print(u"\nChecking Python Libraries...\n")
-	libraries_installed = check_python_libraries(required_libraries, userPlatform, pip_path)
+	def run_libraries_check():
+		if args.lock:
+			print(u"\nLocking Python Libraries...\n")
+			if lock_libraries(args.requirements, args.lockfile, workstation["pip_path"] or "pip3"):
+				workstation["required_libraries"], workstation["locked"], workstation["with_hashes"] = \
+					load_requirements(args.requirements, args.lockfile, workstation["python_str"])
+		print(u"\nChecking Python Libraries...\n")
+		return check_python_libraries(workstation["required_libraries"], userPlatform, workstation["pip_path"],
+										workstation["locked"], workstation["with_hashes"])
 
 	# Check Cisco Spark APIs
-	if SPARK_TOKEN:
-		try: 
+	def run_spark_check():
+		global spark
+		try:
 			import spark
 			print(u"\nChecking Cisco Spark...\n")
-			check_spark(SPARK_TOKEN)
+			return check_spark(SPARK_TOKEN)
 		except Exception as e:
 			print(e)
+			return False
 
-	# Check Git installed and repository up to date
-	print(u"\nChecking Git Installation and DevNet Express Repository...\n")
-	git_installed = check_git(GIT_REPO, repo_name, virt_env_name, userPlatform)
+	# Check Git installed and repository up to date, cloned into the Virtual Environment folder
+	def run_git_check():
+		print(u"\nChecking Git Installation and DevNet Express Repository...\n")
+		workstation["git_installed"] = check_git(GIT_REPO, repo_name, virt_env_name, userPlatform)
+		return workstation["git_installed"]
+
+	# Checks in report order, each starts once the checks it requires have passed
+	checks = [scheduler.Check("network", run_network_check, [])]
+
+	# Every pip install waits for the package source to be picked
+	install_requires = ["python"]
+	if args.index_url or args.find_links or PACKAGE_INDEXES:
+		checks.append(scheduler.Check("wheelhouse", run_wheelhouse_check, ["network"]))
+		install_requires.append("wheelhouse")
+	checks.append(scheduler.Check("python", run_python_check, ["network"]))
+	virt_env_requires = list(install_requires)
+	if REMEDIATION:
+		checks.append(scheduler.Check("tools", run_tools_check, install_requires))
+		virt_env_requires.append("tools")
+	checks.append(scheduler.Check("virtual environment", run_virt_env_check, virt_env_requires))
+	checks.append(scheduler.Check("libraries", run_libraries_check, ["virtual environment"]))
+	if SPARK_TOKEN:
+		checks.append(scheduler.Check("spark", run_spark_check, ["network"]))
+	checks.append(scheduler.Check("git", run_git_check, ["network", "virtual environment"]))
+
+	# The fingerprint covers the workstation, the network and the Spark token are always checked
+	if unchanged:
+		checks = [check for check in checks if check.name in ("network", "spark")]
+
+	start = time.time()
+	check_results = scheduler.run_checks(checks, args.workers)
+	if verbose_logging:
+		path_seconds, path = scheduler.critical_path(checks, check_results)
+		print(u"\nChecks finished in %.1f seconds, critical path %.1f seconds (%s)" % (time.time() - start, path_seconds, " > ".join(path)))
+		for result in check_results:
+			print(u"\t%-20s %-10s %.1f seconds" % (result.name, result.status, result.seconds))
+
+	pip_path = workstation["pip_path"]
+	git_installed = workstation["git_installed"]
+	required_libraries = workstation["required_libraries"]
+
+	# Remember a fully successful run, so an unchanged workstation is not checked again
+	if not unchanged and fsprobe.probe_path(os.path.join(env_root, "pyvenv.cfg")).is_file:
+		env_ready = all(result.status == scheduler.PASSED for result in check_results) and pip_path and git_installed \
+					and not lockfile.unsatisfied(required_libraries, get_package_inventory(pip_path) or {})
+		if env_ready:
+			fingerprint.write(env_root, fingerprint.compute(env_root, fingerprint_inputs, repo_path))
+		else:
+			fingerprint.remove(env_root)
+
+	# Report how much work the command cache saved
+	if verbose_logging:
+		cache_stats = shell.get_cmd_cache_stats()
+		print(u"\nCommand cache: %d hits, %d misses, %d invalidated" % (cache_stats["hits"], cache_stats["misses"], cache_stats["invalidated"]))
 
 	# Logging not yet implemented
 	#print(u"\nLogfile name is %s" % text_colour(log_file,"blue"))
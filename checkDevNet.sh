@@ -22,7 +22,12 @@ else
 	# Run Python Script to check for Python version and Library requirements
 	cur_dir=$(echo "${PWD##*/}")
 	cd ..
-	python3 $cur_dir/checkDevNet.py $virt_env || python $cur_dir/checkDevNet.py $virt_env
+	# Only fall back to python when there is no python3, a failed check is not run twice
+	if command -v python3 > /dev/null 2>&1 ; then
+		python3 $cur_dir/checkDevNet.py $virt_env "${@:2}"
+	else
+		python $cur_dir/checkDevNet.py $virt_env "${@:2}"
+	fi
 
 	echo ""
 	echo "Python script finished execution"
@@ -0,0 +1,193 @@
+#####################################################################
+#																	#
+#	Module: 		fingerprint.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Environment fingerprint, recomputed from file 	#
+#					metadata to skip re-checking an unchanged		#
+#					workstation										#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for reading file metadata
+import os
+import sys
+import hashlib
+
+# Used for storing the fingerprint
+import json
+import time
+
+# Used for finding site-packages folders
+import inventory
+
+# Used for reading the checked out commit
+import gitrepo
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Fingerprint file written into the virtual environment
+FINGERPRINT_FILE = ".checkdevnet-fingerprint.json"
+
+# Version of the fingerprint layout, a change invalidates older files
+FORMAT_VERSION = 1
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		compute
+
+Description:	Computes an environment fingerprint using only stat calls and small file reads.
+				Each component is a digest, so a changed component can be named.
+
+Arguments:		env_root 		- virtual environment folder
+				input_files 	- list of files the check depends on, i.e. requirements, lockfile and the checker
+				repo_path 		- git working tree checked by the checker
+
+Return:			result 			- dictionary of component name to digest
+"""
+def compute(env_root, input_files, repo_path):
+
+	env_python = None
+	for candidate in [os.path.join(env_root, "bin", "python"), os.path.join(env_root, "Scripts", "python.exe")]:
+		if os.path.exists(candidate):
+			env_python = candidate
+			break
+
+	interpreter = [sys.executable, sys.version, _stat_key(os.path.realpath(env_python) if env_python else None),
+					_file_digest(os.path.join(env_root, "pyvenv.cfg"))]
+
+	# Installing, upgrading or removing a package adds, renames or touches its metadata folder
+	metadata = []
+	for site_dir in inventory.find_site_packages(env_root):
+		for name, mtime in _metadata_entries(site_dir):
+			metadata.append("%s %s" % (name, mtime))
+
+	inputs = ["%s %s" % (path, _file_digest(path)) for path in input_files]
+
+	return {"version": FORMAT_VERSION,
+			"interpreter": _digest(interpreter),
+			"site_packages": _digest(sorted(metadata)),
+			"inputs": _digest(inputs),
+			"repository": gitrepo.inspect(repo_path).head}
+
+
+
+"""
+Function: 		read
+
+Description:	Reads the fingerprint saved in an environment.
+
+Arguments:		env_root 	- virtual environment folder
+
+Return:			result 		- saved dictionary including its 'saved_at' time, None if there is none
+"""
+def read(env_root):
+
+	try:
+		with open(os.path.join(env_root, FINGERPRINT_FILE)) as fingerprint_file:
+			return json.load(fingerprint_file)
+	except (IOError, OSError, ValueError):
+		return None
+
+
+
+"""
+Function: 		write
+
+Description:	Saves a fingerprint into an environment after a successful check.
+
+Arguments:		env_root 		- virtual environment folder
+				fingerprint 	- dictionary from compute
+
+Return:			None
+"""
+def write(env_root, fingerprint):
+
+	saved = dict(fingerprint)
+	saved["saved_at"] = time.time()
+	with open(os.path.join(env_root, FINGERPRINT_FILE), "w") as fingerprint_file:
+		json.dump(saved, fingerprint_file, indent=1, sort_keys=True)
+
+
+
+"""
+Function: 		changed_components
+
+Description:	Compares a saved fingerprint with a freshly computed one.
+
+Arguments:		saved 		- dictionary from read, or None
+				current 	- dictionary from compute
+
+Return:			result 		- list of changed component names, empty if nothing changed
+"""
+def changed_components(saved, current):
+
+	if not saved:
+		return sorted(current)
+	return sorted(name for name in current if saved.get(name) != current[name])
+
+
+
+"""
+Function: 		remove
+
+Description:	Deletes the fingerprint of an environment, so the next run checks everything.
+
+Arguments:		env_root 	- virtual environment folder
+
+Return:			None
+"""
+def remove(env_root):
+
+	try:
+		os.remove(os.path.join(env_root, FINGERPRINT_FILE))
+	except OSError:
+		pass
+
+
+
+def _metadata_entries(site_dir):
+
+	entries = []
+	for name in os.listdir(site_dir):
+		if name.endswith((".dist-info", ".egg-info", ".egg-link", ".pth")):
+			try:
+				entries.append((name, os.stat(os.path.join(site_dir, name)).st_mtime))
+			except OSError:
+				pass
+	return entries
+
+
+
+def _stat_key(path):
+
+	try:
+		stat = os.stat(path)
+		return "%s %d %s" % (path, stat.st_size, stat.st_mtime)
+	except (OSError, TypeError):
+		return None
+
+
+
+def _file_digest(path):
+
+	try:
+		with open(path, "rb") as input_file:
+			return hashlib.sha256(input_file.read()).hexdigest()
+	except (IOError, OSError):
+		return None
+
+
+
+def _digest(values):
+
+	return hashlib.sha256("\n".join(str(value) for value in values).encode("utf-8")).hexdigest()
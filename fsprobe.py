@@ -0,0 +1,168 @@
+#####################################################################
+#																	#
+#	Module: 		fsprobe.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	In-process filesystem checks used in place of 	#
+#					shelling out to ls/dir/pwd						#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for filesystem access
+import os
+import stat
+
+# Used for typed probe results
+import collections
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Result of probing a single path
+PathProbe = collections.namedtuple("PathProbe", ["path", "exists", "is_dir", "is_file", "is_executable"])
+
+# File extensions Windows treats as executable
+if os.name == "nt":
+	executable_exts = [ext.lower() for ext in os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD").split(";") if ext]
+else:
+	executable_exts = []
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		probe_path
+
+Description:	Stats a single path without starting a process.
+
+Arguments:		path 	- file or directory path to check
+
+Return:			result 	- PathProbe tuple (path, exists, is_dir, is_file, is_executable)
+"""
+def probe_path(path):
+
+	try:
+		mode = os.stat(path).st_mode
+	except OSError:
+		return PathProbe(path, False, False, False, False)
+
+	is_dir = stat.S_ISDIR(mode)
+	is_file = stat.S_ISREG(mode)
+	return PathProbe(path, True, is_dir, is_file, is_file and _is_executable(path))
+
+
+
+"""
+Function: 		list_dir
+
+Description:	Lists a directory in-process, replacing 'ls' and 'dir'.
+				Uses os.scandir where available so most entries need no extra stat call.
+
+Arguments:		path 	- directory to list, defaults to the current directory
+
+Return:			result 	- dictionary of entry name to PathProbe, empty if path is not a directory
+"""
+def list_dir(path="."):
+
+	entries = {}
+	try:
+		if hasattr(os, "scandir"):
+			for entry in os.scandir(path):
+				is_dir = entry.is_dir()
+				is_file = entry.is_file()
+				entries[entry.name] = PathProbe(entry.path, True, is_dir, is_file,
+												is_file and _is_executable(entry.path))
+		else:
+			for name in os.listdir(path):
+				entries[name] = probe_path(os.path.join(path, name))
+	except OSError:
+		pass
+
+	return entries
+
+
+
+"""
+Function: 		current_dir
+
+Description:	Returns the current working directory, replacing 'pwd' and 'cd'.
+
+Arguments:		None
+
+Return:			result 	- absolute path of the current working directory
+"""
+def current_dir():
+
+	return os.getcwd()
+
+
+
+"""
+Function: 		state_dir
+
+Description:	Returns a path in the per-user folder checkDevNet keeps its caches and state in,
+				under LOCALAPPDATA on Windows and XDG_CACHE_HOME (~/.cache) elsewhere.
+
+Arguments:		names 	- path components below the folder
+
+Return:			result 	- folder or file path, not created
+"""
+def state_dir(*names):
+
+	if os.name == "nt":
+		base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+	else:
+		base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(base, "checkdevnet", *names)
+
+
+
+"""
+Function: 		find_executable
+
+Description:	Looks for an executable with the given base name in a directory.
+				On Windows the PATHEXT extensions are tried as well (python -> python.exe).
+
+Arguments:		directory 	- directory to search
+				name 		- executable name without extension
+
+Return:			result 		- PathProbe of the executable found, or None
+"""
+def find_executable(directory, name):
+
+	for candidate in executable_names(name):
+		result = probe_path(os.path.join(directory, candidate))
+		if result.is_executable:
+			return result
+
+	return None
+
+
+
+"""
+Function: 		executable_names
+
+Description:	Returns the file names an executable may have on this platform,
+				i.e. 'python' and, on Windows, 'python.exe', 'python.bat' and so on.
+
+Arguments:		name 	- executable name without extension
+
+Return:			result 	- list of file names, the bare name first
+"""
+def executable_names(name):
+
+	return [name] + [name + ext for ext in executable_exts]
+
+
+
+def _is_executable(path):
+
+	if executable_exts:
+		return os.path.splitext(path)[1].lower() in executable_exts
+	return os.access(path, os.X_OK)
@@ -0,0 +1,441 @@
+#####################################################################
+#																	#
+#	Module: 		gitrepo.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Git clone and pull commands for the code 		#
+#					samples repository								#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for reading the .git folder
+import os
+import re
+import collections
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# How the repository is cloned
+#	full 		- whole history
+#	shallow 	- only the last commits, see depth
+#	blobless 	- whole history, file contents fetched only for the checked out commit
+#	reference 	- objects copied from a local mirror, the rest from the repository
+#	mirror 		- cloned from, and later pulled from, a LAN or file:// bare mirror
+CLONE_STRATEGIES = ["full", "shallow", "blobless", "reference", "mirror"]
+
+# Strategies that need a mirror path or URL
+MIRROR_STRATEGIES = ["reference", "mirror"]
+
+# Checkout state read from the .git folder, commits are hex strings or None
+#	head 		- checked out commit
+#	branch 		- checked out branch, None when detached
+#	remote 		- remote the branch pulls from, i.e. origin
+#	merge_ref 	- remote branch the branch pulls from, i.e. refs/heads/master
+#	upstream 	- last fetched commit of that remote branch
+#	shallow 	- whether the clone is shallow
+RepoState = collections.namedtuple("RepoState", ["head", "branch", "remote", "merge_ref", "upstream", "shallow"])
+
+# Section header in .git/config, i.e. [core] or [remote "origin"]
+config_section_pattern = re.compile(r'^\[\s*([^\s\]"]+)(?:\s+"([^"]*)")?\s*\]')
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		clone_command
+
+Description:	Builds the git clone command for a clone strategy.
+
+Arguments:		url 		- repository URL
+				path 		- folder to clone into
+				strategy 	- one of CLONE_STRATEGIES
+				depth 		- number of commits kept by the shallow strategy
+				mirror 		- local mirror folder (reference) or mirror URL (mirror)
+				sparse 		- start with a cone-mode sparse checkout
+
+Return:			result 		- command string
+"""
+def clone_command(url, path, strategy="full", depth=1, mirror="", sparse=False):
+
+	options = clone_options(strategy, depth, mirror)
+	if sparse:
+		# Only the files at the top of the tree until sparse_set_command adds folders
+		options += " --sparse"
+	if strategy == "mirror":
+		url = mirror
+	return 'git clone%s %s "%s"' % (options, url, path)
+
+
+
+"""
+Function: 		clone_options
+
+Description:	Returns the git clone options for a clone strategy.
+
+Arguments:		strategy 	- one of CLONE_STRATEGIES
+				depth 		- number of commits kept by the shallow strategy
+				mirror 		- local mirror folder, used by the reference strategy
+
+Return:			result 		- option string, starting with a space unless empty
+"""
+def clone_options(strategy, depth=1, mirror=""):
+
+	if strategy not in CLONE_STRATEGIES:
+		raise ValueError("Unknown clone strategy '%s'" % strategy)
+	if strategy in MIRROR_STRATEGIES and not mirror:
+		raise ValueError("The %s clone strategy needs a mirror" % strategy)
+
+	if strategy == "shallow":
+		return " --depth %d" % depth
+	if strategy == "blobless":
+		return " --filter=blob:none"
+	if strategy == "reference":
+		# Objects are copied out of the mirror, so the clone keeps working if the mirror goes away
+		return ' --reference-if-able "%s" --dissociate' % mirror
+	return ""
+
+
+
+"""
+Function: 		set_remote_command
+
+Description:	Builds the command pointing a remote of an existing clone at another URL,
+				e.g. a faster mirror of the same repository.
+
+Arguments:		path 	- repository folder
+				remote 	- remote name, i.e. origin
+				url 	- new remote URL
+
+Return:			result 	- command string
+"""
+def set_remote_command(path, remote, url):
+
+	return 'git -C "%s" remote set-url %s "%s"' % (path, remote, url)
+
+
+
+"""
+Function: 		read_manifest
+
+Description:	Reads a track manifest, the repository folders a track needs, one per line.
+				Blank lines and lines starting with '#' are skipped.
+
+Arguments:		path 	- manifest file path
+
+Return:			result 	- sorted list of folder paths using '/'
+"""
+def read_manifest(path):
+
+	folders = set()
+	with open(path) as manifest_file:
+		for line in manifest_file:
+			folder = line.split("#")[0].strip().replace("\\", "/").strip("/")
+			if folder:
+				folders.add(folder)
+
+	return sorted(folders)
+
+
+
+"""
+Function: 		sparse_paths
+
+Description:	Reads the folders a cone-mode sparse checkout includes from the .git folder,
+				without running git.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- sorted list of folder paths, None if the checkout is not sparse
+"""
+def sparse_paths(path):
+
+	if read_config(path).get("core.sparsecheckout", "false").lower() != "true":
+		return None
+
+	try:
+		with open(os.path.join(path, ".git", "info", "sparse-checkout")) as sparse_file:
+			patterns = [line.strip() for line in sparse_file if line.strip()]
+	except (IOError, OSError):
+		return None
+
+	# Cone patterns list each parent folder too, followed by '!/parent/*/' to leave out its other folders
+	excluded_parents = set(pattern[1:-len("*/")] for pattern in patterns if pattern.startswith("!") and pattern.endswith("/*/"))
+	folders = [pattern.strip("/") for pattern in patterns
+				if not pattern.startswith("!") and pattern not in ("/*", "/") and pattern not in excluded_parents]
+	return sorted(folders)
+
+
+
+"""
+Function: 		cone_folders
+
+Description:	Returns the folders a cone-mode sparse checkout keeps for a list of folders.
+				Cone mode includes whole folders, so a folder inside another listed folder is dropped.
+
+Arguments:		folders 	- list of folder paths using '/'
+
+Return:			result 		- sorted list of folder paths
+"""
+def cone_folders(folders):
+
+	folders = sorted(set(folders))
+	return [folder for folder in folders
+			if not any(folder.startswith(other + "/") for other in folders)]
+
+
+
+"""
+Function: 		sparse_set_command
+
+Description:	Builds the command changing a checkout to only the given folders (cone mode).
+				Works on full and sparse checkouts, without cloning again.
+
+Arguments:		path 		- repository folder
+				folders 	- list of folder paths
+
+Return:			result 		- command string
+"""
+def sparse_set_command(path, folders):
+
+	return 'git -C "%s" sparse-checkout set --cone %s' % (path, " ".join('"%s"' % folder for folder in folders))
+
+
+
+"""
+Function: 		sparse_disable_command
+
+Description:	Builds the command restoring the whole working tree of a sparse checkout.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- command string
+"""
+def sparse_disable_command(path):
+
+	return 'git -C "%s" sparse-checkout disable' % path
+
+
+
+"""
+Function: 		read_config
+
+Description:	Reads a repository's .git/config, and the config.worktree that sparse-checkout
+				writes to, without running git.
+				Keys are lower case 'section.key' or 'section.subsection.key'.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- dictionary of key to value, empty if the file is missing
+"""
+def read_config(path):
+
+	config = {}
+	for name in ["config", "config.worktree"]:
+		section = ""
+		try:
+			with open(os.path.join(path, ".git", name)) as config_file:
+				for line in config_file:
+					line = line.strip()
+					match = config_section_pattern.match(line)
+					if match:
+						section = match.group(1).lower()
+						if match.group(2) is not None:
+							section += "." + match.group(2)
+						continue
+					key, sep, value = line.partition("=")
+					if sep and section and not line.startswith(("#", ";")):
+						config["%s.%s" % (section, key.strip().lower())] = value.strip().strip('"')
+		except (IOError, OSError):
+			pass
+
+	return config
+
+
+
+"""
+Function: 		inspect
+
+Description:	Reads the checkout state from HEAD, refs, packed-refs and config in the
+				.git folder, without running git.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- RepoState tuple, head is None if the repository is missing or empty
+"""
+def inspect(path):
+
+	git_dir = os.path.join(path, ".git")
+	head = _read_text(os.path.join(git_dir, "HEAD"))
+	branch = None
+	if head and head.startswith("ref:"):
+		ref = head[len("ref:"):].strip()
+		branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else None
+		head = read_ref(path, ref)
+
+	config = read_config(path)
+	remote = config.get("branch.%s.remote" % branch, "origin")
+	merge_ref = config.get("branch.%s.merge" % branch) if branch else None
+	upstream = None
+	if merge_ref and merge_ref.startswith("refs/heads/"):
+		upstream = read_ref(path, "refs/remotes/%s/%s" % (remote, merge_ref[len("refs/heads/"):]))
+
+	return RepoState(head, branch, remote, merge_ref, upstream, os.path.isfile(os.path.join(git_dir, "shallow")))
+
+
+
+"""
+Function: 		read_ref
+
+Description:	Resolves a ref such as refs/heads/master from the loose ref file or packed-refs.
+
+Arguments:		path 	- repository folder
+				ref 	- full ref name
+
+Return:			result 	- commit hash, None if the ref does not exist
+"""
+def read_ref(path, ref):
+
+	git_dir = os.path.join(path, ".git")
+	commit = _read_text(os.path.join(git_dir, *ref.split("/")))
+	if commit and commit.startswith("ref:"):
+		return read_ref(path, commit[len("ref:"):].strip())
+	if commit:
+		return commit
+
+	# Refs are moved into packed-refs by git gc and by clones
+	packed = _read_text(os.path.join(git_dir, "packed-refs")) or ""
+	for line in packed.splitlines():
+		fields = line.split()
+		if len(fields) == 2 and fields[1] == ref:
+			return fields[0]
+
+	return None
+
+
+
+"""
+Function: 		ls_remote_command
+
+Description:	Builds the command asking the remote for the tip of the branch being pulled.
+				A single round-trip, no objects are transferred.
+
+Arguments:		path 	- repository folder
+				state 	- RepoState from inspect
+
+Return:			result 	- command string
+"""
+def ls_remote_command(path, state):
+
+	return 'git -C "%s" ls-remote %s %s' % (path, state.remote, state.merge_ref or "HEAD")
+
+
+
+"""
+Function: 		parse_ls_remote
+
+Description:	Reads the commit from ls-remote output.
+
+Arguments:		lines 	- output lines of ls_remote_command
+
+Return:			result 	- commit hash, None if the remote did not answer
+"""
+def parse_ls_remote(lines):
+
+	for line in lines:
+		fields = line.split()
+		if len(fields) == 2 and re.match(r"^[0-9a-f]{40,64}$", fields[0]):
+			return fields[0]
+
+	return None
+
+
+
+"""
+Function: 		fetch_command
+
+Description:	Builds the command fetching the branch being pulled. Clones keep their
+				strategy without extra options: a blobless clone records its filter in the
+				repository config, a shallow clone stays shallow and only fetches the new
+				commits (a --depth here would cut them off from the local history and break
+				the ahead/behind counts), and a mirror clone fetches from the mirror.
+
+Arguments:		path 	- repository folder
+				state 	- RepoState from inspect
+
+Return:			result 	- command string
+"""
+def fetch_command(path, state):
+
+	return 'git -C "%s" fetch %s' % (path, state.remote)
+
+
+
+"""
+Function: 		fast_forward_command
+
+Description:	Builds the command moving the branch to its fetched upstream, only if
+				that needs no merge.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- command string
+"""
+def fast_forward_command(path):
+
+	return 'git -C "%s" merge --ff-only @{upstream}' % path
+
+
+
+"""
+Function: 		status_command
+
+Description:	Builds the command reporting ahead/behind counts and local changes.
+				Runs locally, untracked files are not listed.
+
+Arguments:		path 	- repository folder
+
+Return:			result 	- command string
+"""
+def status_command(path):
+
+	return 'git -C "%s" status --porcelain=v2 --branch --untracked-files=no' % path
+
+
+
+"""
+Function: 		parse_status
+
+Description:	Reads status_command output.
+
+Arguments:		lines 	- output lines of status_command
+
+Return:			result 	- tuple of (commits ahead, commits behind, whether tracked files are changed)
+"""
+def parse_status(lines):
+
+	ahead, behind, dirty = 0, 0, False
+	for line in lines:
+		if line.startswith("# branch.ab "):
+			counts = line.split()
+			ahead, behind = int(counts[2].lstrip("+")), int(counts[3].lstrip("-"))
+		elif line[:2] in ("1 ", "2 ", "u "):
+			dirty = True
+
+	return ahead, behind, dirty
+
+
+
+def _read_text(path):
+
+	try:
+		with open(path) as text_file:
+			return text_file.read().strip() or None
+	except (IOError, OSError):
+		return None
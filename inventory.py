@@ -0,0 +1,255 @@
+#####################################################################
+#																	#
+#	Module: 		inventory.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Installed Python package inventory read from 	#
+#					site-packages metadata or pip JSON output		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for finding site-packages folders
+import os
+import glob
+
+# Used for normalising package names and parsing pip output
+import re
+import json
+
+# Distribution metadata reader requires Python 3.8+
+try:
+	import importlib.metadata as importlib_metadata
+except ImportError:
+	importlib_metadata = None
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Runs of these characters are equivalent in package names (PEP 503)
+name_separators = re.compile(r"[-_.]+")
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		normalize_name
+
+Description:	Normalises a package name per PEP 503, so 'PyYAML', 'pyyaml' and
+				'py_yaml' give the same key.
+
+Arguments:		name 	- package name
+
+Return:			result 	- normalised package name
+"""
+def normalize_name(name):
+
+	return name_separators.sub("-", name).lower()
+
+
+
+"""
+Function: 		env_root_from_pip
+
+Description:	Returns the environment folder a pip executable belongs to,
+				i.e. 'myenv' for 'myenv/bin/pip' or 'myenv\\Scripts\\pip'.
+
+Arguments:		pip_path 	- path to a pip executable
+
+Return:			result 		- environment folder, or None if pip_path is not a path
+"""
+def env_root_from_pip(pip_path):
+
+	scripts_dir = os.path.dirname(pip_path)
+	if not scripts_dir:
+		return None
+	return os.path.dirname(os.path.abspath(scripts_dir))
+
+
+
+"""
+Function: 		find_site_packages
+
+Description:	Finds the site-packages folders of a Python environment.
+
+Arguments:		env_root 	- environment folder
+
+Return:			result 		- list of site-packages folders, empty if none exist
+"""
+def find_site_packages(env_root):
+
+	patterns = [os.path.join(env_root, "Lib", "site-packages"),
+				os.path.join(env_root, "lib", "python*", "site-packages"),
+				os.path.join(env_root, "lib64", "python*", "site-packages")]
+
+	site_dirs = []
+	for pattern in patterns:
+		for path in sorted(glob.glob(pattern)):
+			real_path = os.path.realpath(path)
+			if os.path.isdir(path) and real_path not in [os.path.realpath(d) for d in site_dirs]:
+				site_dirs.append(path)
+
+	return site_dirs
+
+
+
+"""
+Function: 		read_pyvenv_cfg
+
+Description:	Reads the pyvenv.cfg written by venv and virtualenv.
+
+Arguments:		env_root 	- environment folder
+
+Return:			result 		- dictionary of settings, empty if the file is missing
+"""
+def read_pyvenv_cfg(env_root):
+
+	settings = {}
+	try:
+		with open(os.path.join(env_root, "pyvenv.cfg")) as cfg_file:
+			for line in cfg_file:
+				key, sep, value = line.partition("=")
+				if sep:
+					settings[key.strip().lower()] = value.strip()
+	except (IOError, OSError):
+		pass
+
+	return settings
+
+
+
+"""
+Function: 		env_python_version
+
+Description:	Returns the Python version an environment was created for,
+				without starting its interpreter.
+
+Arguments:		env_root 	- environment folder
+
+Return:			result 		- version string such as '3.6.8', or None if unknown
+"""
+def env_python_version(env_root):
+
+	settings = read_pyvenv_cfg(env_root)
+	for key in ["version", "version_info"]:
+		if settings.get(key):
+			return settings[key]
+
+	# Fall back to the lib/pythonX.Y folder name
+	for site_dir in find_site_packages(env_root):
+		match = re.search(r"python(\d+\.\d+)", site_dir)
+		if match:
+			return match.group(1)
+
+	return None
+
+
+
+"""
+Function: 		scan_site_packages
+
+Description:	Builds a package inventory from distribution metadata in site-packages.
+				Uses importlib.metadata where available, otherwise the dist-info and
+				egg-info folder names and PKG-INFO files.
+
+Arguments:		site_dirs 	- list of site-packages folders
+
+Return:			result 		- dictionary of normalised package name to version
+"""
+def scan_site_packages(site_dirs):
+
+	installed = {}
+
+	if importlib_metadata is not None:
+		for dist in importlib_metadata.distributions(path=list(site_dirs)):
+			name = dist.metadata["Name"]
+			if name:
+				installed.setdefault(normalize_name(name), dist.version)
+		return installed
+
+	for site_dir in site_dirs:
+		for entry in sorted(os.listdir(site_dir)):
+			name, version = _parse_metadata_entry(site_dir, entry)
+			if name:
+				installed.setdefault(normalize_name(name), version)
+
+	return installed
+
+
+
+"""
+Function: 		parse_pip_list
+
+Description:	Builds a package inventory from 'pip list' output.
+				Reads '--format=json' output, and falls back to the older
+				'name (version)' and column formats.
+
+Arguments:		lines 	- output lines from pip list
+
+Return:			result 	- dictionary of normalised package name to version
+"""
+def parse_pip_list(lines):
+
+	installed = {}
+
+	try:
+		for package in json.loads("".join(lines)):
+			installed[normalize_name(package["name"])] = package["version"]
+		return installed
+	except (ValueError, TypeError, KeyError):
+		pass
+
+	for line in lines:
+		fields = line.replace("(", " ").replace(")", " ").replace(",", " ").split()
+		if len(fields) < 2 or fields[0] == "Package" or fields[0].startswith("-"):
+			continue
+		installed[normalize_name(fields[0])] = fields[1]
+
+	return installed
+
+
+
+def _parse_metadata_entry(site_dir, entry):
+
+	if entry.endswith(".dist-info"):
+
+		# Folder name is {name}-{version}.dist-info, name has '-' escaped to '_'
+		name, sep, version = entry[:-len(".dist-info")].rpartition("-")
+		if sep:
+			return name, version
+		return _read_pkg_info(os.path.join(site_dir, entry, "METADATA"))
+
+	if entry.endswith(".egg-info"):
+
+		# Folder or file, name and version are read from PKG-INFO
+		path = os.path.join(site_dir, entry)
+		if os.path.isdir(path):
+			path = os.path.join(path, "PKG-INFO")
+		return _read_pkg_info(path)
+
+	return None, None
+
+
+
+def _read_pkg_info(path):
+
+	name = None
+	version = None
+	try:
+		with open(path) as metadata_file:
+			for line in metadata_file:
+				if not line.strip():
+					break
+				if line.startswith("Name:"):
+					name = line[len("Name:"):].strip()
+				elif line.startswith("Version:"):
+					version = line[len("Version:"):].strip()
+	except (IOError, OSError):
+		pass
+
+	return name, version
@@ -0,0 +1,432 @@
+#####################################################################
+#																	#
+#	Module: 		lockfile.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Requirements and lockfile reading, and version 	#
+#					specifier matching against installed packages	#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for parsing requirement lines and versions
+import re
+import collections
+
+# Used for generating lockfiles
+import os
+import json
+import tempfile
+
+# Used for normalising package names
+import inventory
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# A requirement line, name is as written and key is the normalised name.
+# matches is the compiled specifier, a function taking an installed version string
+Requirement = collections.namedtuple("Requirement", ["name", "key", "specifier", "hashes", "matches"])
+
+# Requirement line, i.e. 'lxml[html]>=4.2,<5 --hash=sha256:...'
+requirement_pattern = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$")
+hash_pattern = re.compile(r"--hash[=\s]\s*(\S+)")
+clause_pattern = re.compile(r"^(~=|===|==|!=|<=|>=|<|>)\s*(\S+)$")
+
+# PEP 440 version, including the alternative spellings it allows
+version_pattern = re.compile(r"""^\s*v?
+	(?:(\d+)!)?											# epoch
+	(\d+(?:\.\d+)*)										# release
+	(?:[-_.]?(a|b|c|rc|alpha|beta|pre|preview)[-_.]?(\d*))?	# pre-release
+	(?:-(\d+)|[-_.]?(post|rev|r)[-_.]?(\d*))?				# post-release
+	(?:[-_.]?(dev)[-_.]?(\d*))?							# development release
+	(?:\+([a-z0-9]+(?:[-_.][a-z0-9]+)*))?				# local version, left out of the key
+	\s*$""", re.IGNORECASE | re.VERBOSE)
+pre_release_ranks = {"a": 0, "alpha": 0, "b": 1, "beta": 1, "c": 2, "rc": 2, "pre": 2, "preview": 2}
+
+# Lockfile header line recording the interpreter/platform tag the hashes were taken for
+TAG_HEADER = "# tag: "
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		read_requirements
+
+Description:	Reads a requirements file or lockfile.
+				Comments, blank lines and pip options are skipped, backslash continued lines
+				are joined, and a package listed more than once is merged into one requirement.
+
+Arguments:		path 	- requirements file path
+
+Return:			result 	- list of Requirement tuples in file order
+"""
+def read_requirements(path):
+
+	with open(path) as requirements_file:
+		text = requirements_file.read()
+
+	return parse_requirements(re.sub(r"\\\r?\n", " ", text).splitlines())
+
+
+
+"""
+Function: 		parse_requirements
+
+Description:	Parses and de-duplicates requirement strings, i.e. ['wheel', 'lxml>=4'].
+				Specifiers and hashes of a repeated package are combined.
+
+Arguments:		lines 	- list of requirement strings
+
+Return:			result 	- list of Requirement tuples in first-seen order
+"""
+def parse_requirements(lines):
+
+	requirements = collections.OrderedDict()
+	for line in lines:
+		requirement = parse_requirement(line)
+		if requirement is None:
+			continue
+
+		previous = requirements.get(requirement.key)
+		if previous is not None:
+			specifier = ",".join(spec for spec in [previous.specifier, requirement.specifier] if spec)
+			hashes = previous.hashes + [digest for digest in requirement.hashes if digest not in previous.hashes]
+			requirement = Requirement(previous.name, previous.key, specifier, hashes, compile_specifier(specifier))
+		requirements[requirement.key] = requirement
+
+	return list(requirements.values())
+
+
+
+"""
+Function: 		parse_requirement
+
+Description:	Parses one requirement line. Environment markers are not supported and are dropped.
+
+Arguments:		line 	- requirement string
+
+Return:			result 	- Requirement tuple, or None for comments, blank lines and options
+"""
+def parse_requirement(line):
+
+	line = re.sub(r"(^|\s)#.*$", "", line).strip()
+	if not line or line.startswith("-"):
+		return None
+
+	match = requirement_pattern.match(line)
+	if not match:
+		return None
+
+	rest = match.group(3).split(";")[0]
+	hashes = hash_pattern.findall(rest)
+	specifier = hash_pattern.sub("", rest).strip().strip("()").replace(" ", "")
+	return Requirement(match.group(1), inventory.normalize_name(match.group(1)), specifier, hashes, compile_specifier(specifier))
+
+
+
+"""
+Function: 		compile_specifier
+
+Description:	Compiles a version specifier such as '>=1.2,!=1.5.*,<2' once into a function,
+				so checking a whole inventory needs no further parsing.
+
+Arguments:		specifier 	- comma separated version specifier, empty for any version
+
+Return:			result 		- function taking an installed version string, returning a Boolean
+"""
+def compile_specifier(specifier):
+
+	checks = [_compile_clause(clause.strip()) for clause in specifier.split(",") if clause.strip()]
+	if not checks:
+		return lambda version: True
+
+	def matches(version):
+		key = parse_version(version)
+		return all(check(version, key) for check in checks)
+
+	return matches
+
+
+
+"""
+Function: 		parse_version
+
+Description:	Turns a PEP 440 version string into a key that sorts in version order,
+				i.e. 1.0.dev1 < 1.0a1 < 1.0 == 1.0.0 < 1.0.post1.
+
+Arguments:		version 	- version string
+
+Return:			result 		- comparable tuple, or None if the version is not PEP 440
+"""
+def parse_version(version):
+
+	match = version_pattern.match(version)
+	if not match:
+		return None
+
+	epoch, release, pre_letter, pre_number, post_implicit, post_letter, post_number, dev, dev_number, local = match.groups()
+	release = [int(part) for part in release.split(".")]
+	while len(release) > 1 and release[-1] == 0:
+		release.pop()
+
+	if post_implicit:
+		post = int(post_implicit)
+	elif post_letter:
+		post = int(post_number or 0)
+	else:
+		post = -1
+
+	# A development release of a final release sorts before its pre-releases
+	if pre_letter:
+		pre = (0, pre_release_ranks[pre_letter.lower()], int(pre_number or 0))
+	elif dev and post < 0:
+		pre = (-1, 0, 0)
+	else:
+		pre = (1, 0, 0)
+
+	dev_key = (0, int(dev_number or 0)) if dev else (1, 0)
+	return (int(epoch or 0), tuple(release), pre, post, dev_key)
+
+
+
+"""
+Function: 		unsatisfied
+
+Description:	Compares requirements against an installed package inventory in one pass.
+
+Arguments:		requirements 	- list of Requirement tuples
+				installed 		- dictionary of normalised package name to version
+
+Return:			result 			- list of (Requirement, installed version or None) not satisfied
+"""
+def unsatisfied(requirements, installed):
+
+	failing = []
+	for requirement in requirements:
+		version = installed.get(requirement.key)
+		if version is None or not requirement.matches(version):
+			failing.append((requirement, version))
+
+	return failing
+
+
+
+"""
+Function: 		requirement_line
+
+Description:	Formats a requirement for a pip requirements file.
+
+Arguments:		requirement 	- Requirement tuple
+				with_hashes 	- include the hashes, for 'pip install --require-hashes'
+
+Return:			result 			- requirement line
+"""
+def requirement_line(requirement, with_hashes=False):
+
+	line = requirement.name + requirement.specifier
+	if with_hashes:
+		line += "".join(" --hash=%s" % digest for digest in requirement.hashes)
+	return line
+
+
+
+"""
+Function: 		write_requirements_file
+
+Description:	Writes requirements to a temporary file for 'pip install -r'.
+				Using a file avoids quoting specifiers for the shell.
+
+Arguments:		requirements 	- list of Requirement tuples
+				with_hashes 	- include the hashes
+
+Return:			result 			- temporary file path, removed by the caller
+"""
+def write_requirements_file(requirements, with_hashes=False):
+
+	descriptor, path = tempfile.mkstemp(prefix="checkdevnet-", suffix=".txt")
+	with os.fdopen(descriptor, "w") as requirements_file:
+		for requirement in requirements:
+			requirements_file.write(requirement_line(requirement, with_hashes) + "\n")
+	return path
+
+
+
+"""
+Function: 		read_lock_tag
+
+Description:	Returns the interpreter/platform tag a lockfile's hashes were taken for.
+
+Arguments:		path 	- lockfile path
+
+Return:			result 	- tag string, or None if the lockfile does not record one
+"""
+def read_lock_tag(path):
+
+	with open(path) as lock_file:
+		for line in lock_file:
+			if line.startswith(TAG_HEADER):
+				return line[len(TAG_HEADER):].strip()
+			if not line.startswith("#"):
+				break
+
+	return None
+
+
+
+"""
+Function: 		stale_requirements
+
+Description:	Lists requirements a lockfile no longer satisfies, i.e. after requirements.txt changed.
+
+Arguments:		requirements 	- list of Requirement tuples from the requirements file
+				locked 			- list of Requirement tuples from the lockfile
+
+Return:			result 			- list of Requirement tuples missing from, or not matched by, the lockfile
+"""
+def stale_requirements(requirements, locked):
+
+	pinned = dict((requirement.key, _pinned_version(requirement)) for requirement in locked)
+	return [requirement for requirement, version in unsatisfied(requirements, pinned)]
+
+
+
+"""
+Function: 		generate_lockfile
+
+Description:	Resolves a requirements file with pip, without installing anything, and writes
+				every resolved package with its exact version and sha256 hash.
+				Needs pip 22.2 or later for 'install --dry-run --report'.
+
+Arguments:		requirements_path 	- requirements file to resolve
+				lock_path 			- lockfile to write
+				pip_str 			- pip executable name or path
+				pip_opts 			- extra pip options, i.e. the package source
+				tag 				- interpreter/platform tag recorded in the lockfile
+				run 				- function running a command string, returning True on success
+
+Return:			result 				- number of packages locked, None if pip could not resolve
+"""
+def generate_lockfile(requirements_path, lock_path, pip_str, pip_opts, tag, run):
+
+	descriptor, report_path = tempfile.mkstemp(prefix="checkdevnet-", suffix=".json")
+	os.close(descriptor)
+	try:
+		if not run('%s install%s --dry-run --ignore-installed --quiet --report "%s" -r "%s"' % (pip_str, pip_opts, report_path, requirements_path)):
+			return None
+		with open(report_path) as report_file:
+			report = json.load(report_file)
+	except (IOError, OSError, ValueError):
+		return None
+	finally:
+		os.remove(report_path)
+
+	lines = []
+	for item in report.get("install", []):
+		metadata = item["metadata"]
+		archive = item.get("download_info", {}).get("archive_info", {})
+		digest = archive.get("hash", "").replace("=", ":", 1)
+		entry = "%s==%s" % (metadata["name"], metadata["version"])
+		if digest:
+			entry += " \\\n    --hash=%s" % digest
+		lines.append((inventory.normalize_name(metadata["name"]), entry))
+
+	with open(lock_path, "w") as lock_file:
+		lock_file.write("# Generated from %s, install with 'pip install --no-deps --require-hashes -r %s'\n"
+						% (os.path.basename(requirements_path), os.path.basename(lock_path)))
+		lock_file.write("%s%s\n" % (TAG_HEADER, tag))
+		for key, entry in sorted(lines):
+			lock_file.write(entry + "\n")
+
+	return len(lines)
+
+
+
+def _compile_clause(clause):
+
+	match = clause_pattern.match(clause)
+	if not match:
+		raise ValueError("Invalid version specifier '%s'" % clause)
+	operator, wanted = match.groups()
+
+	if operator == "===":
+		return lambda version, key: version == wanted
+
+	# Prefix matching, i.e. '==1.4.*'
+	if wanted.endswith(".*") and operator in ("==", "!="):
+		prefix = parse_version(wanted[:-2])
+		if prefix is None:
+			raise ValueError("Invalid version specifier '%s'" % clause)
+		length = len(wanted[:-2].split("!")[-1].split("."))
+		equal = operator == "=="
+		return lambda version, key: key is not None and (_release_prefix(key, length) == _release_prefix(prefix, length)) == equal
+
+	wanted_key = parse_version(wanted)
+	if wanted_key is None:
+		raise ValueError("Invalid version specifier '%s'" % clause)
+
+	# A local version in the specifier must match exactly, i.e. '==1.0+local' does not match 1.0 (PEP 440)
+	wanted_local = _local_key(wanted)
+	if wanted_local is not None:
+		if operator not in ("==", "!="):
+			raise ValueError("Invalid version specifier '%s'" % clause)
+		equal = operator == "=="
+		return lambda version, key: key is not None and (key == wanted_key and _local_key(version) == wanted_local) == equal
+
+	if operator == "~=":
+		length = len(version_pattern.match(wanted).group(2).split(".")) - 1
+		return lambda version, key: key is not None and key >= wanted_key and _release_prefix(key, length) == _release_prefix(wanted_key, length)
+
+	# Exclusive comparisons leave out the named version's own pre-releases (for '<') and, for a
+	# final release, its post-releases (for '>'), i.e. '<2.0' does not match 2.0a1 (PEP 440)
+	compare = {"==": lambda key: key == wanted_key,
+				"!=": lambda key: key != wanted_key,
+				"<=": lambda key: key <= wanted_key,
+				">=": lambda key: key >= wanted_key,
+				"<": lambda key: key < wanted_key and not (_is_prerelease(key) and not _is_prerelease(wanted_key)
+															and (key[:2], key[3]) == (wanted_key[:2], wanted_key[3])),
+				">": lambda key: key > wanted_key and not (_is_postrelease(key) and key[:2] == wanted_key[:2]
+															and not _is_prerelease(wanted_key) and not _is_postrelease(wanted_key))}[operator]
+	return lambda version, key: key is not None and compare(key)
+
+
+
+def _local_key(version):
+
+	local = version_pattern.match(version).group(10)
+	if local is None:
+		return None
+	return tuple(int(part) if part.isdigit() else part.lower() for part in re.split(r"[-_.]", local))
+
+
+
+def _is_prerelease(key):
+
+	return key[2][0] != 1 or key[4][0] == 0
+
+
+
+def _is_postrelease(key):
+
+	return key[3] >= 0
+
+
+
+def _release_prefix(key, length):
+
+	release = key[1] + (0,) * max(0, length - len(key[1]))
+	return (key[0], release[:length])
+
+
+
+def _pinned_version(requirement):
+
+	match = clause_pattern.match(requirement.specifier)
+	if match and match.group(1) in ("==", "==="):
+		return match.group(2)
+	return None
@@ -0,0 +1,260 @@
+#####################################################################
+#																	#
+#	Module: 		mirrors.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Ranks candidate package indexes and git 		#
+#					remotes by measured latency and throughput		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for probing candidates concurrently
+import socket
+import threading
+try:
+	from urllib.request import urlopen
+	from urllib.parse import urlsplit
+except ImportError:
+	from urllib2 import urlopen
+	from urlparse import urlsplit
+
+# Used for storing the ranking
+import os
+import json
+import time
+
+# Used for timing probes
+import tracing
+
+# Used for finding the cache folder
+import fsprobe
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Small fixed request made to each kind of candidate
+#	pypi 	- the PEP 503 page of pip, which every package index has
+#	git 	- the smart HTTP ref advertisement, served by dumb HTTP remotes as info/refs
+probe_paths = {"pypi": "pip/",
+				"git": "/info/refs?service=git-upload-pack"}
+
+# Default TCP port of non-HTTP git remotes
+git_scheme_ports = {"git": 9418, "ssh": 22}
+
+# Transfer size candidates are compared on, so a slow link loses to a slightly further fast one
+RANK_BYTES = 1024 * 1024
+
+# Largest probe answer read
+MAX_PROBE_BYTES = 1024 * 1024
+
+# Rankings are cached per kind, written by several threads
+cache_lock = threading.Lock()
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		default_cache_file
+
+Description:	Returns the per-user file the rankings are cached in.
+
+Arguments:		None
+
+Return:			result 	- file path
+"""
+def default_cache_file():
+
+	return fsprobe.state_dir("mirrors.json")
+
+
+
+"""
+Function: 		rank
+
+Description:	Ranks candidates of one kind, fastest reachable first, probing them all at the same
+				time. A ranking of the same candidates measured less than ttl seconds ago is reused.
+
+Arguments:		kind 		- "pypi" or "git"
+				candidates 	- list of index or remote URLs (git remotes may also be local paths)
+				cache_file 	- JSON file holding the rankings, "" to always probe
+				ttl 		- seconds a ranking is reused
+				timeout 	- seconds allowed for each probe
+
+Return:			result 		- list of dictionaries of url, reachable, latency_ms, mbit_per_s and error,
+							  best first, unreachable candidates last
+"""
+def rank(kind, candidates, cache_file="", ttl=3600, timeout=3):
+
+	if cache_file:
+		cached = _load_cache(cache_file).get(kind)
+		if cached and cached["candidates"] == sorted(candidates) and time.time() - cached["measured_at"] < ttl:
+			return cached["ranking"]
+
+	results = [None] * len(candidates)
+
+	def run_probe(index, url):
+		results[index] = probe(kind, url, timeout)
+
+	threads = [threading.Thread(target=run_probe, args=(index, url)) for index, url in enumerate(candidates)]
+	for thread in threads:
+		thread.daemon = True
+		thread.start()
+	deadline = time.time() + timeout + 1
+	for thread in threads:
+		thread.join(max(deadline - time.time(), 0))
+
+	for index, url in enumerate(candidates):
+		if results[index] is None:
+			results[index] = _result(url, error="timed out after %s seconds" % timeout)
+
+	# Stable sort, equally fast candidates keep the order they were listed in
+	ranking = sorted(results, key=score)
+	if cache_file:
+		with cache_lock:
+			cache = _load_cache(cache_file)
+			cache[kind] = {"candidates": sorted(candidates), "measured_at": time.time(), "ranking": ranking}
+			_save_cache(cache_file, cache)
+
+	return ranking
+
+
+
+"""
+Function: 		forget
+
+Description:	Drops the cached ranking of a kind, e.g. after the winner failed, so the next
+				run probes the candidates again.
+
+Arguments:		kind 		- "pypi" or "git"
+				cache_file 	- JSON file holding the rankings
+
+Return:			None
+"""
+def forget(kind, cache_file):
+
+	with cache_lock:
+		cache = _load_cache(cache_file)
+		if cache.pop(kind, None) is not None:
+			_save_cache(cache_file, cache)
+
+
+
+"""
+Function: 		probe
+
+Description:	Measures one candidate with its kind's small fixed request, timing the first byte
+				and the transfer. Non-HTTP git remotes are timed by a TCP connect, local
+				repositories count as the fastest possible remote.
+
+Arguments:		kind 	- "pypi" or "git"
+				url 	- index or remote URL
+				timeout - seconds allowed for the probe
+
+Return:			result 	- dictionary of url, reachable, latency_ms, mbit_per_s and error
+"""
+def probe(kind, url, timeout=3):
+
+	parts = urlsplit(url)
+	if parts.scheme not in ("http", "https"):
+		if kind == "git" and parts.scheme in git_scheme_ports:
+			return _probe_tcp(url, parts.hostname, parts.port or git_scheme_ports[parts.scheme], timeout)
+		if kind == "git" and "://" not in url and "@" in url.split("/")[0]:
+			# scp-like ssh remote, i.e. git@host:path
+			return _probe_tcp(url, url.split("@", 1)[1].split(":")[0], 22, timeout)
+		path = parts.path if parts.scheme == "file" else url
+		if kind == "git" and (os.path.isfile(os.path.join(path, "HEAD")) or os.path.isdir(os.path.join(path, ".git"))):
+			return _result(url, 0.0)
+		if kind != "git" and os.path.exists(path):
+			return _result(url, 0.0)
+		return _result(url, error="%s not found" % path)
+
+	probe_url = url.rstrip("/") + probe_paths[kind] if kind == "git" else url.rstrip("/") + "/" + probe_paths[kind]
+	start = tracing.clock()
+	try:
+		response = urlopen(probe_url, timeout=timeout)
+		try:
+			data = response.read(1)
+			first_byte = tracing.clock()
+			size = len(data)
+			while data and size < MAX_PROBE_BYTES:
+				data = response.read(65536)
+				size += len(data)
+			end = tracing.clock()
+		finally:
+			response.close()
+	except Exception as e:
+		return _result(url, error=str(e) or type(e).__name__)
+
+	mbit_per_s = None
+	if size > 1 and end > first_byte:
+		mbit_per_s = size * 8 / (end - first_byte) / 1e6
+	return _result(url, (first_byte - start) * 1000, mbit_per_s)
+
+
+
+"""
+Function: 		score
+
+Description:	Estimated seconds for a candidate to deliver RANK_BYTES, infinite if unreachable.
+				Without a throughput measurement only the latency counts.
+
+Arguments:		result 	- dictionary from probe
+
+Return:			result 	- seconds
+"""
+def score(result):
+
+	if not result["reachable"]:
+		return float("inf")
+	seconds = result["latency_ms"] / 1000.0
+	if result["mbit_per_s"]:
+		seconds += RANK_BYTES * 8 / (result["mbit_per_s"] * 1e6)
+	return seconds
+
+
+
+def _probe_tcp(url, host, port, timeout):
+
+	start = tracing.clock()
+	try:
+		connection = socket.create_connection((host, port), timeout)
+		connection.close()
+	except (socket.error, socket.timeout) as e:
+		return _result(url, error=str(e) or type(e).__name__)
+	return _result(url, (tracing.clock() - start) * 1000)
+
+
+
+def _result(url, latency_ms=None, mbit_per_s=None, error=None):
+
+	return {"url": url, "reachable": error is None, "latency_ms": latency_ms, "mbit_per_s": mbit_per_s, "error": error}
+
+
+
+def _load_cache(cache_file):
+
+	try:
+		with open(cache_file) as cache:
+			return json.load(cache)
+	except (IOError, OSError, ValueError):
+		return {}
+
+
+
+def _save_cache(cache_file, cache):
+
+	folder = os.path.dirname(cache_file)
+	if folder and not os.path.isdir(folder):
+		os.makedirs(folder)
+	staging = cache_file + ".tmp%d" % os.getpid()
+	with open(staging, "w") as cache_out:
+		json.dump(cache, cache_out, indent=1, sort_keys=True)
+	if os.name == "nt" and os.path.exists(cache_file):
+		os.remove(cache_file)
+	os.rename(staging, cache_file)
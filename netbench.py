@@ -0,0 +1,313 @@
+#####################################################################
+#																	#
+#	Module: 		netbench.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Network latency and throughput benchmark for 	#
+#					diagnosing slow venue networks (Python 3)		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for timing DNS, TCP, TLS and HTTP
+import socket
+import ssl
+import urllib.request
+import http.client
+import http.server
+import socketserver
+import threading
+import time
+import math
+
+# Used for writing the report
+import json
+import sys
+import platform
+
+# Used for timing
+import tracing
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Samples taken of each endpoint and of the download
+DEFAULT_SAMPLES = 20
+DEFAULT_THROUGHPUT_SAMPLES = 5
+
+# Seconds before a sample is abandoned
+DEFAULT_TIMEOUT = 5
+
+# Size of the stand-in download served for testing
+STAND_IN_BYTES = 16 * 1024 * 1024
+
+# Bytes read at a time while downloading
+READ_CHUNK = 65536
+
+# Percentiles reported for each measurement
+PERCENTILES = [50, 95, 99]
+
+# Ports of the non-HTTP git remotes (ssh and git daemon), no HEAD request is timed on them
+non_http_ports = (22, 9418)
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		run
+
+Description:	Benchmarks every endpoint one after another, so samples do not compete for
+				the link, then the download.
+
+Arguments:		endpoints 			- list of (host, port) tuples, TLS is measured on port 443 and
+									  first byte on every port not in non_http_ports
+				throughput_url 		- URL downloaded to measure throughput, "" to skip
+				samples 			- samples per endpoint
+				throughput_samples 	- downloads of throughput_url
+				timeout 			- seconds before a sample is abandoned
+
+Return:			report 				- dictionary suitable for write_report
+"""
+def run(endpoints, throughput_url="", samples=DEFAULT_SAMPLES, throughput_samples=DEFAULT_THROUGHPUT_SAMPLES, timeout=DEFAULT_TIMEOUT):
+
+	report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+				"platform": platform.platform(),
+				"python": sys.version.split()[0],
+				"endpoints": [measure_endpoint(host, port, samples, timeout) for host, port in endpoints],
+				"throughput": None}
+	if throughput_url:
+		report["throughput"] = measure_throughput(throughput_url, throughput_samples, timeout)
+
+	return report
+
+
+
+"""
+Function: 		measure_endpoint
+
+Description:	Times DNS lookup, TCP connect, TLS handshake and time to first byte of a HEAD
+				request, each on a fresh connection so every sample pays the full setup cost.
+				The operating system's resolver may still answer repeated lookups from its cache.
+				Endpoints that do not speak HTTP have no first byte timing.
+
+Arguments:		host 	- host name
+				port 	- TCP port
+				samples - number of samples
+				timeout - seconds before a sample is abandoned
+				tls 	- measure a TLS handshake, defaults to port 443 only
+				http 	- measure the first byte of a HEAD request, defaults to ports not in non_http_ports
+
+Return:			result 	- dictionary of host, port, tls, http, samples, errors and the percentiles
+						  of dns_ms, connect_ms, tls_ms and ttfb_ms
+"""
+def measure_endpoint(host, port, samples=DEFAULT_SAMPLES, timeout=DEFAULT_TIMEOUT, tls=None, http=None):
+
+	if tls is None:
+		tls = port == 443
+	if http is None:
+		http = port not in non_http_ports
+	context = ssl.create_default_context() if tls else None
+
+	timings = {"dns_ms": [], "connect_ms": [], "tls_ms": [], "ttfb_ms": []}
+	errors = []
+	for index in range(samples):
+		try:
+			for name, value in _sample_endpoint(host, port, context, http, timeout).items():
+				timings[name].append(value)
+		except (OSError, ssl.SSLError) as e:
+			errors.append(str(e) or type(e).__name__)
+
+	result = {"host": host, "port": port, "tls": tls, "http": http, "samples": samples, "errors": errors}
+	for name, values in timings.items():
+		result[name] = percentiles(values)
+	return result
+
+
+
+"""
+Function: 		measure_throughput
+
+Description:	Downloads a URL several times, timing the first byte and the body transfer.
+				Throughput is measured from the first byte, so it excludes connection setup.
+
+Arguments:		url 	- http or https URL
+				samples - number of downloads
+				timeout - seconds to wait for each read
+
+Return:			result 	- dictionary of url, samples, errors, bytes and the percentiles of
+						  ttfb_ms and mbit_per_s
+"""
+def measure_throughput(url, samples=DEFAULT_THROUGHPUT_SAMPLES, timeout=DEFAULT_TIMEOUT):
+
+	ttfb, rates = [], []
+	errors = []
+	size = 0
+	for index in range(samples):
+		try:
+			start = tracing.clock()
+			response = urllib.request.urlopen(url, timeout=timeout)
+			try:
+				chunk = response.read(1)
+				first_byte = tracing.clock()
+				size = len(chunk)
+				while chunk:
+					chunk = response.read(READ_CHUNK)
+					size += len(chunk)
+				end = tracing.clock()
+				# A read of a set size stops quietly when the server closes early
+				if getattr(response, "length", None):
+					raise http.client.IncompleteRead(b"", response.length)
+			finally:
+				response.close()
+			ttfb.append((first_byte - start) * 1000)
+			rates.append(size * 8 / max(end - first_byte, 1e-6) / 1e6)
+		except (OSError, ValueError, http.client.HTTPException) as e:
+			errors.append(str(e) or type(e).__name__)
+
+	return {"url": url, "samples": samples, "errors": errors, "bytes": size,
+			"ttfb_ms": percentiles(ttfb), "mbit_per_s": percentiles(rates)}
+
+
+
+"""
+Function: 		percentiles
+
+Description:	Summarises samples with the nearest-rank percentiles in PERCENTILES.
+
+Arguments:		values 	- list of numbers
+
+Return:			result 	- dictionary of count, min, max and p50/p95/p99, values are None without samples
+"""
+def percentiles(values):
+
+	ordered = sorted(values)
+	result = {"count": len(ordered),
+				"min": _round(ordered[0]) if ordered else None,
+				"max": _round(ordered[-1]) if ordered else None}
+	for percent in PERCENTILES:
+		rank = max(int(math.ceil(percent / 100.0 * len(ordered))), 1)
+		result["p%d" % percent] = _round(ordered[rank - 1]) if ordered else None
+	return result
+
+
+
+"""
+Function: 		start_stand_in
+
+Description:	Serves a fixed-size download on a background thread, a stand-in for the
+				throughput URL when testing without the venue network.
+
+Arguments:		size 	- download size in bytes
+				bind 	- address to listen on
+
+Return:			result 	- tuple of (server, URL of the download), stop with server.shutdown()
+"""
+def start_stand_in(size=STAND_IN_BYTES, bind="127.0.0.1"):
+
+	class Handler(StandInHandler):
+		payload_size = size
+
+	server = StandInServer((bind, 0), Handler)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.daemon = True
+	thread.start()
+	return server, "http://%s:%d/payload" % (bind, server.server_address[1])
+
+
+
+"""
+Function: 		write_report
+
+Description:	Writes a benchmark report as JSON.
+
+Arguments:		report 	- dictionary from run
+				path 	- report file path
+
+Return:			None
+"""
+def write_report(report, path):
+
+	with open(path, "w") as report_file:
+		json.dump(report, report_file, indent=1, sort_keys=True)
+
+
+
+"""
+Class: 			StandInServer
+
+Description:	HTTP server handling each connection on its own thread.
+"""
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	daemon_threads = True
+
+
+
+"""
+Class: 			StandInHandler
+
+Description:	Request handler answering every GET with payload_size zero bytes.
+"""
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+	payload_size = 0
+
+	def do_GET(self):
+
+		self.send_response(200)
+		self.send_header("Content-Type", "application/octet-stream")
+		self.send_header("Content-Length", str(self.payload_size))
+		self.end_headers()
+		block = b"\0" * READ_CHUNK
+		remaining = self.payload_size
+		while remaining > 0:
+			self.wfile.write(block[:remaining])
+			remaining -= len(block)
+
+	def log_message(self, format, *args):
+		pass
+
+
+
+def _sample_endpoint(host, port, context, http, timeout):
+
+	timings = {}
+	start = tracing.clock()
+	family, sock_type, proto, canonname, address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+	resolved = tracing.clock()
+	timings["dns_ms"] = (resolved - start) * 1000
+
+	sock = socket.socket(family, sock_type, proto)
+	try:
+		sock.settimeout(timeout)
+		sock.connect(address)
+		connected = tracing.clock()
+		timings["connect_ms"] = (connected - resolved) * 1000
+
+		if context is not None:
+			sock = context.wrap_socket(sock, server_hostname=host)
+			timings["tls_ms"] = (tracing.clock() - connected) * 1000
+
+		# Time from sending a request to the first byte of the answer
+		if http:
+			request_sent = tracing.clock()
+			sock.sendall(("HEAD / HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n\r\n" % host).encode("ascii"))
+			if not sock.recv(1):
+				raise OSError("connection closed without a response")
+			timings["ttfb_ms"] = (tracing.clock() - request_sent) * 1000
+	finally:
+		sock.close()
+
+	return timings
+
+
+
+def _round(value):
+
+	return round(value, 3)
@@ -0,0 +1,264 @@
+#####################################################################
+#																	#
+#	Module: 		netprobe.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Concurrent TCP reachability probe of several 	#
+#					endpoints with a DNS cache (Python 3.5+)		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for resolving and connecting without blocking
+import asyncio
+import socket
+
+# Used for storing probe results and guarding the DNS cache
+import collections
+import threading
+
+# Used for timing probes and running the event loop
+import tracing
+import shell_async
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Seconds before the next address is tried while earlier attempts are still connecting (RFC 8305)
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# Outcome of probing one endpoint, times are in seconds
+#	address 	- address that answered first, None on failure
+#	error 		- error message, None on success
+ProbeResult = collections.namedtuple("ProbeResult", ["host", "port", "address", "dns_seconds", "connect_seconds", "error"])
+
+# getaddrinfo results for the rest of the run, keyed by getaddrinfo arguments
+dns_cache = {}
+dns_cache_lock = threading.Lock()
+
+# Uncached getaddrinfo, kept when install_dns_cache replaces it
+system_getaddrinfo = socket.getaddrinfo
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		probe
+
+Description:	Resolves and connects to every endpoint at the same time, so an unreachable
+				network shows up after one timeout instead of one per endpoint.
+				Each connection is closed as soon as it is made.
+
+Arguments:		endpoints 	- list of (host, port) tuples
+				timeout 	- seconds allowed for resolving and connecting each endpoint
+
+Return:			results 	- list of ProbeResult tuples, in the same order as endpoints
+"""
+def probe(endpoints, timeout=5):
+
+	return shell_async.run_coroutine(probe_all(endpoints, timeout))
+
+
+
+"""
+Function: 		probe_all
+
+Description:	Coroutine probing a list of endpoints concurrently.
+
+Arguments:		endpoints 	- list of (host, port) tuples
+				timeout 	- seconds allowed for resolving and connecting each endpoint
+
+Return:			results 	- list of ProbeResult tuples, in the same order as endpoints
+"""
+async def probe_all(endpoints, timeout=5):
+
+	return await asyncio.gather(*[probe_endpoint(host, port, timeout) for host, port in endpoints])
+
+
+
+"""
+Function: 		probe_endpoint
+
+Description:	Coroutine resolving an endpoint through the DNS cache and connecting to it.
+				IPv6 and IPv4 addresses are raced happy eyeballs style: attempts start
+				CONNECTION_ATTEMPT_DELAY apart, alternating address families, and the first
+				connection made wins. Losing attempts are cancelled and their sockets closed.
+
+Arguments:		host 	- host name or address
+				port 	- TCP port
+				timeout - seconds allowed for resolving and connecting
+
+Return:			result 	- ProbeResult tuple
+"""
+async def probe_endpoint(host, port, timeout=5):
+
+	loop = asyncio.get_event_loop()
+	start = tracing.clock()
+	dns_seconds = None
+	try:
+		infos = await asyncio.wait_for(resolve(host, port), timeout)
+		dns_seconds = tracing.clock() - start
+		connected = tracing.clock()
+		sock, address = await asyncio.wait_for(_race_connections(loop, interleave_families(infos)),
+												max(timeout - dns_seconds, 0.001))
+		sock.close()
+		return ProbeResult(host, port, address[0], dns_seconds, tracing.clock() - connected, None)
+	except asyncio.TimeoutError:
+		error = "timed out after %s seconds" % timeout
+	except (OSError, socket.error) as e:
+		error = str(e) or type(e).__name__
+
+	return ProbeResult(host, port, None, dns_seconds, None, error)
+
+
+
+"""
+Function: 		resolve
+
+Description:	Coroutine looking up the TCP addresses of a host, answered from the DNS cache
+				once the host has been resolved.
+
+Arguments:		host 	- host name or address
+				port 	- TCP port
+
+Return:			result 	- list of getaddrinfo tuples
+"""
+async def resolve(host, port):
+
+	key = (host, port, 0, socket.SOCK_STREAM, 0, 0)
+	with dns_cache_lock:
+		infos = dns_cache.get(key)
+	if infos is None:
+		infos = await asyncio.get_event_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+		with dns_cache_lock:
+			dns_cache[key] = infos
+
+	return list(infos)
+
+
+
+"""
+Function: 		interleave_families
+
+Description:	Orders addresses for happy eyeballs, alternating between address families
+				and starting with the family the resolver listed first.
+
+Arguments:		infos 	- list of getaddrinfo tuples
+
+Return:			result 	- reordered list of getaddrinfo tuples
+"""
+def interleave_families(infos):
+
+	families = collections.OrderedDict()
+	for info in infos:
+		families.setdefault(info[0], []).append(info)
+
+	ordered = []
+	queues = list(families.values())
+	while any(queues):
+		for addresses in queues:
+			if addresses:
+				ordered.append(addresses.pop(0))
+	return ordered
+
+
+
+"""
+Function: 		cached_getaddrinfo
+
+Description:	Drop-in socket.getaddrinfo answering repeated lookups from the DNS cache.
+
+Arguments:		Same as socket.getaddrinfo
+
+Return:			result 	- list of getaddrinfo tuples
+"""
+def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+
+	key = (host, port, family, type, proto, flags)
+	with dns_cache_lock:
+		infos = dns_cache.get(key)
+	if infos is None:
+		infos = system_getaddrinfo(host, port, family, type, proto, flags)
+		with dns_cache_lock:
+			dns_cache[key] = infos
+
+	return list(infos)
+
+
+
+"""
+Function: 		install_dns_cache
+
+Description:	Routes every lookup made by this process through the DNS cache for the rest
+				of the run, e.g. the Spark API requests after the probe resolved the host.
+
+Arguments:		None
+
+Return:			None
+"""
+def install_dns_cache():
+
+	socket.getaddrinfo = cached_getaddrinfo
+
+
+
+async def _race_connections(loop, infos):
+
+	if not infos:
+		raise OSError("no addresses found")
+
+	pending = set()
+	attempts = {}
+	errors = []
+	winner = None
+	remaining = list(infos)
+	try:
+		while remaining or pending:
+
+			# Start the next attempt, then give the running attempts a head start before the one after
+			if remaining:
+				info = remaining.pop(0)
+				task = asyncio.ensure_future(_connect(loop, info))
+				attempts[task] = info[4]
+				pending.add(task)
+
+			done, pending = await asyncio.wait(pending, timeout=CONNECTION_ATTEMPT_DELAY if remaining else None,
+												return_when=asyncio.FIRST_COMPLETED)
+			for task in done:
+				if task.exception() is not None:
+					errors.append(task.exception())
+				elif winner is None:
+					winner = (task.result(), attempts[task])
+				else:
+					task.result().close()
+			if winner is not None:
+				return winner
+	finally:
+		for task in pending:
+			task.cancel()
+		if pending:
+			await asyncio.wait(pending)
+			for task in pending:
+				if not task.cancelled() and task.exception() is None:
+					task.result().close()
+
+	raise errors[-1]
+
+
+
+async def _connect(loop, info):
+
+	family, sock_type, proto, canonname, address = info
+	sock = socket.socket(family, sock_type, proto)
+	try:
+		sock.setblocking(False)
+		await loop.sock_connect(sock, address)
+		return sock
+	except BaseException:
+		sock.close()
+		raise
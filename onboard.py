@@ -0,0 +1,289 @@
+#####################################################################
+#																	#
+#	Module: 		onboard.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Bulk onboarding of an attendee roster into the 	#
+#					event Spark room, resumable after a crash		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for running requests concurrently
+import threading
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+# Used for reading the roster and writing results
+import os
+import sys
+import csv
+import time
+import argparse
+
+# Used for calling the Spark API
+import spark
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Defaults for the onboard subcommand
+DEFAULT_WORKERS = 16
+
+# Columns of the results file, one row per email as it completes
+RESULT_FIELDS = ["email", "status", "person_id", "membership_id", "error"]
+
+# Outcome of each email
+#	added 		- membership created
+#	member 		- already in the room
+#	not_found 	- no Spark user has the email
+#	failed 		- request failed, retried when the run is resumed
+ADDED = "added"
+MEMBER = "member"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+# Outcomes that are not retried on resume
+final_statuses = (ADDED, MEMBER, NOT_FOUND)
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		read_roster
+
+Description:	Reads attendee emails from a CSV file or a plain list with one email per line.
+				The first field containing '@' of each row is taken, so header rows and
+				other columns are skipped. Duplicates are dropped, case-insensitively.
+
+Arguments:		path 	- roster file path
+
+Return:			result 	- list of lower case emails, in roster order
+"""
+def read_roster(path):
+
+	emails = []
+	seen = set()
+	with _open_csv(path, "r") as roster_file:
+		for row in csv.reader(roster_file):
+			for field in row:
+				email = field.strip().lower()
+				if "@" in email:
+					if email not in seen:
+						seen.add(email)
+						emails.append(email)
+					break
+
+	return emails
+
+
+
+"""
+Function: 		read_results
+
+Description:	Reads the results file of an earlier, possibly interrupted, run.
+
+Arguments:		path 	- results file path
+
+Return:			result 	- dictionary of email to status, the last row of each email wins
+"""
+def read_results(path):
+
+	results = {}
+	if not os.path.exists(path):
+		return results
+
+	with _open_csv(path, "r") as results_file:
+		for row in csv.DictReader(results_file):
+			if row.get("email"):
+				results[row["email"]] = row.get("status")
+
+	return results
+
+
+
+"""
+Function: 		onboard
+
+Description:	Adds a list of emails to a room on a bounded pool of worker threads sharing one
+				pooled SparkClient. Each email's person is looked up, then a membership is
+				created. Results are appended to the results file as they complete and
+				flushed, so an interrupted run can be resumed: emails with a final status in
+				the file are skipped, failed ones are tried again.
+
+Arguments:		client 			- spark.SparkClient
+				room_id 		- Cisco Spark room id string
+				emails 			- list of emails
+				results_path 	- results file path, appended to
+				workers 		- maximum number of emails in flight
+				on_result 		- optional callback(row) called for each completed email
+
+Return:			result 			- dictionary of status to count, including 'skipped' for emails done earlier
+"""
+def onboard(client, room_id, emails, results_path, workers=DEFAULT_WORKERS, on_result=None):
+
+	previous = read_results(results_path)
+	pending = [email for email in emails if previous.get(email) not in final_statuses]
+	counts = {"skipped": len(emails) - len(pending)}
+
+	tasks = queue.Queue()
+	done = queue.Queue()
+	for email in pending:
+		tasks.put(email)
+
+	def worker():
+		while True:
+			try:
+				email = tasks.get_nowait()
+			except queue.Empty:
+				return
+			done.put(onboard_email(client, room_id, email))
+
+	threads = [threading.Thread(target=worker) for index in range(max(1, min(workers, len(pending))))]
+	for thread in threads:
+		thread.daemon = True
+		thread.start()
+
+	write_header = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+	partial_row = not write_header and not _ends_with_newline(results_path)
+	with _open_csv(results_path, "a") as results_file:
+		writer = csv.DictWriter(results_file, RESULT_FIELDS)
+		if write_header:
+			writer.writeheader()
+
+		# End a row cut short by a crash, it is read back without a final status and retried
+		if partial_row:
+			results_file.write("\r\n")
+
+		# Only this thread writes, each row is flushed so a crash loses nothing already done
+		for index in range(len(pending)):
+			row = done.get()
+			writer.writerow(row)
+			results_file.flush()
+			counts[row["status"]] = counts.get(row["status"], 0) + 1
+			if on_result is not None:
+				on_result(row)
+
+	return counts
+
+
+
+"""
+Function: 		onboard_email
+
+Description:	Looks up the person with an email and adds them to a room.
+
+Arguments:		client 	- spark.SparkClient
+				room_id - Cisco Spark room id string
+				email 	- attendee email
+
+Return:			result 	- results row dictionary with RESULT_FIELDS keys
+"""
+def onboard_email(client, room_id, email):
+
+	row = {"email": email, "status": FAILED, "person_id": "", "membership_id": "", "error": ""}
+	try:
+		people = client.get("/people", {"email": email})
+		if people.status_code != 200:
+			row["error"] = "people lookup returned %d" % people.status_code
+			return row
+		items = people.json().get("items", [])
+		if not items:
+			row["status"] = NOT_FOUND
+			return row
+		row["person_id"] = items[0]["id"]
+
+		membership = client.post("/memberships", {"roomId": room_id, "personId": row["person_id"]})
+		if membership.status_code == 409:
+			row["status"] = MEMBER
+		elif membership.status_code == 200:
+			row["status"] = ADDED
+			row["membership_id"] = membership.json().get("id", "")
+		else:
+			row["error"] = "membership returned %d" % membership.status_code
+	except Exception as e:
+		row["error"] = str(e) or type(e).__name__
+
+	return row
+
+
+
+"""
+Function: 		main
+
+Description:	Entry point for 'checkDevNet.py onboard'.
+				Adds every email in a roster to the event room.
+
+Arguments:		argv 	- command line arguments after 'onboard'
+
+Return:			result 	- process exit code, 1 if any email failed
+"""
+def main(argv):
+
+	parser = argparse.ArgumentParser(prog="checkDevNet.py onboard",
+									description="Add a roster of attendee emails to the event Spark room")
+	parser.add_argument("roster", help="CSV file or list of emails, one per line")
+	parser.add_argument("--room", required=True, metavar="TITLE", help="title of the event room")
+	parser.add_argument("--create-room", action="store_true", help="create the room if no room has the title")
+	parser.add_argument("--token", default=os.environ.get("SPARK_TOKEN", ""),
+						help="Spark token of the proctor account (default: $SPARK_TOKEN)")
+	parser.add_argument("-o", "--output", metavar="FILE",
+						help="results file, also used to resume an interrupted run (default: <roster>.results.csv)")
+	parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+						help="emails onboarded at the same time (default: %(default)s)")
+	parser.add_argument("-v", dest="verbose", action="store_true", help="print each email as it completes")
+	args = parser.parse_args(argv)
+
+	if not args.token:
+		parser.error("a Spark token is needed, pass --token or set SPARK_TOKEN")
+	results_path = args.output or os.path.splitext(args.roster)[0] + ".results.csv"
+
+	emails = read_roster(args.roster)
+	client = spark.SparkClient(args.token, pool_size=max(args.workers, 1))
+	try:
+		room_id = client.get_room_id(args.room, "group")
+		if not room_id and args.create_room:
+			room_id = client.post_create_room(args.room)
+		if not room_id:
+			print(u"\tNo room titled '%s', use --create-room to create it" % args.room)
+			return 1
+
+		print(u"\nOnboarding %d emails into '%s', results in %s...\n" % (len(emails), args.room, results_path))
+		start = time.time()
+
+		def show(row):
+			if args.verbose or row["status"] == FAILED:
+				print(u"\t%-40s %s %s" % (row["email"], row["status"], row["error"]))
+
+		counts = onboard(client, room_id, emails, results_path, args.workers, show)
+	finally:
+		client.close()
+
+	print(u"\n\t%s in %.1f seconds" % (", ".join("%d %s" % (counts[status], status) for status in sorted(counts)), time.time() - start))
+	stats = client.stats()
+	print(u"\t%d requests, %d throttled, %d retried, %d failed" % (stats["sent"], stats["throttled"], stats["retried"], stats["failed"]))
+	return 1 if counts.get(FAILED) else 0
+
+
+
+def _ends_with_newline(path):
+
+	with open(path, "rb") as results_file:
+		results_file.seek(-1, os.SEEK_END)
+		return results_file.read(1) == b"\n"
+
+
+
+def _open_csv(path, mode):
+
+	if sys.version_info[0] >= 3:
+		return open(path, mode, newline="")
+	return open(path, mode + "b")
+
@@ -0,0 +1,145 @@
+#####################################################################
+#																	#
+#	Module: 		roomindex.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	On-disk index of Spark room ids by title and 	#
+#					token, so rooms are reused between runs			#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for storing the index
+import os
+import json
+import time
+import hashlib
+
+# Used for finding the state folder
+import fsprobe
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Seconds a room id is trusted before it is looked up again
+DEFAULT_TTL = 7 * 24 * 3600
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		default_index_file
+
+Description:	Returns the per-user room index file.
+
+Arguments:		None
+
+Return:			result 	- file path
+"""
+def default_index_file():
+
+	return fsprobe.state_dir("rooms.json")
+
+
+
+"""
+Function: 		token_identity
+
+Description:	Key the rooms of a token are filed under. The token itself is not stored.
+
+Arguments:		spark_token - Cisco Spark API user authentication token string
+
+Return:			result 		- hex digest string
+"""
+def token_identity(spark_token):
+
+	return hashlib.sha256(spark_token.encode("utf-8")).hexdigest()[:32]
+
+
+
+"""
+Function: 		lookup
+
+Description:	Returns the room id saved for a title, without any network request.
+
+Arguments:		index_file 	- room index file path
+				spark_token - Cisco Spark API user authentication token string
+				title 		- room title
+				ttl 		- seconds a saved room id is trusted
+
+Return:			result 		- room id string, None if missing or older than ttl
+"""
+def lookup(index_file, spark_token, title, ttl=DEFAULT_TTL):
+
+	entry = _load_index(index_file).get(token_identity(spark_token), {}).get(title)
+	if entry and time.time() - entry["checked_at"] < ttl:
+		return entry["id"]
+	return None
+
+
+
+"""
+Function: 		remember
+
+Description:	Saves (or refreshes) the room id of a title, leaving the other entries as they are.
+
+Arguments:		index_file 	- room index file path
+				spark_token - Cisco Spark API user authentication token string
+				title 		- room title
+				room_id 	- Cisco Spark room id string
+
+Return:			None
+"""
+def remember(index_file, spark_token, title, room_id):
+
+	index = _load_index(index_file)
+	index.setdefault(token_identity(spark_token), {})[title] = {"id": room_id, "checked_at": time.time()}
+	_save_index(index_file, index)
+
+
+
+"""
+Function: 		forget
+
+Description:	Removes the room id of a title, e.g. after the room was deleted.
+
+Arguments:		index_file 	- room index file path
+				spark_token - Cisco Spark API user authentication token string
+				title 		- room title
+
+Return:			None
+"""
+def forget(index_file, spark_token, title):
+
+	index = _load_index(index_file)
+	if index.get(token_identity(spark_token), {}).pop(title, None) is not None:
+		_save_index(index_file, index)
+
+
+
+def _load_index(index_file):
+
+	try:
+		with open(index_file) as index_in:
+			return json.load(index_in)
+	except (IOError, OSError, ValueError):
+		return {}
+
+
+
+def _save_index(index_file, index):
+
+	folder = os.path.dirname(index_file)
+	if folder and not os.path.isdir(folder):
+		os.makedirs(folder)
+	staging = index_file + ".tmp%d" % os.getpid()
+	with open(staging, "w") as index_out:
+		json.dump(index, index_out, indent=1, sort_keys=True)
+	if os.name == "nt" and os.path.exists(index_file):
+		os.remove(index_file)
+	os.rename(staging, index_file)
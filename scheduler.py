@@ -0,0 +1,275 @@
+#####################################################################
+#																	#
+#	Module: 		scheduler.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Runs workstation checks on a thread pool in 	#
+#					the order their dependencies allow				#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for running checks on worker threads
+import threading
+import collections
+import sys
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+# Used for timing checks
+import tracing
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# A check to run
+#	name 		- unique check name
+#	func 		- function taking no arguments, a false result fails the check
+#	requires 	- names of the checks that must pass first
+Check = collections.namedtuple("Check", ["name", "func", "requires"])
+
+# Outcome of a check, status is one of PASSED, FAILED or CANCELLED
+CheckResult = collections.namedtuple("CheckResult", ["name", "status", "value", "seconds"])
+
+PASSED = "passed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		run_checks
+
+Description:	Runs checks on a pool of worker threads, each as soon as the checks it requires
+				have passed. A check that fails (or raises) cancels every check depending on it.
+				Output printed by a check is shown in the order the checks are listed: the
+				first unfinished check prints as it runs, later ones are held back until
+				it is their turn, so the report reads the same as a serial run.
+
+Arguments:		checks 	- list of Check tuples, in report order
+				workers - maximum number of checks running at once
+
+Return:			results - list of CheckResult tuples, in the same order as checks
+"""
+def run_checks(checks, workers=4):
+
+	names = [check.name for check in checks]
+	by_name = dict((check.name, check) for check in checks)
+	_check_graph(checks, by_name)
+
+	dependents = dict((name, []) for name in names)
+	for check in checks:
+		for required in check.requires:
+			dependents[required].append(check.name)
+
+	results = {}
+	waiting = dict((check.name, set(check.requires)) for check in checks)
+	ready = queue.Queue()
+	done = queue.Queue()
+	output = OrderedOutput(sys.stdout, names)
+
+	def worker():
+		while True:
+			name = ready.get()
+			if name is None:
+				return
+			output.claim(name)
+			start = tracing.clock()
+			try:
+				value = by_name[name].func()
+			except Exception as e:
+				print(u"\t%s raised %s: %s\n" % (name, type(e).__name__, e))
+				value = False
+			output.claim(None)
+			done.put((name, value, tracing.clock() - start))
+
+	def cancel(name, cause):
+		if name in results:
+			return
+		waiting.pop(name, None)
+		results[name] = CheckResult(name, CANCELLED, None, 0.0)
+		output.write_for(name, u"\n\tSkipped %s check, %s did not pass\n" % (name, cause))
+		output.finish(name)
+		for dependent in dependents[name]:
+			cancel(dependent, cause)
+
+	def release(name):
+		released = 0
+		for dependent in dependents[name]:
+			if dependent in waiting:
+				waiting[dependent].discard(name)
+				if not waiting[dependent]:
+					del waiting[dependent]
+					ready.put(dependent)
+					released += 1
+		return released
+
+	pool = [threading.Thread(target=worker) for index in range(max(1, min(workers, len(checks))))]
+	for thread in pool:
+		thread.daemon = True
+		thread.start()
+
+	sys.stdout = output
+	try:
+		for name in names:
+			if not waiting[name]:
+				del waiting[name]
+				ready.put(name)
+
+		running = len(names) - len(waiting)
+		while running:
+
+			# Short waits keep the main thread responsive to Ctrl-C
+			try:
+				name, value, seconds = done.get(timeout=0.1)
+			except queue.Empty:
+				continue
+			running -= 1
+
+			results[name] = CheckResult(name, PASSED if value else FAILED, value, seconds)
+			output.finish(name)
+			if value:
+				running += release(name)
+			else:
+				for dependent in dependents[name]:
+					cancel(dependent, name)
+	finally:
+		sys.stdout = output.stream
+		output.flush_all()
+		for thread in pool:
+			ready.put(None)
+
+	return [results[name] for name in names]
+
+
+
+"""
+Function: 		critical_path
+
+Description:	Works out the longest chain of dependent checks, the least wall time any
+				number of workers could have taken.
+
+Arguments:		checks 	- list of Check tuples
+				results - list of CheckResult tuples from run_checks
+
+Return:			result 	- tuple of (seconds, list of check names along the path)
+"""
+def critical_path(checks, results):
+
+	by_name = dict((check.name, check) for check in checks)
+	seconds = dict((result.name, result.seconds) for result in results)
+	longest = {}
+
+	def path_to(name):
+		if name not in longest:
+			path = max([path_to(required) for required in by_name[name].requires] or [(0.0, [])])
+			longest[name] = (path[0] + seconds.get(name, 0.0), path[1] + [name])
+		return longest[name]
+
+	return max([path_to(check.name) for check in checks] or [(0.0, [])])
+
+
+
+"""
+Class: 			OrderedOutput
+
+Description:	Stand-in for sys.stdout while checks run on worker threads. Each worker claims
+				the output of the check it runs, text from the first unfinished check goes
+				straight to the stream and text from later checks is buffered until every
+				check listed before them has finished.
+"""
+class OrderedOutput(object):
+
+	def __init__(self, stream, names):
+
+		self.stream = stream
+		self.names = names
+		self.buffers = dict((name, []) for name in names)
+		self.finished = set()
+		self.head = 0
+		self.owners = {}
+		self.lock = threading.Lock()
+
+	def __getattr__(self, attr):
+
+		return getattr(self.stream, attr)
+
+	def claim(self, name):
+
+		with self.lock:
+			self.owners[threading.current_thread().ident] = name
+
+	def write(self, text):
+
+		with self.lock:
+			self._write(self.owners.get(threading.current_thread().ident), text)
+
+	def write_for(self, name, text):
+
+		with self.lock:
+			self._write(name, text)
+
+	def flush(self):
+
+		self.stream.flush()
+
+	def finish(self, name):
+
+		with self.lock:
+			self.finished.add(name)
+			while self.head < len(self.names) and self.names[self.head] in self.finished:
+				self.head += 1
+				self._release_head()
+
+	def flush_all(self):
+
+		with self.lock:
+			for name in self.names[self.head:]:
+				self.stream.write(u"".join(self.buffers[name]))
+				self.buffers[name] = []
+			self.head = len(self.names)
+			self.stream.flush()
+
+	def _write(self, name, text):
+
+		if name is None or self.head >= len(self.names) or name == self.names[self.head]:
+			self.stream.write(text)
+		else:
+			self.buffers[name].append(text)
+
+	def _release_head(self):
+
+		if self.head < len(self.names):
+			name = self.names[self.head]
+			self.stream.write(u"".join(self.buffers[name]))
+			self.buffers[name] = []
+
+
+
+def _check_graph(checks, by_name):
+
+	if len(by_name) != len(checks):
+		raise ValueError("Check names must be unique")
+	for check in checks:
+		for required in check.requires:
+			if required not in by_name:
+				raise ValueError("Check '%s' requires unknown check '%s'" % (check.name, required))
+
+	# Repeatedly remove checks whose requirements are all removed, anything left is a cycle
+	remaining = dict((check.name, set(check.requires)) for check in checks)
+	while remaining:
+		free = [name for name, requires in remaining.items() if not requires]
+		if not free:
+			raise ValueError("Checks depend on each other: %s" % ", ".join(sorted(remaining)))
+		for name in free:
+			del remaining[name]
+		for requires in remaining.values():
+			requires.difference_update(free)
@@ -0,0 +1,448 @@
+#####################################################################
+#																	#
+#	Module: 		shell.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Functions for running commands in the OS shell	#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for interacting with OS shell
+import subprocess
+import os
+import sys
+import signal
+
+# Used for draining command pipes and guarding the command cache
+import threading
+import collections
+import time
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+# Used for decoding command output
+import io
+import locale
+
+# Used for recording command timings
+import tracing
+
+# Async command engine requires Python 3.5+, fall back to serial execution
+try:
+	import shell_async
+except (ImportError, SyntaxError):
+	shell_async = None
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Print command output as it is read
+verbose_logging = False
+
+# Seconds a command may run before its process tree is killed, None for no limit
+default_timeout = 900
+
+# Number of output lines kept for error reporting by stream_cmd
+TAIL_LINES = 40
+
+# Longest chunk read from a pipe in one go, bounds memory for output without newlines
+READ_CHUNK = 65536
+
+# Result of a streamed command
+CmdResult = collections.namedtuple("CmdResult", ["cmd", "returncode", "tail", "timed_out", "cancelled", "output_bytes"])
+
+# Environment variables that change the output of cached commands
+cache_env_vars = ["PATH", "VIRTUAL_ENV", "PYTHONPATH", "PYTHONHOME",
+				"PIP_INDEX_URL", "PIP_EXTRA_INDEX_URL", "PIP_FIND_LINKS", "PIP_CONFIG_FILE"]
+
+# Command result cache, keyed by command, working directory and environment
+cmd_cache = {}
+cmd_cache_tags = {}
+cmd_cache_stats = {"hits": 0, "misses": 0, "invalidated": 0}
+cmd_cache_lock = threading.Lock()
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		run_cmd
+
+Description:	Used to send commands to underlying os shell.
+				This will be sent as a subprocess to a secondary shell.
+				Useful when os level operations are required.
+				stdout and stderr are drained together so a chatty command cannot block,
+				and the command is killed once it runs past the timeout.
+
+Arguments:		cmd 	- command string to run in cmd
+				timeout - seconds before the command is killed, defaults to default_timeout
+
+Return:			result 	- stdout lines from running the command, empty if it timed out
+"""
+def run_cmd(cmd, timeout=None):
+
+	# Initialize result array
+	result = []
+
+	def collect(stream, line):
+		if stream == "stdout":
+			result.append(line)
+			if verbose_logging:
+				print(line)
+
+	status = stream_cmd(cmd, collect, timeout)
+
+	# Partial output is not trusted, report what the command printed last
+	if status.timed_out:
+		print(u"\tCommand '%s' did not finish within %s seconds and was stopped" % (cmd, _timeout_or_default(timeout)))
+		for line in status.tail:
+			print(u"\t\t%s" % line.rstrip("\n"))
+		return []
+
+	return result
+
+
+
+"""
+Function: 		stream_cmd
+
+Description:	Runs a command and hands each output line to a callback as soon as it is read.
+				stdout and stderr are read on separate threads so neither pipe can fill up
+				and stall the command. Only the last tail_lines lines are kept, so memory
+				stays bounded however much the command prints.
+				On timeout or cancellation the whole process tree is killed.
+
+Arguments:		cmd 		- command string to run in cmd
+				on_line 	- optional callback(stream, line), stream is "stdout" or "stderr"
+				timeout 	- seconds before the command is killed, defaults to default_timeout
+				tail_lines 	- number of trailing output lines kept for error reporting
+				cancel 		- optional threading.Event, the command is killed once it is set
+
+Return:			result 		- CmdResult tuple (cmd, returncode, tail, timed_out, cancelled, output_bytes)
+"""
+def stream_cmd(cmd, on_line=None, timeout=None, tail_lines=TAIL_LINES, cancel=None):
+
+	timeout = _timeout_or_default(timeout)
+	deadline = None
+	if timeout:
+		deadline = time.time() + timeout
+
+	tail = collections.deque(maxlen=tail_lines)
+	lines = queue.Queue()
+	output_bytes = {"stdout": 0, "stderr": 0}
+	timed_out = False
+	cancelled = False
+	start = tracing.clock()
+
+	# Open pipe in subprocess, in its own process group so the whole tree can be killed
+	process = subprocess.Popen(cmd,
+								shell=True,
+								stdin=_devnull(),
+								stdout=subprocess.PIPE,
+								stderr=subprocess.PIPE,
+								**process_group_kwargs())
+
+	readers = [threading.Thread(target=_drain_pipe, args=(process.stdout, "stdout", lines, output_bytes)),
+				threading.Thread(target=_drain_pipe, args=(process.stderr, "stderr", lines, output_bytes))]
+	for reader in readers:
+		reader.daemon = True
+		reader.start()
+
+	try:
+		open_pipes = len(readers)
+		while open_pipes or process.poll() is None:
+
+			# Stop the command once it runs out of time or is cancelled
+			if deadline is not None and time.time() >= deadline:
+				timed_out = True
+				break
+			if cancel is not None and cancel.is_set():
+				cancelled = True
+				break
+
+			if not open_pipes:
+				time.sleep(0.05)
+				continue
+
+			# Short waits keep the loop responsive to timeouts and Ctrl-C
+			try:
+				stream, line = lines.get(timeout=0.1)
+			except queue.Empty:
+				continue
+
+			if line is None:
+				open_pipes -= 1
+				continue
+
+			tail.append(line)
+			if on_line is not None:
+				on_line(stream, line)
+	finally:
+		if process.poll() is None:
+			kill_process_tree(process)
+
+	returncode = process.wait()
+
+	# Close the pipes once their readers have finished
+	for reader, pipe in zip(readers, [process.stdout, process.stderr]):
+		reader.join(1)
+		if not reader.is_alive():
+			pipe.close()
+
+	total_bytes = output_bytes["stdout"] + output_bytes["stderr"]
+	tracing.record_cmd(cmd, start, tracing.clock(), returncode, total_bytes)
+	return CmdResult(cmd, returncode, list(tail), timed_out, cancelled, total_bytes)
+
+
+
+"""
+Function: 		process_group_kwargs
+
+Description:	Popen keyword arguments that start a command in its own process group,
+				so kill_process_tree can stop it along with any children it started.
+
+Arguments:		None
+
+Return:			kwargs 	- dictionary of Popen keyword arguments
+"""
+def process_group_kwargs():
+
+	if os.name == "nt":
+		return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+	if sys.version_info[0] >= 3:
+		return {"start_new_session": True}
+	return {"preexec_fn": os.setsid}
+
+
+
+"""
+Function: 		kill_process_tree
+
+Description:	Kills a command started with process_group_kwargs and every process it started.
+
+Arguments:		process - Popen or asyncio Process object
+
+Return:			None
+"""
+def kill_process_tree(process):
+
+	try:
+		if os.name == "nt":
+			subprocess.call("taskkill /F /T /PID %d" % process.pid,
+							stdout=_devnull(), stderr=_devnull())
+		else:
+			os.killpg(process.pid, signal.SIGKILL)
+	except OSError:
+		pass
+
+
+
+"""
+Function: 		run_cmds
+
+Description:	Runs a batch of independent commands at the same time.
+				Results are returned in the same order as the commands, each in the
+				same format returned by run_cmd.
+				Falls back to running each command in turn when asyncio is unavailable, or
+				cannot start subprocesses from the calling thread (see subprocess_supported).
+
+Arguments:		cmds 			- list of command strings to run
+				max_concurrency - maximum number of commands running at once
+				timeout 		- seconds before each command is killed, defaults to default_timeout
+
+Return:			results 		- list of command outputs
+"""
+def run_cmds(cmds, max_concurrency=4, timeout=None):
+
+	# Serial fallback for interpreters, or threads, without asyncio subprocess support
+	if shell_async is None or not shell_async.subprocess_supported():
+		return [run_cmd(cmd, timeout) for cmd in cmds]
+
+	return shell_async.run_cmds(cmds, max_concurrency, verbose_logging, timeout)
+
+
+
+"""
+Function: 		decode_lines
+
+Description:	Decodes raw command output into lines the same way run_cmd reads them.
+				Line endings are normalised to '\\n' and kept on each line.
+
+Arguments:		data 	- bytes read from a command pipe
+
+Return:			lines 	- list of decoded lines
+"""
+def decode_lines(data):
+
+	text = data.decode(locale.getpreferredencoding(False), "replace")
+	return io.StringIO(text, newline=None).readlines()
+
+
+
+"""
+Function: 		run_cmd_cached
+
+Description:	Runs a command through run_cmd, reusing the previous output when the
+				same command was already run from the same directory and environment.
+				Tags group cached results so they can be dropped together with
+				invalidate_cmd_cache, e.g. when a pip install changes the package list.
+				Empty output, from a command that failed or timed out, is not cached.
+
+Arguments:		cmd 	- command string to run in cmd
+				tags 	- list of tag strings to file the result under
+				timeout - seconds before the command is killed, defaults to default_timeout
+
+Return:			result 	- output from running the command
+"""
+def run_cmd_cached(cmd, tags=(), timeout=None):
+
+	key = _cache_key(cmd)
+	result = _cache_lookup(key)
+	if result is None:
+		result = run_cmd(cmd, timeout)
+		_cache_store(key, result, tags)
+
+	return list(result)
+
+
+
+"""
+Function: 		run_cmds_cached
+
+Description:	Cached version of run_cmds.
+				Only commands missing from the cache are run, concurrently.
+				Empty output is not cached, as in run_cmd_cached.
+
+Arguments:		cmd_tags 		- list of (command string, tags) pairs
+				max_concurrency - maximum number of commands running at once
+				timeout 		- seconds before each command is killed, defaults to default_timeout
+
+Return:			results 		- list of command outputs, in the same order as cmd_tags
+"""
+def run_cmds_cached(cmd_tags, max_concurrency=4, timeout=None):
+
+	keys = [_cache_key(cmd) for cmd, tags in cmd_tags]
+	results = [_cache_lookup(key) for key in keys]
+
+	# Run every command that was not cached in a single batch
+	missing = [index for index, result in enumerate(results) if result is None]
+	outputs = run_cmds([cmd_tags[index][0] for index in missing], max_concurrency, timeout)
+	for index, output in zip(missing, outputs):
+		_cache_store(keys[index], output, cmd_tags[index][1])
+		results[index] = output
+
+	return [list(result) for result in results]
+
+
+
+"""
+Function: 		invalidate_cmd_cache
+
+Description:	Drops cached command results.
+
+Arguments:		tag 	- only drop results filed under this tag, all results if None
+
+Return:			count 	- number of cached results dropped
+"""
+def invalidate_cmd_cache(tag=None):
+
+	with cmd_cache_lock:
+		if tag is None:
+			keys = set(cmd_cache)
+		else:
+			keys = cmd_cache_tags.pop(tag, set())
+
+		count = 0
+		for key in keys:
+			if cmd_cache.pop(key, None) is not None:
+				count += 1
+		for tagged in cmd_cache_tags.values():
+			tagged.difference_update(keys)
+
+		cmd_cache_stats["invalidated"] += count
+		return count
+
+
+
+"""
+Function: 		get_cmd_cache_stats
+
+Description:	Reports how often cached command results were reused.
+
+Arguments:		None
+
+Return:			stats 	- dictionary with hits, misses and invalidated counts
+"""
+def get_cmd_cache_stats():
+
+	with cmd_cache_lock:
+		return dict(cmd_cache_stats)
+
+
+
+def _cache_key(cmd):
+
+	env = tuple(os.environ.get(name, "") for name in cache_env_vars)
+	return (cmd, os.getcwd(), env)
+
+
+
+def _cache_lookup(key):
+
+	with cmd_cache_lock:
+		result = cmd_cache.get(key)
+		if result is None:
+			cmd_cache_stats["misses"] += 1
+		else:
+			cmd_cache_stats["hits"] += 1
+		return result
+
+
+
+def _cache_store(key, result, tags):
+
+	# A failed or timed out run is tried again next time
+	if not result:
+		return
+
+	with cmd_cache_lock:
+		cmd_cache[key] = list(result)
+		for tag in tags:
+			cmd_cache_tags.setdefault(tag, set()).add(key)
+
+
+
+def _drain_pipe(pipe, stream, lines, output_bytes):
+
+	try:
+		for chunk in iter(lambda: pipe.readline(READ_CHUNK), b""):
+			output_bytes[stream] += len(chunk)
+			for line in decode_lines(chunk):
+				lines.put((stream, line))
+	except (OSError, ValueError):
+		pass
+	finally:
+		lines.put((stream, None))
+
+
+
+def _timeout_or_default(timeout):
+
+	if timeout is None:
+		return default_timeout
+	return timeout
+
+
+
+def _devnull():
+
+	if hasattr(subprocess, "DEVNULL"):
+		return subprocess.DEVNULL
+	return open(os.devnull, "rb")
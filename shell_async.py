@@ -0,0 +1,173 @@
+#####################################################################
+#																	#
+#	Module: 		shell_async.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Asyncio engine for running shell commands 		#
+#					concurrently (Python 3.5+)						#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for running subprocesses concurrently
+import asyncio
+
+# Used for selecting the event loop implementation
+import sys
+import threading
+
+# Used for decoding command output
+import shell
+
+# Used for recording command timings
+import tracing
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		run_cmd_async
+
+Description:	Coroutine version of run_cmd.
+				Starts the command in a secondary shell and waits for it without blocking
+				the event loop, so other commands can run in the meantime.
+
+Arguments:		cmd 		- command string to run in cmd
+				semaphore 	- optional asyncio.Semaphore limiting concurrent commands
+				verbose 	- print command output once read
+				timeout 	- seconds before the command is killed, defaults to shell.default_timeout
+
+Return:			result 		- output from running the command, empty if it timed out
+"""
+async def run_cmd_async(cmd, semaphore=None, verbose=False, timeout=None):
+
+	if semaphore is None:
+		return await _run_cmd(cmd, verbose, timeout)
+
+	async with semaphore:
+		return await _run_cmd(cmd, verbose, timeout)
+
+
+
+async def _run_cmd(cmd, verbose, timeout):
+
+	if timeout is None:
+		timeout = shell.default_timeout
+	start = tracing.clock()
+
+	# Open pipe in subprocess, in its own process group so the whole tree can be killed
+	process = await asyncio.create_subprocess_shell(cmd,
+								stdin=asyncio.subprocess.DEVNULL,
+								stdout=asyncio.subprocess.PIPE,
+								stderr=asyncio.subprocess.PIPE,
+								**shell.process_group_kwargs())
+
+	# Read stdout and stderr together so neither pipe can fill up
+	try:
+		stdout, stderr = await asyncio.wait_for(process.communicate(), timeout or None)
+	except asyncio.TimeoutError:
+		print(u"\tCommand '%s' did not finish within %s seconds and was stopped" % (cmd, timeout))
+		shell.kill_process_tree(process)
+		await process.communicate()
+		tracing.record_cmd(cmd, start, tracing.clock(), process.returncode, 0)
+		return []
+	except asyncio.CancelledError:
+		shell.kill_process_tree(process)
+		raise
+
+	tracing.record_cmd(cmd, start, tracing.clock(), process.returncode, len(stdout) + len(stderr))
+	result = shell.decode_lines(stdout)
+
+	if verbose:
+		for line in result:
+			print(line)
+
+	return result
+
+
+
+"""
+Function: 		gather_cmds
+
+Description:	Coroutine running a batch of commands with at most max_concurrency
+				commands in flight.
+
+Arguments:		cmds 			- list of command strings to run
+				max_concurrency - maximum number of commands running at once
+				verbose 		- print command output once read
+				timeout 		- seconds before each command is killed
+
+Return:			results 		- list of command outputs, in the same order as cmds
+"""
+async def gather_cmds(cmds, max_concurrency, verbose=False, timeout=None):
+
+	semaphore = asyncio.Semaphore(max(1, max_concurrency))
+	tasks = [run_cmd_async(cmd, semaphore, verbose, timeout) for cmd in cmds]
+	return await asyncio.gather(*tasks)
+
+
+
+"""
+Function: 		run_cmds
+
+Description:	Blocking entry point for gather_cmds.
+				Runs the batch on a private event loop and returns once every command
+				has finished.
+
+Arguments:		cmds 			- list of command strings to run
+				max_concurrency - maximum number of commands running at once
+				verbose 		- print command output once read
+				timeout 		- seconds before each command is killed
+
+Return:			results 		- list of command outputs, in the same order as cmds
+"""
+def run_cmds(cmds, max_concurrency, verbose=False, timeout=None):
+
+	return run_coroutine(gather_cmds(cmds, max_concurrency, verbose, timeout))
+
+
+
+"""
+Function: 		subprocess_supported
+
+Description:	Checks whether run_cmds can start subprocesses from the calling thread.
+				Before Python 3.8 the Unix child watcher only works with the main thread's
+				event loop, so commands run on a check's worker thread would fail to start.
+
+Arguments:		None
+
+Return:			result 	- Boolean value
+"""
+def subprocess_supported():
+
+	return sys.platform == "win32" or sys.version_info >= (3, 8) or threading.current_thread() is threading.main_thread()
+
+
+
+"""
+Function: 		run_coroutine
+
+Description:	Runs a coroutine to completion on a new event loop.
+				Windows needs the proactor loop for subprocess support.
+
+Arguments:		coro 	- coroutine to run
+
+Return:			result 	- value returned by the coroutine
+"""
+def run_coroutine(coro):
+
+	if sys.platform == "win32":
+		loop = asyncio.ProactorEventLoop()
+	else:
+		loop = asyncio.new_event_loop()
+
+	asyncio.set_event_loop(loop)
+	try:
+		return loop.run_until_complete(coro)
+	finally:
+		asyncio.set_event_loop(None)
+		loop.close()
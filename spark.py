@@ -13,6 +13,17 @@
 import requests
 import json
 
+# Used for pooling kept-alive connections
+from requests.adapters import HTTPAdapter
+
+# Used for sharing one client per token between threads
+import threading
+
+# Used for pacing, backing off and parsing Retry-After
+import time
+import random
+from email.utils import parsedate_tz, mktime_tz
+
 #####################################################################
 #						Environment Settings						#
 #####################################################################
@@ -23,10 +34,379 @@ spark_uri = 'https://api.ciscospark.com/v1'
 # Requests
 requests.packages.urllib3.disable_warnings() 
 
+# Kept-alive connections per client, raise for bulk scripts running requests on many threads
+POOL_SIZE = 10
+
+# Verify the API certificate, False only behind a proxy that re-signs TLS
+VERIFY_TLS = True
+
+# Items requested per page when listing, later pages are fetched only while needed
+PAGE_SIZE = 100
+
+# Most requests per second sent by one client, halved each time the API throttles it and
+# raised again by RATE_STEP per successful request
+RATE_LIMIT = 100.0
+MIN_RATE = 1.0
+RATE_STEP = 0.5
+
+# Retries of a throttled or failed request, with exponential backoff in seconds, jittered
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Longest Retry-After honoured, in seconds
+MAX_RETRY_AFTER = 300.0
+
+# Consecutive failures (server errors or no connection) that open the circuit breaker,
+# and seconds before one trial request is let through again
+FAILURE_THRESHOLD = 5
+RESET_SECONDS = 30.0
+
+# Only these methods are retried after a server error or a lost connection, any method
+# is retried after 429 or a connection that was never made, as the API did not act on it
+idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+retry_statuses = (500, 502, 503, 504)
+
+# Shared clients used by the module functions, one per token
+spark_clients = {}
+spark_clients_lock = threading.Lock()
+
 #####################################################################
 #						Function Definitions						#
 #####################################################################
 
+"""
+Class: 			SparkUnavailable
+
+Description:	Raised without sending a request while the circuit breaker is open.
+				A requests ConnectionError, so callers handling those handle it too.
+"""
+class SparkUnavailable(requests.exceptions.ConnectionError):
+	pass
+
+
+
+"""
+Class: 			RequestScheduler
+
+Description:	Paces, retries and guards requests to the Spark API, shared by every thread
+				using a client. A token bucket limits the request rate, which adapts to the
+				API: it halves when requests are answered 429 and creeps back up on success.
+				Retry-After pauses all requests, not just the throttled one. Retries use
+				exponential backoff with full jitter so threads do not retry in step. After
+				FAILURE_THRESHOLD consecutive failures the circuit breaker opens and requests
+				fail fast with SparkUnavailable until a trial request gets through.
+				Counters of sent, throttled, retried, failed and rejected requests are
+				returned by stats().
+"""
+class RequestScheduler(object):
+
+	def __init__(self, rate=RATE_LIMIT, max_retries=MAX_RETRIES, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+
+		self.lock = threading.Lock()
+		self.max_rate = float(rate)
+		self.rate = self.max_rate
+		self.tokens = self.max_rate
+		self.updated = time.time()
+		self.paused_until = 0.0
+		self.max_retries = max_retries
+		self.failure_threshold = failure_threshold
+		self.reset_seconds = reset_seconds
+		self.failures = 0
+		self.opened_at = None
+		self.trial_running = False
+		self.counters = {"sent": 0, "throttled": 0, "retried": 0, "failed": 0, "rejected": 0}
+
+	def send(self, send_request, method, url, **kwargs):
+
+		method = method.upper()
+		attempt = 0
+		while True:
+			trial = self.admit()
+			delay = 0
+			try:
+				self.acquire()
+				response = send_request(method, url, **kwargs)
+			except requests.exceptions.RequestException as e:
+				self.record(success=False)
+				retry = isinstance(e, requests.exceptions.ConnectTimeout) or (method in idempotent_methods
+						and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+						and not isinstance(e, requests.exceptions.SSLError))
+				if not retry or attempt >= self.max_retries:
+					self.count("failed")
+					raise
+				delay = self.backoff(attempt)
+			else:
+				if response.status_code == 429:
+					# The API is up, only busy, so this does not count against the breaker
+					self.count("throttled")
+					self.record(success=True)
+					self.slow_down(retry_after(response) or self.backoff(attempt))
+					retry = True
+				elif response.status_code in retry_statuses:
+					self.record(success=False)
+					delay = retry_after(response) or self.backoff(attempt)
+					retry = method in idempotent_methods
+				else:
+					self.record(success=True)
+					self.speed_up()
+					return response
+				if not retry or attempt >= self.max_retries:
+					self.count("failed")
+					return response
+			finally:
+				# However the trial ended, the next request after the reset time may try again
+				if trial:
+					self.end_trial()
+
+			self.count("retried")
+			attempt += 1
+			time.sleep(delay)
+
+	def admit(self):
+
+		with self.lock:
+			if self.opened_at is None:
+				return False
+			if not self.trial_running and time.time() - self.opened_at >= self.reset_seconds:
+				self.trial_running = True
+				return True
+			self.counters["rejected"] += 1
+			retry_in = max(self.opened_at + self.reset_seconds - time.time(), 0)
+		raise SparkUnavailable("Spark API unavailable after %d failed requests, trying again in %.1f seconds" % (self.failures, retry_in))
+
+	def acquire(self):
+
+		while True:
+			with self.lock:
+				now = time.time()
+				wait = self.paused_until - now
+				if wait <= 0:
+					self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+					self.updated = now
+					if self.tokens >= 1:
+						self.tokens -= 1
+						self.counters["sent"] += 1
+						return
+					wait = (1 - self.tokens) / self.rate
+			time.sleep(wait)
+
+	def end_trial(self):
+
+		with self.lock:
+			self.trial_running = False
+
+	def record(self, success):
+
+		with self.lock:
+			if success:
+				self.failures = 0
+				self.opened_at = None
+			else:
+				self.failures += 1
+				if self.opened_at is not None or self.failures >= self.failure_threshold:
+					self.opened_at = time.time()
+
+	def slow_down(self, pause):
+
+		with self.lock:
+			# Requests already in flight are throttled together, halve once per pause
+			now = time.time()
+			if now >= self.paused_until:
+				self.rate = max(self.rate / 2, MIN_RATE)
+				self.tokens = min(self.tokens, self.rate)
+			self.paused_until = max(self.paused_until, now + pause)
+
+	def speed_up(self):
+
+		with self.lock:
+			self.rate = min(self.rate + RATE_STEP, self.max_rate)
+
+	def backoff(self, attempt):
+
+		return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+	def count(self, name):
+
+		with self.lock:
+			self.counters[name] += 1
+
+	def stats(self):
+
+		with self.lock:
+			counters = dict(self.counters)
+			counters["rate"] = round(self.rate, 2)
+			counters["circuit_open"] = self.opened_at is not None
+		return counters
+
+
+
+"""
+Function: 		retry_after
+
+Description:	Reads the Retry-After header of a response, given in seconds or as an HTTP date.
+
+Arguments:		response - HTTP Request response
+
+Return:			seconds - seconds to wait, capped at MAX_RETRY_AFTER, None without a usable header
+"""
+def retry_after(response):
+
+	value = response.headers.get("Retry-After", "").strip()
+	if not value:
+		return None
+	try:
+		seconds = float(value)
+	except ValueError:
+		date = parsedate_tz(value)
+		if date is None:
+			return None
+		seconds = mktime_tz(date) - time.time()
+	return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+
+"""
+Class: 			SparkClient
+
+Description:	Cisco Spark REST API client holding a pooled requests.Session, so consecutive
+				requests reuse kept-alive TCP and TLS connections instead of opening new ones.
+				The authentication headers are built once. Safe to share between threads,
+				at most pool_size connections are kept open. Certificate verification is set
+				once for the session, as requests keeps separate pools for verified and
+				unverified connections. Every request goes through the client's RequestScheduler,
+				so throttled and failed requests are retried within the API's limits.
+"""
+class SparkClient(object):
+
+	def __init__(self, spark_token, pool_size=POOL_SIZE, base_uri=spark_uri, verify=VERIFY_TLS, scheduler=None):
+
+		self.base_uri = base_uri
+		self.scheduler = scheduler or RequestScheduler()
+		self.session = requests.Session()
+		self.session.verify = verify
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+		self.session.headers.update({'Authorization': 'Bearer ' + spark_token,
+									'Content-Type': 'application/json'})
+
+	def request(self, method, url, **kwargs):
+
+		return self.scheduler.send(self.session.request, method, url, **kwargs)
+
+	def get(self, spark_endpoint, spark_params=None):
+
+		return self.request("GET", self.base_uri+spark_endpoint, params=spark_params)
+
+	def post(self, spark_endpoint, spark_payload):
+
+		return self.request("POST", self.base_uri+spark_endpoint, data=json.dumps(spark_payload))
+
+	def stats(self):
+
+		return self.scheduler.stats()
+
+	def close(self):
+
+		self.session.close()
+
+	def get_user_info(self, email):
+
+		return self.get("/people", {"email": email}).json()
+
+	def iter_items(self, spark_endpoint, spark_params=None):
+
+		# One page in memory at a time, the next page URL comes from the Link header
+		url = self.base_uri+spark_endpoint
+		while url:
+			r = self.request("GET", url, params=spark_params)
+			r.raise_for_status()
+			for item in r.json().get("items", []):
+				yield item
+			url = r.links.get("next", {}).get("url")
+			spark_params = None
+
+	def iter_rooms(self, room_type=None, page_size=PAGE_SIZE):
+
+		spark_params = {"max": page_size}
+		if room_type:
+			spark_params["type"] = room_type
+		return self.iter_items("/rooms", spark_params)
+
+	def iter_memberships(self, room_id=None, person_id=None, page_size=PAGE_SIZE):
+
+		spark_params = {"max": page_size}
+		if room_id:
+			spark_params["roomId"] = room_id
+		if person_id:
+			spark_params["personId"] = person_id
+		return self.iter_items("/memberships", spark_params)
+
+	def get_room_id(self, room_name, room_type=None, page_size=PAGE_SIZE):
+
+		# Stop fetching pages at the first room with the title
+		for room in self.iter_rooms(room_type, page_size):
+			if room["title"] == room_name:
+				return room["id"]
+		return ""
+
+	def get_membership(self, person_id):
+
+		return self.get("/memberships", {"personId": person_id})
+
+	def get_room_memberships(self, room_id):
+
+		return self.get("/memberships", {"roomId": room_id})
+
+	def get_message(self, message_id):
+
+		return self.get("/messages/" + message_id).json()["text"]
+
+	def post_message(self, message, room_id):
+
+		return self.post("/messages", {"roomId":room_id, "text":message})
+
+	def post_membership(self, email, room_id):
+
+		r = self.post("/memberships", {"roomId":room_id, "personEmail":email})
+		r.raise_for_status()
+		return r.json()["id"]
+
+	def post_create_room(self, title):
+
+		r = self.post("/rooms", {"title":title})
+		r.raise_for_status()
+		return r.json()["id"]
+
+	def post_create_webhook(self, name, target_url, webhook_filter):
+
+		spark_payload = {"name":name,"targetUrl":target_url,"resource":"messages","event":"created","filter":webhook_filter}
+		return self.post("/webhooks", spark_payload).json()
+
+
+
+"""
+Function: 		get_client
+
+Description:	Returns the shared SparkClient of a token, created on first use.
+				The module functions below all go through it, so they share its connections.
+
+Arguments:		spark_token - Cisco Spark API user authentication token string
+
+Return:			client - SparkClient object
+"""
+def get_client(spark_token):
+
+	with spark_clients_lock:
+		client = spark_clients.get(spark_token)
+		if client is None:
+			client = SparkClient(spark_token)
+			spark_clients[spark_token] = client
+		return client
+
+
+
 """
 Function: 		get_spark_user_info
 
@@ -41,21 +421,7 @@ Return:			response - HTTP Request response
 """
 def get_spark_user_info(email, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/people"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request parameters
-	spark_params = "?email=" + email
-
-	# Send HTTP request
-	r = requests.get(spark_uri+spark_endpoint+spark_params, headers=spark_headers, verify=False).json()
-
-	# Return the HTTP response
-	return r
+	return get_client(spark_token).get_user_info(email)
 
 
 
@@ -64,32 +430,54 @@ Function: 		get_spark_room_id
 
 Description:	Used to get a Spark room id from a given room name.
 				Useful for finding a room id for which to post messages, or add people.
+				Rooms are listed page by page and the search stops at the first match.
 
 Arguments:		room_name - Title of Cisco Spark room to query
 				spark_token - Cisco Spark API user authentication token string
+				room_type - optional room type filter, "group" or "direct"
 
-Return:			response - HTTP Request response
+Return:			room_id - Cisco Spark room id string, empty if no room has the title
+"""
+def get_spark_room_id(room_name, spark_token, room_type=None):
+
+	return get_client(spark_token).get_room_id(room_name, room_type)
+
+
+
+"""
+Function: 		iter_spark_rooms
+
+Description:	Lists the rooms the user belongs to, following the API's pagination.
+				Pages are fetched as the generator is consumed, so stopping early saves requests.
+
+Arguments:		spark_token - Cisco Spark API user authentication token string
+				room_type - optional room type filter, "group" or "direct"
+				page_size - rooms requested per page
+
+Return:			rooms - generator of room dictionaries
 """
-def get_spark_room_id(room_name, spark_token):
+def iter_spark_rooms(spark_token, room_type=None, page_size=PAGE_SIZE):
+
+	return get_client(spark_token).iter_rooms(room_type, page_size)
+
+
 
-	# Set API endpoint
-	spark_endpoint = "/rooms"
+"""
+Function: 		iter_spark_memberships
 
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
+Description:	Lists memberships of a room or of a person, following the API's pagination.
+				Pages are fetched as the generator is consumed, so stopping early saves requests.
 
-	# Send HTTP request
-	r = requests.get(spark_uri+spark_endpoint, headers=spark_headers, verify=False).json()
+Arguments:		spark_token - Cisco Spark API user authentication token string
+				room_id - optional Spark room id string filter
+				person_id - optional Spark person id string filter
+				page_size - memberships requested per page
 
-	# Parse response for room_id
-	room_id = ""
-	for items in r["items"]:
-		if items["title"] == room_name:
-			room_id = items["id"]
+Return:			memberships - generator of membership dictionaries
+"""
+def iter_spark_memberships(spark_token, room_id=None, person_id=None, page_size=PAGE_SIZE):
 
-	# Return the HTTP response
-	return room_id
+	return get_client(spark_token).iter_memberships(room_id, person_id, page_size)
 
 
 
@@ -106,21 +494,7 @@ Return:			response - HTTP Request response
 """
 def get_spark_membership(person_id, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/memberships"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request parameters
-	spark_params = "?personId=" + person_id
-
-	# Send HTTP request
-	r = requests.get(spark_uri+spark_endpoint+spark_params, headers=spark_headers, verify=False)
-
-	# Return the HTTP response
-	return r
+	return get_client(spark_token).get_membership(person_id)
 
 
 
@@ -137,21 +511,7 @@ Return:			response - HTTP Request response
 """
 def get_spark_room_memberships(room_id, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/memberships"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request parameters
-	spark_params = "?roomId=" + room_id
-
-	# Send HTTP request
-	r = requests.get(spark_uri+spark_endpoint+spark_params, headers=spark_headers, verify=False)
-
-	# Return the HTTP response
-	return r
+	return get_client(spark_token).get_room_memberships(room_id)
 
 
 
@@ -167,21 +527,7 @@ Return:			response - HTTP Request response
 """
 def get_spark_message(message_id, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/messages/"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token,
-					'Content-Type': 'application/json'}
-
-	# Send HTTP request
-	r = requests.get(spark_uri+spark_endpoint+message_id, headers=spark_headers).json()
-
-	# Parse the response
-	message_text = r["text"]
-
-	# Return the text content of the message
-	return message_text
+	return get_client(spark_token).get_message(message_id)
 
 
 """
@@ -197,21 +543,7 @@ Return:			response - HTTP Request response
 """
 def post_spark_message(message, room_id, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/messages"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request payload
-	spark_payload = {"roomId":room_id, "text":message}
-
-	# Send HTTP request
-	r = requests.post(spark_uri+spark_endpoint, data=json.dumps(spark_payload), headers=spark_headers)
-
-	# Return the HTTP response
-	return r
+	return get_client(spark_token).post_message(message, room_id)
 
 
 
@@ -226,31 +558,11 @@ Arguments:		email - email address of user to add into room
 				spark_token - Cisco Spark API user authentication token string
 
 Return:			membership_id - Spark user membership id string
+				Raises requests.HTTPError if the membership was not created, e.g. 409 for an existing member
 """
 def post_spark_membership(email, room_id, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/memberships"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request payload
-	spark_payload = {"roomId":room_id, "personEmail":email}
-
-	# Send HTTP request
-	r = requests.post(spark_uri+spark_endpoint, data=json.dumps(spark_payload), headers=spark_headers).json()
-
-	# Parse the response for room id
-	membership_id = ""
-	try:
-		membership_id = r["id"]
-	except Exception:
-		print(Exception)
-
-	# Return the HTTP response
-	return membership_id
+	return get_client(spark_token).post_membership(email, room_id)
 
 
 
@@ -263,27 +575,11 @@ Arguments:		title - Title of room displayed to room members
 				spark_token - Cisco Spark API user authentication token string
 
 Return:			room_id - Cisco Spark room id string of created room
+				Raises requests.HTTPError if the room was not created
 """
 def post_spark_create_room(title, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/rooms"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request payload
-	spark_payload = {"title":title}
-
-	# Send HTTP request
-	r = requests.post(spark_uri+spark_endpoint, data=json.dumps(spark_payload), headers=spark_headers).json()
-
-	# Parse the response for room id
-	room_id = r["id"]
-
-	# Return the HTTP response
-	return room_id
+	return get_client(spark_token).post_create_room(title)
 
 
 
@@ -303,18 +599,4 @@ Return:			response - HTTP Request response
 """
 def post_spark_create_webhook(name, target_url, webhook_filter, spark_token):
 
-	# Set API endpoint
-	spark_endpoint = "/webhooks"
-
-	# Set request headers
-	spark_headers = {'Authorization': 'Bearer ' + spark_token, 
-					'Content-Type': 'application/json'}
-
-	# Set request payload
-	spark_payload = {"name":name,"targetUrl":target_url,"resource":"messages","event":"created","filter":webhook_filter}
-
-	# Send HTTP request
-	response = requests.post(spark_uri+spark_endpoint, data=json.dumps(spark_payload), headers=spark_headers).json()
-
-	# Return the HTTP response
-	return response
+	return get_client(spark_token).post_create_webhook(name, target_url, webhook_filter)
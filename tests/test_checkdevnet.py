@@ -0,0 +1,246 @@
+#####################################################################
+#																	#
+#	Module: 		test_checkdevnet.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the checkDevNet install steps			#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+import checkDevNet
+import lockfile
+
+
+
+# Stands in for pip, which abandons the whole run when any one package is broken
+class FakePip(object):
+
+	def __init__(self, broken=(), down=()):
+
+		self.broken = set(broken)
+		self.down = list(down)
+		self.installed = {}
+		self.runs = []
+		self.options = []
+
+	def run_streamed(self, command, *args, **kwargs):
+
+		options, sep, path = command.partition(" -r ")
+		with open(path.strip('"')) as requirements_file:
+			lines = [line.strip() for line in requirements_file]
+		self.runs.append(lines)
+		self.options.append(options)
+
+		requirements = [lockfile.parse_requirement(line) for line in lines]
+		if any(index_url in options for index_url in self.down):
+			return []
+		if not self.broken.intersection(requirement.key for requirement in requirements):
+			for requirement in requirements:
+				self.installed[requirement.key] = requirement.specifier[2:] if requirement.specifier.startswith("==") else "1.0"
+		return []
+
+	def get_package_inventory(self, pip_str):
+
+		return dict(self.installed)
+
+
+
+@unittest.skipIf(mock is None, "mock is not available")
+class InstallLibrariesTest(unittest.TestCase):
+
+	def install(self, pip, lines, source_opts="", fallbacks=(), **kwargs):
+
+		libraries = [lockfile.parse_requirement(line) for line in lines]
+		self.forgotten = []
+		patches = [mock.patch.object(checkDevNet, "pip_source_opts", source_opts),
+					mock.patch.object(checkDevNet, "package_index_fallbacks", list(fallbacks)),
+					mock.patch.object(checkDevNet.mirrors, "forget", lambda kind, cache_file: self.forgotten.append(kind)),
+					mock.patch.object(checkDevNet, "run_streamed", pip.run_streamed),
+					mock.patch.object(checkDevNet, "get_package_inventory", pip.get_package_inventory),
+					mock.patch.object(checkDevNet, "invalidate_cmd_cache", lambda *tags: 0),
+					mock.patch.object(checkDevNet, "WHEEL_CACHE_DIR", "")]
+		stdout = sys.stdout
+		sys.stdout = StringIO()
+		try:
+			for patch in patches:
+				patch.start()
+			return checkDevNet.install_libraries(libraries, "pip3", "Linux", **kwargs)
+		finally:
+			for patch in patches:
+				patch.stop()
+			sys.stdout = stdout
+
+	def test_single_batch(self):
+
+		pip = FakePip()
+		self.assertTrue(self.install(pip, ["requests", "PyYAML==5.1"]))
+		self.assertEqual(pip.runs, [["requests", "PyYAML==5.1"]])
+		self.assertEqual(pip.installed, {"requests": "1.0", "pyyaml": "5.1"})
+
+	def test_failures_are_retried_one_at_a_time(self):
+
+		pip = FakePip(broken=["broken"])
+		self.assertFalse(self.install(pip, ["requests", "broken"]))
+		self.assertEqual(pip.runs, [["requests", "broken"], ["requests"], ["broken"]])
+		self.assertEqual(sorted(pip.installed), ["requests"])
+
+	def test_locked_install_options(self):
+
+		pip = FakePip()
+		self.assertTrue(self.install(pip, ["requests==2.18.4"], locked=True, with_hashes=True))
+		self.assertIn(" --no-deps", pip.options[0])
+		self.assertIn(" --require-hashes", pip.options[0])
+
+	def test_next_index_is_tried(self):
+
+		pip = FakePip(down=["http://mirror.local/simple/"])
+		self.assertTrue(self.install(pip, ["requests", "PyYAML"], checkDevNet.index_options("http://mirror.local/simple/"),
+										["http://backup.local/simple/"]))
+		self.assertEqual(pip.runs, [["requests", "PyYAML"], ["requests"], ["PyYAML"], ["requests", "PyYAML"]])
+		self.assertIn("--index-url http://backup.local/simple/", pip.options[-1])
+		self.assertEqual(self.forgotten, ["pypi"])
+
+	def test_no_more_indexes(self):
+
+		pip = FakePip(down=["http://mirror.local/simple/", "http://backup.local/simple/"])
+		self.assertFalse(self.install(pip, ["requests"], checkDevNet.index_options("http://mirror.local/simple/"),
+										["http://backup.local/simple/"]))
+		self.assertEqual(len(pip.runs), 2)
+		self.assertEqual(self.forgotten, ["pypi"])
+
+
+
+@unittest.skipIf(mock is None, "mock is not available")
+class BuildVirtEnvTest(unittest.TestCase):
+
+	def build(self, seed_wheels):
+
+		self.commands = []
+		self.created = []
+		patches = [mock.patch.object(checkDevNet, "VENV_IN_PROCESS", True),
+					mock.patch.object(checkDevNet, "WHEEL_CACHE_DIR", ""),
+					mock.patch.object(checkDevNet, "run_streamed", lambda command, *args, **kwargs: self.commands.append(command) or True),
+					mock.patch.object(checkDevNet.virtenv, "find_seed_wheels", lambda seed_dirs: seed_wheels),
+					mock.patch.object(checkDevNet.virtenv, "create_env", lambda env_dir, wheels: self.created.append(wheels))]
+		stdout = sys.stdout
+		sys.stdout = StringIO()
+		try:
+			for patch in patches:
+				patch.start()
+			return checkDevNet.build_virt_env("env", "Linux", sys.executable)
+		finally:
+			for patch in patches:
+				patch.stop()
+			sys.stdout = stdout
+
+	def test_seeded_in_process(self):
+
+		wheels = ["/wheels/pip-9.0.1-py2.py3-none-any.whl", "/wheels/setuptools-39.0.1-py2.py3-none-any.whl"]
+		self.assertTrue(self.build(wheels))
+		self.assertEqual(self.created, [wheels])
+		self.assertEqual(self.commands, [])
+
+	def test_no_pip_wheel_falls_back_to_virtualenv(self):
+
+		self.assertTrue(self.build(["/wheels/setuptools-39.0.1-py2.py3-none-any.whl"]))
+		self.assertEqual(self.created, [])
+		self.assertEqual(self.commands, ['%s -m virtualenv "env"' % sys.executable])
+
+
+
+@unittest.skipIf(mock is None, "mock is not available")
+class UpdateSparseCheckoutTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.repo = tempfile.mkdtemp()
+		os.makedirs(os.path.join(self.repo, ".git", "info"))
+		with open(os.path.join(self.repo, ".git", "config"), "w") as config_file:
+			config_file.write("[core]\n\tsparseCheckout = true\n\tsparseCheckoutCone = true\n")
+		# What 'git sparse-checkout set --cone a a/b' writes, git keeps only the outer folder
+		with open(os.path.join(self.repo, ".git", "info", "sparse-checkout"), "w") as sparse_file:
+			sparse_file.write("/*\n!/*/\n/a/\n")
+
+	def tearDown(self):
+
+		shutil.rmtree(self.repo)
+
+	def update(self, track_folders):
+
+		self.commands = []
+		patches = [mock.patch.object(checkDevNet, "run_streamed", lambda command, *args, **kwargs: self.commands.append(command) or True),
+					mock.patch.object(checkDevNet, "invalidate_cmd_cache", lambda *tags: 0)]
+		stdout = sys.stdout
+		sys.stdout = StringIO()
+		try:
+			for patch in patches:
+				patch.start()
+			return checkDevNet.update_sparse_checkout(self.repo, track_folders)
+		finally:
+			for patch in patches:
+				patch.stop()
+			sys.stdout = stdout
+
+	def test_nested_folder_is_already_checked_out(self):
+
+		self.assertTrue(self.update(["a", "a/b"]))
+		self.assertEqual(self.commands, [])
+
+	def test_changed_manifest(self):
+
+		self.assertTrue(self.update(["a/b", "c"]))
+		self.assertEqual(self.commands, ['git -C "%s" sparse-checkout set --cone "a/b" "c"' % self.repo])
+
+
+
+class CheckVenvScriptsTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.scripts_dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+
+		shutil.rmtree(self.scripts_dir)
+
+	def write(self, name, mode=0o644):
+
+		path = os.path.join(self.scripts_dir, name)
+		with open(path, "w") as script_file:
+			script_file.write("#!/bin/sh\n")
+		os.chmod(path, mode)
+
+	def test_complete_folder(self):
+
+		suffix = ".exe" if os.name == "nt" else ""
+		self.write("python" + suffix, 0o755)
+		self.write("pip" + suffix, 0o755)
+		self.assertFalse(checkDevNet.check_venv_scripts(self.scripts_dir))
+		self.write("activate")
+		self.assertTrue(checkDevNet.check_venv_scripts(self.scripts_dir))
+
+	@unittest.skipIf(os.name == "nt", "Windows decides executables by extension")
+	def test_pip_must_be_executable(self):
+
+		self.write("python", 0o755)
+		self.write("pip")
+		self.write("activate")
+		self.assertFalse(checkDevNet.check_venv_scripts(self.scripts_dir))
+
+	def test_missing_folder(self):
+
+		self.assertFalse(checkDevNet.check_venv_scripts(os.path.join(self.scripts_dir, "missing")))
@@ -0,0 +1,129 @@
+#####################################################################
+#																	#
+#	Module: 		test_fingerprint.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the environment fingerprint			#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import fingerprint
+
+COMMIT_A = "a" * 40
+COMMIT_B = "b" * 40
+
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.env_root = os.path.join(self.work_dir, "env")
+		self.site_dir = os.path.join(self.env_root, "lib", "python3.6", "site-packages")
+		os.makedirs(os.path.join(self.site_dir, "requests-2.18.4.dist-info"))
+		self.repo = os.path.join(self.work_dir, "repo")
+		os.makedirs(os.path.join(self.repo, ".git", "refs", "heads"))
+		self.requirements = os.path.join(self.work_dir, "requirements.txt")
+		self.write(self.requirements, "requests\n")
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+	def write(self, path, text):
+
+		with open(path, "w") as out_file:
+			out_file.write(text)
+
+	def git_file(self, name, text):
+
+		self.write(os.path.join(self.repo, ".git", name), text)
+
+	def compute(self):
+
+		return fingerprint.compute(self.env_root, [self.requirements], self.repo)
+
+
+
+class ChangedComponentsTest(FingerprintTestCase):
+
+	def test_nothing_saved(self):
+
+		current = {"inputs": "1", "version": 1}
+		self.assertEqual(fingerprint.changed_components(None, current), ["inputs", "version"])
+
+	def test_unchanged(self):
+
+		self.git_file("HEAD", COMMIT_A + "\n")
+		self.assertEqual(fingerprint.changed_components(self.compute(), self.compute()), [])
+
+	def test_changed_input_file(self):
+
+		saved = self.compute()
+		self.write(self.requirements, "requests\nPyYAML\n")
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), ["inputs"])
+
+	def test_changed_site_packages(self):
+
+		saved = self.compute()
+		os.makedirs(os.path.join(self.site_dir, "PyYAML-5.1.dist-info"))
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), ["site_packages"])
+
+
+
+class RepositoryTest(FingerprintTestCase):
+
+	def test_branch_ref(self):
+
+		self.git_file("HEAD", "ref: refs/heads/master\n")
+		self.git_file(os.path.join("refs", "heads", "master"), COMMIT_A + "\n")
+		saved = self.compute()
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), [])
+
+		self.git_file(os.path.join("refs", "heads", "master"), COMMIT_B + "\n")
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), ["repository"])
+
+	def test_packed_ref(self):
+
+		self.git_file("HEAD", "ref: refs/heads/master\n")
+		self.git_file("packed-refs", "# pack-refs with: peeled fully-peeled sorted\n%s refs/heads/master\n" % COMMIT_A)
+		saved = self.compute()
+
+		self.git_file("packed-refs", "%s refs/heads/master\n" % COMMIT_B)
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), ["repository"])
+
+	def test_detached_head(self):
+
+		self.git_file("HEAD", COMMIT_A + "\n")
+		saved = self.compute()
+		self.git_file("HEAD", COMMIT_B + "\n")
+		self.assertEqual(fingerprint.changed_components(saved, self.compute()), ["repository"])
+
+
+
+class SavedFingerprintTest(FingerprintTestCase):
+
+	def test_roundtrip(self):
+
+		current = self.compute()
+		self.assertIsNone(fingerprint.read(self.env_root))
+		fingerprint.write(self.env_root, current)
+
+		saved = fingerprint.read(self.env_root)
+		self.assertIn("saved_at", saved)
+		self.assertEqual(fingerprint.changed_components(saved, current), [])
+
+		fingerprint.remove(self.env_root)
+		self.assertIsNone(fingerprint.read(self.env_root))
+		fingerprint.remove(self.env_root)
+
+	def test_corrupt_file(self):
+
+		self.write(os.path.join(self.env_root, fingerprint.FINGERPRINT_FILE), "{not json")
+		self.assertIsNone(fingerprint.read(self.env_root))
@@ -0,0 +1,124 @@
+#####################################################################
+#																	#
+#	Module: 		test_fsprobe.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the in-process filesystem probes		#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import fsprobe
+
+
+
+class FsProbeTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.folder = os.path.join(self.work_dir, "folder")
+		os.makedirs(self.folder)
+		self.data = os.path.join(self.work_dir, "data.txt")
+		with open(self.data, "w") as data_file:
+			data_file.write("data\n")
+		self.script = os.path.join(self.work_dir, "tool.bat" if os.name == "nt" else "tool")
+		with open(self.script, "w") as script_file:
+			script_file.write("#!/bin/sh\n")
+		os.chmod(self.script, 0o755)
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+
+
+class ProbePathTest(FsProbeTestCase):
+
+	def test_missing_path(self):
+
+		missing = os.path.join(self.work_dir, "missing")
+		self.assertEqual(fsprobe.probe_path(missing), fsprobe.PathProbe(missing, False, False, False, False))
+
+	def test_folder(self):
+
+		result = fsprobe.probe_path(self.folder)
+		self.assertTrue(result.exists)
+		self.assertTrue(result.is_dir)
+		self.assertFalse(result.is_file)
+		self.assertFalse(result.is_executable)
+
+	def test_plain_file(self):
+
+		result = fsprobe.probe_path(self.data)
+		self.assertTrue(result.exists)
+		self.assertTrue(result.is_file)
+		self.assertFalse(result.is_dir)
+		self.assertFalse(result.is_executable)
+
+	def test_executable_file(self):
+
+		result = fsprobe.probe_path(self.script)
+		self.assertTrue(result.is_file)
+		self.assertTrue(result.is_executable)
+
+
+
+class ListDirTest(FsProbeTestCase):
+
+	def test_entries(self):
+
+		entries = fsprobe.list_dir(self.work_dir)
+		self.assertEqual(sorted(entries), sorted(["folder", "data.txt", os.path.basename(self.script)]))
+		self.assertTrue(entries["folder"].is_dir)
+		self.assertTrue(entries["data.txt"].is_file)
+		self.assertFalse(entries["data.txt"].is_executable)
+		self.assertTrue(entries[os.path.basename(self.script)].is_executable)
+		self.assertEqual(entries["data.txt"].path, self.data)
+
+	def test_not_a_folder(self):
+
+		self.assertEqual(fsprobe.list_dir(self.data), {})
+		self.assertEqual(fsprobe.list_dir(os.path.join(self.work_dir, "missing")), {})
+
+
+
+class FindExecutableTest(FsProbeTestCase):
+
+	def test_found(self):
+
+		result = fsprobe.find_executable(self.work_dir, "tool")
+		self.assertEqual(result.path, self.script)
+
+	def test_plain_file_is_not_executable(self):
+
+		self.assertIsNone(fsprobe.find_executable(self.work_dir, "data.txt"))
+		self.assertIsNone(fsprobe.find_executable(self.work_dir, "folder"))
+		self.assertIsNone(fsprobe.find_executable(self.work_dir, "missing"))
+
+	def test_executable_names(self):
+
+		names = fsprobe.executable_names("python")
+		self.assertEqual(names[0], "python")
+		self.assertEqual(names[1:], ["python" + ext for ext in fsprobe.executable_exts])
+
+	@unittest.skipIf(os.name == "nt", "Windows keeps state under LOCALAPPDATA")
+	def test_state_dir(self):
+
+		saved = os.environ.pop("XDG_CACHE_HOME", None)
+		try:
+			self.assertEqual(fsprobe.state_dir(), os.path.join(os.path.expanduser("~"), ".cache", "checkdevnet"))
+			os.environ["XDG_CACHE_HOME"] = self.work_dir
+			self.assertEqual(fsprobe.state_dir("wheels"), os.path.join(self.work_dir, "checkdevnet", "wheels"))
+		finally:
+			os.environ.pop("XDG_CACHE_HOME", None)
+			if saved is not None:
+				os.environ["XDG_CACHE_HOME"] = saved
+
+	def test_current_dir(self):
+
+		self.assertEqual(fsprobe.current_dir(), os.getcwd())
@@ -0,0 +1,187 @@
+#####################################################################
+#																	#
+#	Module: 		test_gitrepo.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for git commands and reading the .git		#
+#					folder											#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import gitrepo
+
+URL = "https://github.com/CiscoDevNet/dnav3-code"
+COMMIT_A = "a" * 40
+COMMIT_B = "b" * 40
+
+
+
+class CloneCommandTest(unittest.TestCase):
+
+	def test_strategies(self):
+
+		self.assertEqual(gitrepo.clone_command(URL, "code"), 'git clone %s "code"' % URL)
+		self.assertEqual(gitrepo.clone_command(URL, "code", "shallow", 5), 'git clone --depth 5 %s "code"' % URL)
+		self.assertEqual(gitrepo.clone_command(URL, "code", "blobless"), 'git clone --filter=blob:none %s "code"' % URL)
+		self.assertEqual(gitrepo.clone_command(URL, "code", "reference", mirror="/srv/mirror"),
+							'git clone --reference-if-able "/srv/mirror" --dissociate %s "code"' % URL)
+
+	def test_mirror_replaces_the_url(self):
+
+		self.assertEqual(gitrepo.clone_command(URL, "code", "mirror", mirror="file:///srv/mirror.git"),
+							'git clone file:///srv/mirror.git "code"')
+
+	def test_unknown_strategy(self):
+
+		self.assertRaises(ValueError, gitrepo.clone_command, URL, "code", "sparse")
+
+	def test_mirror_strategies_need_a_mirror(self):
+
+		for strategy in gitrepo.MIRROR_STRATEGIES:
+			self.assertRaises(ValueError, gitrepo.clone_options, strategy)
+
+	def test_sparse(self):
+
+		self.assertEqual(gitrepo.clone_command(URL, "code", "blobless", sparse=True),
+							'git clone --filter=blob:none --sparse %s "code"' % URL)
+
+
+
+class GitDirTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.repo = tempfile.mkdtemp()
+		os.makedirs(os.path.join(self.repo, ".git", "info"))
+
+	def tearDown(self):
+
+		shutil.rmtree(self.repo)
+
+	def write(self, name, text):
+
+		path = os.path.join(self.repo, name)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(path, "w") as out_file:
+			out_file.write(text)
+
+
+
+class SparseCheckoutTest(GitDirTestCase):
+
+	def test_read_manifest(self):
+
+		self.write("track.txt", "# Track 1\nsrc\\app\n\n/docs/  # guides\nsrc/app\n")
+		self.assertEqual(gitrepo.read_manifest(os.path.join(self.repo, "track.txt")), ["docs", "src/app"])
+
+	def test_cone_folders_are_read(self):
+
+		self.write(os.path.join(".git", "config"), "[core]\n\tbare = false\n[extensions]\n\tworktreeConfig = true\n")
+		self.write(os.path.join(".git", "config.worktree"), "[core]\n\tsparseCheckout = true\n\tsparseCheckoutCone = true\n")
+		self.write(os.path.join(".git", "info", "sparse-checkout"), "/*\n!/*/\n/docs/\n/src/\n!/src/*/\n/src/app/\n")
+
+		self.assertEqual(gitrepo.sparse_paths(self.repo), ["docs", "src/app"])
+
+	def test_checkout_is_not_sparse(self):
+
+		self.write(os.path.join(".git", "info", "sparse-checkout"), "/*\n!/*/\n/docs/\n")
+		self.assertIsNone(gitrepo.sparse_paths(self.repo))
+		self.write(os.path.join(".git", "config"), "[core]\n\tsparseCheckout = false\n")
+		self.assertIsNone(gitrepo.sparse_paths(self.repo))
+
+	def test_read_config(self):
+
+		self.write(os.path.join(".git", "config"),
+					'[core]\n\tBare = false\n# comment = ignored\n[remote "origin"]\n\turl = "%s"\n' % URL)
+		self.assertEqual(gitrepo.read_config(self.repo), {"core.bare": "false", "remote.origin.url": URL})
+
+	def test_nested_folders_are_covered(self):
+
+		self.assertEqual(gitrepo.cone_folders(["src/app", "docs", "src", "src/app/views", "docs"]), ["docs", "src"])
+		self.assertEqual(gitrepo.cone_folders(["src/app", "src/application"]), ["src/app", "src/application"])
+
+	def test_commands(self):
+
+		self.assertEqual(gitrepo.sparse_set_command("code", ["docs", "src/app"]),
+							'git -C "code" sparse-checkout set --cone "docs" "src/app"')
+		self.assertEqual(gitrepo.sparse_disable_command("code"), 'git -C "code" sparse-checkout disable')
+
+
+	def test_worktree_config_overrides(self):
+
+		self.write(os.path.join(".git", "config"), "[core]\n\tsparseCheckout = false\n")
+		self.write(os.path.join(".git", "config.worktree"), "[core]\n\tsparseCheckout = true\n")
+		self.assertEqual(gitrepo.read_config(self.repo)["core.sparsecheckout"], "true")
+
+
+
+class InspectTest(GitDirTestCase):
+
+	def test_branch_and_upstream(self):
+
+		self.write(os.path.join(".git", "HEAD"), "ref: refs/heads/master\n")
+		self.write(os.path.join(".git", "refs", "heads", "master"), COMMIT_A + "\n")
+		self.write(os.path.join(".git", "refs", "remotes", "upstream", "main"), COMMIT_B + "\n")
+		self.write(os.path.join(".git", "config"), '[branch "master"]\n\tremote = upstream\n\tmerge = refs/heads/main\n')
+
+		state = gitrepo.inspect(self.repo)
+		self.assertEqual(state, gitrepo.RepoState(COMMIT_A, "master", "upstream", "refs/heads/main", COMMIT_B, False))
+
+	def test_packed_refs(self):
+
+		self.write(os.path.join(".git", "HEAD"), "ref: refs/heads/master\n")
+		self.write(os.path.join(".git", "packed-refs"), "# pack-refs with: peeled fully-peeled sorted\n"
+					"%s refs/heads/master\n%s refs/remotes/origin/master\n^%s\n" % (COMMIT_A, COMMIT_B, "c" * 40))
+		self.write(os.path.join(".git", "config"), '[branch "master"]\n\tremote = origin\n\tmerge = refs/heads/master\n')
+
+		state = gitrepo.inspect(self.repo)
+		self.assertEqual((state.head, state.upstream), (COMMIT_A, COMMIT_B))
+
+	def test_detached_shallow_clone(self):
+
+		self.write(os.path.join(".git", "HEAD"), COMMIT_A + "\n")
+		self.write(os.path.join(".git", "shallow"), COMMIT_A + "\n")
+
+		state = gitrepo.inspect(self.repo)
+		self.assertEqual(state, gitrepo.RepoState(COMMIT_A, None, "origin", None, None, True))
+
+	def test_missing_repository(self):
+
+		self.assertIsNone(gitrepo.inspect(os.path.join(self.repo, "missing")).head)
+
+	def test_symbolic_ref(self):
+
+		self.write(os.path.join(".git", "refs", "remotes", "origin", "HEAD"), "ref: refs/remotes/origin/master\n")
+		self.write(os.path.join(".git", "refs", "remotes", "origin", "master"), COMMIT_B + "\n")
+		self.assertEqual(gitrepo.read_ref(self.repo, "refs/remotes/origin/HEAD"), COMMIT_B)
+		self.assertIsNone(gitrepo.read_ref(self.repo, "refs/heads/missing"))
+
+
+
+class UpdateCommandsTest(unittest.TestCase):
+
+	def test_commands(self):
+
+		state = gitrepo.RepoState(COMMIT_A, "master", "origin", "refs/heads/master", COMMIT_A, True)
+		self.assertEqual(gitrepo.ls_remote_command("code", state), 'git -C "code" ls-remote origin refs/heads/master')
+		self.assertEqual(gitrepo.ls_remote_command("code", state._replace(merge_ref=None)), 'git -C "code" ls-remote origin HEAD')
+		self.assertEqual(gitrepo.fetch_command("code", state), 'git -C "code" fetch origin')
+		self.assertEqual(gitrepo.fast_forward_command("code"), 'git -C "code" merge --ff-only @{upstream}')
+
+	def test_parse_ls_remote(self):
+
+		self.assertEqual(gitrepo.parse_ls_remote(["warning: redirecting\n", "%s\trefs/heads/master\n" % COMMIT_B]), COMMIT_B)
+		self.assertIsNone(gitrepo.parse_ls_remote(["fatal: unable to access\n"]))
+
+	def test_parse_status(self):
+
+		lines = ["# branch.oid %s\n" % COMMIT_A, "# branch.head master\n", "# branch.ab +2 -5\n"]
+		self.assertEqual(gitrepo.parse_status(lines), (2, 5, False))
+		self.assertEqual(gitrepo.parse_status(lines + ["1 .M N... 100644 100644 100644 %s %s README.md\n" % (COMMIT_A, COMMIT_A)]), (2, 5, True))
+		self.assertEqual(gitrepo.parse_status([]), (0, 0, False))
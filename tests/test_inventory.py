@@ -0,0 +1,115 @@
+#####################################################################
+#																	#
+#	Module: 		test_inventory.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the installed package inventory		#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+import inventory
+
+
+
+class InventoryTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.env_root = tempfile.mkdtemp()
+		self.site_dir = os.path.join(self.env_root, "lib", "python3.6", "site-packages")
+		os.makedirs(self.site_dir)
+
+		self.write("PyYAML-5.1.dist-info/METADATA", "Metadata-Version: 2.1\nName: PyYAML\nVersion: 5.1\n\nBody\n")
+		self.write("old_tool.egg-info/PKG-INFO", "Metadata-Version: 1.0\nName: old-tool\nVersion: 0.3\n")
+
+	def tearDown(self):
+
+		shutil.rmtree(self.env_root)
+
+	def write(self, name, text):
+
+		path = os.path.join(self.site_dir, name)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(path, "w") as out_file:
+			out_file.write(text)
+
+
+
+class EnvironmentTest(InventoryTestCase):
+
+	def test_normalize_name(self):
+
+		self.assertEqual(inventory.normalize_name("Py_YAML"), "py-yaml")
+		self.assertEqual(inventory.normalize_name("zope.interface"), "zope-interface")
+		self.assertEqual(inventory.normalize_name("a-_.b"), "a-b")
+
+	def test_env_root_from_pip(self):
+
+		pip_path = os.path.join(self.env_root, "bin", "pip")
+		self.assertEqual(inventory.env_root_from_pip(pip_path), os.path.abspath(self.env_root))
+		self.assertIsNone(inventory.env_root_from_pip("pip"))
+
+	def test_find_site_packages(self):
+
+		self.assertEqual(inventory.find_site_packages(self.env_root), [self.site_dir])
+		self.assertEqual(inventory.find_site_packages(os.path.join(self.env_root, "missing")), [])
+
+	def test_python_version_from_pyvenv_cfg(self):
+
+		with open(os.path.join(self.env_root, "pyvenv.cfg"), "w") as cfg_file:
+			cfg_file.write("home = /usr/bin\nVersion = 3.6.8\n")
+
+		self.assertEqual(inventory.read_pyvenv_cfg(self.env_root), {"home": "/usr/bin", "version": "3.6.8"})
+		self.assertEqual(inventory.env_python_version(self.env_root), "3.6.8")
+
+	def test_python_version_from_folder_name(self):
+
+		self.assertEqual(inventory.read_pyvenv_cfg(self.env_root), {})
+		self.assertEqual(inventory.env_python_version(self.env_root), "3.6")
+
+
+
+class ScanSitePackagesTest(InventoryTestCase):
+
+	def test_metadata(self):
+
+		installed = inventory.scan_site_packages([self.site_dir])
+		self.assertEqual(installed, {"pyyaml": "5.1", "old-tool": "0.3"})
+
+	@unittest.skipIf(mock is None, "mock is not available")
+	def test_folder_names_without_importlib_metadata(self):
+
+		self.write("no_version.dist-info/METADATA", "Name: no-version\nVersion: 2.0\n")
+		with mock.patch.object(inventory, "importlib_metadata", None):
+			installed = inventory.scan_site_packages([self.site_dir])
+
+		self.assertEqual(installed, {"pyyaml": "5.1", "old-tool": "0.3", "no-version": "2.0"})
+
+
+
+class ParsePipListTest(unittest.TestCase):
+
+	def test_json(self):
+
+		lines = ['[{"name": "PyYAML", "version": "5.1"}, ', '{"name": "requests", "version": "2.18.4"}]\n']
+		self.assertEqual(inventory.parse_pip_list(lines), {"pyyaml": "5.1", "requests": "2.18.4"})
+
+	def test_legacy_format(self):
+
+		lines = ["PyYAML (5.1)\n", "pip (9.0.1, /usr/lib/python3/dist-packages)\n"]
+		self.assertEqual(inventory.parse_pip_list(lines), {"pyyaml": "5.1", "pip": "9.0.1"})
+
+	def test_column_format(self):
+
+		lines = ["Package    Version\n", "---------- -------\n", "PyYAML     5.1\n", "\n"]
+		self.assertEqual(inventory.parse_pip_list(lines), {"pyyaml": "5.1"})
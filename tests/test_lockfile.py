@@ -0,0 +1,159 @@
+#####################################################################
+#																	#
+#	Module: 		test_lockfile.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for requirement parsing and version 		#
+#					specifier matching								#
+#																	#
+#####################################################################
+
+import os
+import tempfile
+import unittest
+
+import lockfile
+
+
+
+class ParseVersionTest(unittest.TestCase):
+
+	def test_pep440_ordering(self):
+
+		ordered = ["0.9", "1.0.dev1", "1.0a1.dev1", "1.0a1", "1.0b2", "1.0rc1", "1.0", "1.0.post1.dev1",
+					"1.0.post1", "1.0.1", "1.1a1", "2.0", "1!0.1"]
+		keys = [lockfile.parse_version(version) for version in ordered]
+		self.assertEqual(keys, sorted(keys))
+		self.assertEqual(len(set(keys)), len(keys))
+
+	def test_equivalent_spellings(self):
+
+		self.assertEqual(lockfile.parse_version("1.0"), lockfile.parse_version("1.0.0"))
+		self.assertEqual(lockfile.parse_version("1.0a1"), lockfile.parse_version("1.0-alpha.1"))
+		self.assertEqual(lockfile.parse_version("1.0rc1"), lockfile.parse_version("1.0c1"))
+		self.assertEqual(lockfile.parse_version("1.0.post1"), lockfile.parse_version("1.0-1"))
+		self.assertEqual(lockfile.parse_version("v1.0"), lockfile.parse_version("1.0+local.7"))
+
+	def test_invalid_versions(self):
+
+		self.assertIsNone(lockfile.parse_version("not a version"))
+		self.assertIsNone(lockfile.parse_version("1.0-beta-gamma"))
+
+
+
+class SpecifierTest(unittest.TestCase):
+
+	def assertMatches(self, specifier, matching, not_matching):
+
+		matches = lockfile.compile_specifier(specifier)
+		for version in matching:
+			self.assertTrue(matches(version), "%s should match %s" % (version, specifier))
+		for version in not_matching:
+			self.assertFalse(matches(version), "%s should not match %s" % (version, specifier))
+
+	def test_empty_specifier_matches_anything(self):
+
+		self.assertMatches("", ["1.0", "0.0.1a1", "anything"], [])
+
+	def test_inclusive_comparisons(self):
+
+		self.assertMatches(">=1.7,<=2.0", ["1.7", "1.7.post1", "2.0", "2.0a1"], ["1.6.9", "2.0.1"])
+
+	def test_less_than_excludes_its_own_prereleases(self):
+
+		self.assertMatches("<2.0", ["1.9", "1.9a1", "1.9.post3"], ["2.0", "2.0a1", "2.0.dev1", "2.0rc1"])
+		self.assertMatches("<2.0rc1", ["2.0a1", "2.0b1"], ["2.0rc1"])
+		self.assertMatches("<2.0.post2", ["2.0", "2.0a1", "2.0.post1", "2.0.post1.dev1"], ["2.0.post2.dev1"])
+
+	def test_greater_than_excludes_its_own_postreleases(self):
+
+		self.assertMatches(">1.7", ["1.7.1", "1.8a1", "2.0"], ["1.7", "1.7.post1", "1.7+local"])
+		self.assertMatches(">1.7.post1", ["1.7.post2", "1.8"], ["1.7.post1"])
+		self.assertMatches(">1.7a1", ["1.7a2", "1.7", "1.7.post1"], ["1.7a1", "1.7.dev1"])
+
+	def test_equality_and_prefixes(self):
+
+		self.assertMatches("==1.4", ["1.4", "1.4.0"], ["1.4.1", "1.4a1"])
+		self.assertMatches("==1.4.*", ["1.4", "1.4.9", "1.4a1"], ["1.5", "1.3.9"])
+		self.assertMatches("!=1.5.*", ["1.4", "1.6"], ["1.5", "1.5.2"])
+		self.assertMatches("===1.0+abc", ["1.0+abc"], ["1.0"])
+
+	def test_local_versions(self):
+
+		self.assertMatches("==1.0", ["1.0+local", "1.0+abc.7"], ["1.1+local"])
+		self.assertMatches("==1.0+local", ["1.0+local", "1.0.0+LOCAL"], ["1.0", "1.0+other", "1.0+local.1", "1.1+local"])
+		self.assertMatches("==1.0+ubuntu-1", ["1.0+ubuntu.1", "1.0+ubuntu_01"], ["1.0+ubuntu.2"])
+		self.assertMatches("!=1.0+local", ["1.0", "1.0+other", "1.1"], ["1.0+local"])
+		self.assertRaises(ValueError, lockfile.compile_specifier, ">=1.0+local")
+
+	def test_compatible_release(self):
+
+		self.assertMatches("~=2.2", ["2.2", "2.9", "2.2.post1"], ["3.0", "2.1", "2.2a1"])
+		self.assertMatches("~=1.4.5", ["1.4.5", "1.4.9"], ["1.5", "1.4.4"])
+		self.assertMatches("~=1.0.post1.dev1", ["1.0.post1", "1.5"], ["2.0", "1.0"])
+
+	def test_invalid_versions_never_match(self):
+
+		self.assertMatches(">=1.0", [], ["garbage"])
+
+	def test_invalid_specifiers_raise(self):
+
+		for specifier in [">>1.0", "==", "~=abc", "==x.*"]:
+			self.assertRaises(ValueError, lockfile.compile_specifier, specifier)
+
+
+
+class RequirementsTest(unittest.TestCase):
+
+	def test_parse_requirement_line(self):
+
+		requirement = lockfile.parse_requirement("Zope.Interface[extra] >= 4.2, <5 ; python_version > '3' --hash=sha256:abc")
+		self.assertEqual(requirement.name, "Zope.Interface")
+		self.assertEqual(requirement.key, "zope-interface")
+		self.assertEqual(requirement.specifier, ">=4.2,<5")
+		self.assertTrue(requirement.matches("4.9"))
+		self.assertFalse(requirement.matches("5.0"))
+
+	def test_comments_and_options_are_skipped(self):
+
+		for line in ["", "   ", "# comment", "--index-url http://x/simple/", "-r other.txt"]:
+			self.assertIsNone(lockfile.parse_requirement(line))
+		self.assertEqual(lockfile.parse_requirement("six  # needed by ncclient").key, "six")
+
+	def test_repeated_packages_are_merged(self):
+
+		requirements = lockfile.parse_requirements(["lxml>=4", "six", "LXML<5 --hash=sha256:aa", "lxml --hash=sha256:aa --hash=sha256:bb"])
+		self.assertEqual([requirement.key for requirement in requirements], ["lxml", "six"])
+		self.assertEqual(requirements[0].specifier, ">=4,<5")
+		self.assertEqual(requirements[0].hashes, ["sha256:aa", "sha256:bb"])
+		self.assertFalse(requirements[0].matches("5.1"))
+
+	def test_read_lockfile_with_continuations(self):
+
+		descriptor, path = tempfile.mkstemp(suffix=".txt")
+		with os.fdopen(descriptor, "w") as lock_file:
+			lock_file.write("# Generated\n%sabc123\nsix==1.16.0 \\\n    --hash=sha256:11 \\\n    --hash=sha256:22\nidna==3.4\n" % lockfile.TAG_HEADER)
+		try:
+			requirements = lockfile.read_requirements(path)
+			self.assertEqual(lockfile.read_lock_tag(path), "abc123")
+		finally:
+			os.remove(path)
+
+		self.assertEqual([(requirement.key, requirement.specifier, requirement.hashes) for requirement in requirements],
+							[("six", "==1.16.0", ["sha256:11", "sha256:22"]), ("idna", "==3.4", [])])
+		self.assertEqual(lockfile.requirement_line(requirements[0], True), "six==1.16.0 --hash=sha256:11 --hash=sha256:22")
+
+	def test_unsatisfied_and_stale(self):
+
+		requirements = lockfile.parse_requirements(["six>=1.10", "idna", "lxml<4"])
+		installed = {"six": "1.16.0", "lxml": "4.9.1"}
+		self.assertEqual([(requirement.key, version) for requirement, version in lockfile.unsatisfied(requirements, installed)],
+							[("idna", None), ("lxml", "4.9.1")])
+
+		locked = lockfile.parse_requirements(["six==1.9", "idna==3.4", "lxml==3.8"])
+		self.assertEqual([requirement.key for requirement in lockfile.stale_requirements(requirements, locked)], ["six"])
+
+
+
+if __name__ == "__main__":
+	unittest.main()
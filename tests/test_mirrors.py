@@ -0,0 +1,157 @@
+#####################################################################
+#																	#
+#	Module: 		test_mirrors.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for ranking package indexes and git 		#
+#					remotes											#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+import mirrors
+
+
+
+# Package index answering only the page of pip
+class IndexHandler(BaseHTTPRequestHandler):
+
+	def do_GET(self):
+
+		status = 200 if self.path == "/simple/pip/" else 404
+		body = b"<a href='pip-9.0.1.tar.gz'>pip-9.0.1.tar.gz</a>" * 100
+		self.send_response(status)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+
+		pass
+
+
+
+def closed_port():
+
+	closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	closed.bind(("127.0.0.1", 0))
+	port = closed.getsockname()[1]
+	closed.close()
+	return port
+
+
+
+class MirrorsTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.local_index = os.path.join(self.work_dir, "wheelhouse")
+		os.makedirs(self.local_index)
+		self.cache_file = os.path.join(self.work_dir, "state", "mirrors.json")
+
+		self.server = HTTPServer(("127.0.0.1", 0), IndexHandler)
+		self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+		self.thread.daemon = True
+		self.thread.start()
+		self.index_url = "http://127.0.0.1:%d/simple/" % self.server.server_address[1]
+		self.closed_url = "http://127.0.0.1:%d/simple/" % closed_port()
+
+	def tearDown(self):
+
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.work_dir)
+
+
+
+class ProbeTest(MirrorsTestCase):
+
+	def test_http_index(self):
+
+		result = mirrors.probe("pypi", self.index_url, timeout=5)
+		self.assertTrue(result["reachable"], result["error"])
+		self.assertGreater(result["latency_ms"], 0)
+
+	def test_missing_page(self):
+
+		result = mirrors.probe("pypi", self.index_url + "other/", timeout=5)
+		self.assertFalse(result["reachable"])
+		self.assertIn("404", result["error"])
+
+	def test_local_folders(self):
+
+		self.assertTrue(mirrors.probe("pypi", self.local_index)["reachable"])
+		self.assertTrue(mirrors.probe("pypi", "file://" + self.local_index)["reachable"])
+		self.assertFalse(mirrors.probe("pypi", os.path.join(self.work_dir, "missing"))["reachable"])
+
+	def test_local_git_repositories(self):
+
+		bare = os.path.join(self.work_dir, "mirror.git")
+		os.makedirs(bare)
+		with open(os.path.join(bare, "HEAD"), "w") as head_file:
+			head_file.write("ref: refs/heads/master\n")
+		clone = os.path.join(self.work_dir, "clone")
+		os.makedirs(os.path.join(clone, ".git"))
+
+		self.assertEqual(mirrors.probe("git", bare)["latency_ms"], 0.0)
+		self.assertTrue(mirrors.probe("git", "file://" + clone)["reachable"])
+		self.assertFalse(mirrors.probe("git", self.local_index)["reachable"])
+
+	def test_closed_git_port(self):
+
+		result = mirrors.probe("git", "git://127.0.0.1:%d/dnav3-code.git" % closed_port(), timeout=5)
+		self.assertFalse(result["reachable"])
+		self.assertTrue(result["error"])
+
+
+
+class ScoreTest(unittest.TestCase):
+
+	def test_throughput_counts(self):
+
+		near_but_slow = {"reachable": True, "latency_ms": 5.0, "mbit_per_s": 1.0}
+		far_but_fast = {"reachable": True, "latency_ms": 50.0, "mbit_per_s": 1000.0}
+		self.assertLess(mirrors.score(far_but_fast), mirrors.score(near_but_slow))
+		self.assertEqual(mirrors.score({"reachable": True, "latency_ms": 20.0, "mbit_per_s": None}), 0.02)
+		self.assertEqual(mirrors.score({"reachable": False, "latency_ms": None, "mbit_per_s": None}), float("inf"))
+
+
+
+class RankTest(MirrorsTestCase):
+
+	def test_fastest_first_and_unreachable_last(self):
+
+		ranking = mirrors.rank("pypi", [self.closed_url, self.index_url, self.local_index], timeout=5)
+		self.assertEqual([result["url"] for result in ranking], [self.local_index, self.index_url, self.closed_url])
+		self.assertEqual([result["reachable"] for result in ranking], [True, True, False])
+
+	def test_cached_ranking_is_reused(self):
+
+		candidates = [self.index_url, self.local_index]
+		first = mirrors.rank("pypi", candidates, self.cache_file, timeout=5)
+		shutil.rmtree(self.local_index)
+
+		self.assertEqual(mirrors.rank("pypi", list(reversed(candidates)), self.cache_file, timeout=5), first)
+		self.assertEqual(mirrors.rank("pypi", candidates, self.cache_file, ttl=0, timeout=5)[0]["url"], self.index_url)
+
+	def test_forget(self):
+
+		candidates = [self.index_url, self.local_index]
+		mirrors.rank("pypi", candidates, self.cache_file, timeout=5)
+		mirrors.rank("git", [self.local_index], self.cache_file, timeout=5)
+		shutil.rmtree(self.local_index)
+
+		mirrors.forget("pypi", self.cache_file)
+		self.assertEqual(mirrors.rank("pypi", candidates, self.cache_file, timeout=5)[0]["url"], self.index_url)
+		self.assertEqual(sorted(mirrors._load_cache(self.cache_file)), ["git", "pypi"])
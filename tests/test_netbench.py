@@ -0,0 +1,170 @@
+#####################################################################
+#																	#
+#	Module: 		test_netbench.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the network benchmark					#
+#																	#
+#####################################################################
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+try:
+	import netbench
+except (ImportError, SyntaxError):
+	netbench = None
+
+
+
+@unittest.skipIf(netbench is None, "the benchmark needs Python 3")
+class PercentilesTest(unittest.TestCase):
+
+	def test_nearest_rank(self):
+
+		result = netbench.percentiles(list(range(100, 0, -1)))
+		self.assertEqual(result, {"count": 100, "min": 1, "max": 100, "p50": 50, "p95": 95, "p99": 99})
+
+	def test_small_samples(self):
+
+		self.assertEqual(netbench.percentiles([5.0, 1.0, 3.0]), {"count": 3, "min": 1.0, "max": 5.0, "p50": 3.0, "p95": 5.0, "p99": 5.0})
+		self.assertEqual(netbench.percentiles([2.12345]), {"count": 1, "min": 2.123, "max": 2.123, "p50": 2.123, "p95": 2.123, "p99": 2.123})
+
+	def test_no_samples(self):
+
+		self.assertEqual(netbench.percentiles([]), {"count": 0, "min": None, "max": None, "p50": None, "p95": None, "p99": None})
+
+
+
+@unittest.skipIf(netbench is None, "the benchmark needs Python 3")
+class MeasureEndpointTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.server, self.url = netbench.start_stand_in(1024)
+		self.port = self.server.server_address[1]
+
+	def tearDown(self):
+
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_http_endpoint(self):
+
+		result = netbench.measure_endpoint("127.0.0.1", self.port, samples=3, timeout=5)
+
+		self.assertEqual(result["errors"], [])
+		self.assertFalse(result["tls"])
+		self.assertTrue(result["http"])
+		self.assertEqual(result["dns_ms"]["count"], 3)
+		self.assertEqual(result["connect_ms"]["count"], 3)
+		self.assertEqual(result["tls_ms"]["count"], 0)
+		self.assertEqual(result["ttfb_ms"]["count"], 3)
+
+	def test_non_http_endpoint_skips_first_byte(self):
+
+		listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		listener.bind(("127.0.0.1", 0))
+		listener.listen(5)
+		try:
+			result = netbench.measure_endpoint("127.0.0.1", listener.getsockname()[1], samples=2, timeout=5, http=False)
+		finally:
+			listener.close()
+
+		self.assertEqual(result["errors"], [])
+		self.assertFalse(result["http"])
+		self.assertEqual(result["connect_ms"]["count"], 2)
+		self.assertEqual(result["ttfb_ms"]["count"], 0)
+
+	def test_git_ports_default_to_no_http(self):
+
+		self.assertIn(9418, netbench.non_http_ports)
+		self.assertIn(22, netbench.non_http_ports)
+
+	def test_closed_port_is_an_error(self):
+
+		closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		closed.bind(("127.0.0.1", 0))
+		port = closed.getsockname()[1]
+		closed.close()
+
+		result = netbench.measure_endpoint("127.0.0.1", port, samples=2, timeout=5)
+		self.assertEqual(len(result["errors"]), 2)
+		self.assertEqual(result["connect_ms"]["count"], 0)
+
+
+
+# Answers every connection with the same raw bytes and hangs up
+def serve_canned(reply):
+
+	listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	listener.bind(("127.0.0.1", 0))
+	listener.listen(5)
+
+	def answer():
+		while True:
+			try:
+				connection = listener.accept()[0]
+			except (OSError, socket.error):
+				return
+			connection.recv(65536)
+			connection.sendall(reply)
+			connection.close()
+
+	thread = threading.Thread(target=answer)
+	thread.daemon = True
+	thread.start()
+	return listener, "http://127.0.0.1:%d/payload" % listener.getsockname()[1]
+
+
+
+@unittest.skipIf(netbench is None, "the benchmark needs Python 3")
+class MeasureThroughputTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.size = 3 * netbench.READ_CHUNK + 17
+		self.server, self.url = netbench.start_stand_in(self.size)
+		self.work_dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.work_dir)
+
+	def test_stand_in_download(self):
+
+		result = netbench.measure_throughput(self.url, samples=2, timeout=5)
+
+		self.assertEqual(result["errors"], [])
+		self.assertEqual(result["bytes"], self.size)
+		self.assertEqual(result["ttfb_ms"]["count"], 2)
+		self.assertGreater(result["mbit_per_s"]["min"], 0)
+
+	def test_broken_responses_are_failed_samples(self):
+
+		for reply in [b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n" + b"x" * 10, b"garbage\r\n\r\n", b""]:
+			listener, url = serve_canned(reply)
+			try:
+				result = netbench.measure_throughput(url, samples=2, timeout=5)
+			finally:
+				listener.close()
+			self.assertEqual(len(result["errors"]), 2, reply)
+			self.assertEqual(result["mbit_per_s"]["count"], 0)
+
+	def test_report_is_written(self):
+
+		report = netbench.run([("127.0.0.1", self.server.server_address[1])], self.url, samples=1, throughput_samples=1)
+		path = os.path.join(self.work_dir, "report.json")
+		netbench.write_report(report, path)
+
+		with open(path) as report_file:
+			written = json.load(report_file)
+		self.assertEqual(written["endpoints"][0]["port"], self.server.server_address[1])
+		self.assertEqual(written["throughput"]["bytes"], self.size)
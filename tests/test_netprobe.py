@@ -0,0 +1,202 @@
+#####################################################################
+#																	#
+#	Module: 		test_netprobe.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the concurrent endpoint probe and 	#
+#					its happy eyeballs connection race				#
+#																	#
+#####################################################################
+
+import socket
+import unittest
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+try:
+	import asyncio
+	import netprobe
+	import shell_async
+except (ImportError, SyntaxError):
+	netprobe = None
+
+IPV4 = socket.AF_INET
+IPV6 = getattr(socket, "AF_INET6", 10)
+
+
+
+def addr_info(family, address):
+
+	return (family, socket.SOCK_STREAM, 6, "", (address, 443))
+
+
+
+class FakeSocket(object):
+
+	def __init__(self, address):
+
+		self.address = address
+		self.closed = False
+
+	def close(self):
+
+		self.closed = True
+
+
+
+# Stands in for netprobe._connect, each address connects or fails after a set delay
+class FakeConnector(object):
+
+	def __init__(self, outcomes):
+
+		self.outcomes = outcomes
+		self.started = []
+		self.sockets = []
+
+	def __call__(self, loop, info):
+
+		loop = asyncio.get_event_loop()
+		address = info[4][0]
+		delay, error = self.outcomes[address]
+		self.started.append((address, loop.time()))
+		future = loop.create_future()
+		if error is None:
+			sock = FakeSocket(address)
+			self.sockets.append(sock)
+			loop.call_later(delay, lambda: future.done() or future.set_result(sock))
+		else:
+			loop.call_later(delay, lambda: future.done() or future.set_exception(error))
+		return future
+
+	def race(self, infos):
+
+		with mock.patch.object(netprobe, "_connect", self):
+			return shell_async.run_coroutine(netprobe._race_connections(None, infos))
+
+
+
+@unittest.skipIf(netprobe is None, "asyncio needs Python 3.5+")
+class InterleaveFamiliesTest(unittest.TestCase):
+
+	def test_families_alternate(self):
+
+		infos = [addr_info(IPV6, "::1"), addr_info(IPV6, "::2"), addr_info(IPV6, "::3"),
+					addr_info(IPV4, "10.0.0.1"), addr_info(IPV4, "10.0.0.2")]
+		ordered = [info[4][0] for info in netprobe.interleave_families(infos)]
+		self.assertEqual(ordered, ["::1", "10.0.0.1", "::2", "10.0.0.2", "::3"])
+
+	def test_first_listed_family_leads(self):
+
+		infos = [addr_info(IPV4, "10.0.0.1"), addr_info(IPV6, "::1")]
+		self.assertEqual([info[4][0] for info in netprobe.interleave_families(infos)], ["10.0.0.1", "::1"])
+		self.assertEqual(netprobe.interleave_families([]), [])
+
+
+
+@unittest.skipIf(netprobe is None, "asyncio needs Python 3.5+")
+class RaceConnectionsTest(unittest.TestCase):
+
+	def test_later_attempt_wins_when_first_stalls(self):
+
+		connector = FakeConnector({"::1": (5.0, None), "10.0.0.1": (0.05, None)})
+		sock, address = connector.race([addr_info(IPV6, "::1"), addr_info(IPV4, "10.0.0.1")])
+
+		self.assertEqual(address[0], "10.0.0.1")
+		self.assertIs(sock, connector.sockets[1])
+		stagger = connector.started[1][1] - connector.started[0][1]
+		self.assertGreaterEqual(stagger, netprobe.CONNECTION_ATTEMPT_DELAY * 0.9)
+		self.assertLess(stagger, netprobe.CONNECTION_ATTEMPT_DELAY * 2)
+
+	def test_failed_attempt_starts_the_next_at_once(self):
+
+		connector = FakeConnector({"::1": (0.01, OSError("unreachable")), "10.0.0.1": (0.01, None)})
+		sock, address = connector.race([addr_info(IPV6, "::1"), addr_info(IPV4, "10.0.0.1")])
+
+		self.assertEqual(address[0], "10.0.0.1")
+		self.assertLess(connector.started[1][1] - connector.started[0][1], netprobe.CONNECTION_ATTEMPT_DELAY)
+
+	def test_first_connection_is_kept(self):
+
+		connector = FakeConnector({"::1": (0.01, None), "10.0.0.1": (0.01, None)})
+		sock, address = connector.race([addr_info(IPV6, "::1"), addr_info(IPV4, "10.0.0.1")])
+
+		self.assertEqual(address[0], "::1")
+		self.assertEqual([started[0] for started in connector.started], ["::1"])
+		self.assertFalse(sock.closed)
+
+	def test_last_error_is_raised(self):
+
+		connector = FakeConnector({"::1": (0.01, OSError("first")), "10.0.0.1": (0.01, OSError("second"))})
+		with self.assertRaises(OSError) as raised:
+			connector.race([addr_info(IPV6, "::1"), addr_info(IPV4, "10.0.0.1")])
+		self.assertEqual(str(raised.exception), "second")
+
+	def test_no_addresses(self):
+
+		self.assertRaises(OSError, FakeConnector({}).race, [])
+
+
+
+@unittest.skipIf(netprobe is None, "asyncio needs Python 3.5+")
+class DnsCacheTest(unittest.TestCase):
+
+	def setUp(self):
+
+		netprobe.dns_cache.clear()
+
+	def tearDown(self):
+
+		netprobe.dns_cache.clear()
+
+	def test_repeated_lookups_are_cached(self):
+
+		lookups = []
+
+		def fake_getaddrinfo(*args):
+			lookups.append(args)
+			return [addr_info(IPV4, "10.0.0.1")]
+
+		with mock.patch.object(netprobe, "system_getaddrinfo", fake_getaddrinfo):
+			first = netprobe.cached_getaddrinfo("api.ciscospark.com", 443)
+			first.append("changed by the caller")
+			second = netprobe.cached_getaddrinfo("api.ciscospark.com", 443)
+			netprobe.cached_getaddrinfo("api.ciscospark.com", 443, IPV4)
+
+		self.assertEqual(second, [addr_info(IPV4, "10.0.0.1")])
+		self.assertEqual(len(lookups), 2)
+
+
+
+@unittest.skipIf(netprobe is None, "asyncio needs Python 3.5+")
+class ProbeTest(unittest.TestCase):
+
+	def setUp(self):
+
+		netprobe.dns_cache.clear()
+		self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.listener.bind(("127.0.0.1", 0))
+		self.listener.listen(5)
+
+	def tearDown(self):
+
+		self.listener.close()
+		netprobe.dns_cache.clear()
+
+	def test_open_and_closed_ports(self):
+
+		closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		closed.bind(("127.0.0.1", 0))
+		closed_port = closed.getsockname()[1]
+		closed.close()
+
+		open_port = self.listener.getsockname()[1]
+		results = netprobe.probe([("127.0.0.1", open_port), ("127.0.0.1", closed_port)], timeout=5)
+
+		self.assertEqual([result.port for result in results], [open_port, closed_port])
+		self.assertEqual(results[0].address, "127.0.0.1")
+		self.assertIsNone(results[0].error)
+		self.assertGreaterEqual(results[0].connect_seconds, 0)
+		self.assertIsNone(results[1].address)
+		self.assertTrue(results[1].error)
@@ -0,0 +1,172 @@
+#####################################################################
+#																	#
+#	Module: 		test_onboard.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for roster onboarding and resuming		#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+	import onboard
+except ImportError:
+	onboard = None
+
+
+
+class FakeResponse(object):
+
+	def __init__(self, status_code, body=None):
+
+		self.status_code = status_code
+		self.body = body or {}
+
+	def json(self):
+
+		return self.body
+
+
+
+# Stands in for spark.SparkClient, answering from a table of known people and room members
+class FakeClient(object):
+
+	def __init__(self, people, members=(), broken=()):
+
+		self.people = people
+		self.members = set(members)
+		self.broken = set(broken)
+		self.looked_up = []
+		self.lock = threading.Lock()
+
+	def get(self, path, params):
+
+		email = params["email"]
+		with self.lock:
+			self.looked_up.append(email)
+		if email in self.broken:
+			return FakeResponse(500)
+		if email not in self.people:
+			return FakeResponse(200, {"items": []})
+		return FakeResponse(200, {"items": [{"id": self.people[email]}]})
+
+	def post(self, path, data):
+
+		if data["personId"] in self.members:
+			return FakeResponse(409)
+		return FakeResponse(200, {"id": "membership-" + data["personId"]})
+
+
+
+class OnboardTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.results_path = os.path.join(self.work_dir, "roster.results.csv")
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+	def write(self, name, text):
+
+		path = os.path.join(self.work_dir, name)
+		with open(path, "wb") as roster_file:
+			roster_file.write(text.encode("utf-8"))
+		return path
+
+
+
+@unittest.skipIf(onboard is None, "requests is not installed")
+class ReadRosterTest(OnboardTestCase):
+
+	def test_csv_with_header(self):
+
+		path = self.write("roster.csv", "name,email,company\r\nAda,Ada@Example.com,Cisco\r\nBob,bob@example.com,\r\n")
+		self.assertEqual(onboard.read_roster(path), ["ada@example.com", "bob@example.com"])
+
+	def test_plain_list_drops_duplicates(self):
+
+		path = self.write("roster.txt", "bob@example.com\n\nada@example.com\n BOB@example.com \n")
+		self.assertEqual(onboard.read_roster(path), ["bob@example.com", "ada@example.com"])
+
+	def test_first_email_of_a_row_is_taken(self):
+
+		path = self.write("roster.csv", "ada@example.com,manager@example.com\n")
+		self.assertEqual(onboard.read_roster(path), ["ada@example.com"])
+
+
+
+@unittest.skipIf(onboard is None, "requests is not installed")
+class ReadResultsTest(OnboardTestCase):
+
+	def test_missing_file(self):
+
+		self.assertEqual(onboard.read_results(self.results_path), {})
+
+	def test_last_row_wins(self):
+
+		self.write("roster.results.csv", "email,status,person_id,membership_id,error\r\n"
+			"ada@example.com,failed,,,timed out\r\nbob@example.com,member,p2,,\r\nada@example.com,added,p1,m1,\r\n")
+		self.assertEqual(onboard.read_results(self.results_path), {"ada@example.com": "added", "bob@example.com": "member"})
+
+
+
+@unittest.skipIf(onboard is None, "requests is not installed")
+class OnboardTest(OnboardTestCase):
+
+	def setUp(self):
+
+		OnboardTestCase.setUp(self)
+		self.client = FakeClient({"ada@example.com": "p1", "bob@example.com": "p2", "eve@example.com": "p3"},
+									members=["p2"], broken=["eve@example.com"])
+		self.emails = ["ada@example.com", "bob@example.com", "cat@example.com", "eve@example.com"]
+
+	def test_statuses(self):
+
+		rows = []
+		counts = onboard.onboard(self.client, "room", self.emails, self.results_path, workers=2, on_result=rows.append)
+
+		self.assertEqual(counts, {"skipped": 0, onboard.ADDED: 1, onboard.MEMBER: 1, onboard.NOT_FOUND: 1, onboard.FAILED: 1})
+		by_email = dict((row["email"], row) for row in rows)
+		self.assertEqual(by_email["ada@example.com"]["membership_id"], "membership-p1")
+		self.assertEqual(by_email["eve@example.com"]["error"], "people lookup returned 500")
+		self.assertEqual(onboard.read_results(self.results_path), {"ada@example.com": onboard.ADDED,
+			"bob@example.com": onboard.MEMBER, "cat@example.com": onboard.NOT_FOUND, "eve@example.com": onboard.FAILED})
+
+	def test_resume_retries_only_failures(self):
+
+		onboard.onboard(self.client, "room", self.emails, self.results_path)
+		self.client.looked_up = []
+		self.client.broken = set()
+		counts = onboard.onboard(self.client, "room", self.emails, self.results_path)
+
+		self.assertEqual(self.client.looked_up, ["eve@example.com"])
+		self.assertEqual(counts, {"skipped": 3, onboard.ADDED: 1})
+		self.assertEqual(onboard.read_results(self.results_path)["eve@example.com"], onboard.ADDED)
+
+		with open(self.results_path, "rb") as results_file:
+			self.assertEqual(results_file.read().count(b"email,status"), 1)
+
+	def test_partial_row_is_ended(self):
+
+		self.write("roster.results.csv", "email,status,person_id,membership_id,error\r\nada@example.com,add")
+		counts = onboard.onboard(self.client, "room", ["ada@example.com"], self.results_path)
+
+		self.assertEqual(counts, {"skipped": 0, onboard.ADDED: 1})
+		self.assertEqual(onboard.read_results(self.results_path), {"ada@example.com": onboard.ADDED})
+
+	def test_request_errors_fail_the_email(self):
+
+		def broken_get(path, params):
+			raise ValueError("bad response")
+
+		self.client.get = broken_get
+		counts = onboard.onboard(self.client, "room", ["ada@example.com"], self.results_path)
+		self.assertEqual(counts, {"skipped": 0, onboard.FAILED: 1})
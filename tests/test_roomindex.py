@@ -0,0 +1,101 @@
+#####################################################################
+#																	#
+#	Module: 		test_roomindex.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the Spark room title index			#
+#																	#
+#####################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import fsprobe
+import roomindex
+
+TITLE = "Devnet Express v2 Preparation Script"
+
+
+
+class RoomIndexTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.index_file = os.path.join(self.work_dir, "state", "rooms.json")
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+	def age_entry(self, spark_token, title, seconds):
+
+		with open(self.index_file) as index_in:
+			index = json.load(index_in)
+		index[roomindex.token_identity(spark_token)][title]["checked_at"] -= seconds
+		with open(self.index_file, "w") as index_out:
+			json.dump(index, index_out)
+
+	def test_token_is_not_stored(self):
+
+		roomindex.remember(self.index_file, "secret-token", TITLE, "room-1")
+		with open(self.index_file) as index_in:
+			self.assertNotIn("secret-token", index_in.read())
+		self.assertEqual(roomindex.token_identity("secret-token"), roomindex.token_identity("secret-token"))
+		self.assertNotEqual(roomindex.token_identity("secret-token"), roomindex.token_identity("other-token"))
+
+	def test_lookup(self):
+
+		self.assertIsNone(roomindex.lookup(self.index_file, "token", TITLE))
+		roomindex.remember(self.index_file, "token", TITLE, "room-1")
+		self.assertEqual(roomindex.lookup(self.index_file, "token", TITLE), "room-1")
+		self.assertIsNone(roomindex.lookup(self.index_file, "token", "Other room"))
+
+	def test_expired_entry_is_refreshed(self):
+
+		roomindex.remember(self.index_file, "token", TITLE, "room-1")
+		self.age_entry("token", TITLE, 7200)
+		self.assertIsNone(roomindex.lookup(self.index_file, "token", TITLE, ttl=3600))
+		self.assertEqual(roomindex.lookup(self.index_file, "token", TITLE, ttl=86400), "room-1")
+
+		before = time.time()
+		roomindex.remember(self.index_file, "token", TITLE, "room-2")
+		self.assertEqual(roomindex.lookup(self.index_file, "token", TITLE, ttl=3600), "room-2")
+		with open(self.index_file) as index_in:
+			entry = json.load(index_in)[roomindex.token_identity("token")][TITLE]
+		self.assertGreaterEqual(entry["checked_at"], before)
+
+	def test_tokens_are_kept_apart(self):
+
+		roomindex.remember(self.index_file, "token-a", TITLE, "room-a")
+		roomindex.remember(self.index_file, "token-b", TITLE, "room-b")
+		self.assertEqual(roomindex.lookup(self.index_file, "token-a", TITLE), "room-a")
+		self.assertEqual(roomindex.lookup(self.index_file, "token-b", TITLE), "room-b")
+
+	def test_forget(self):
+
+		roomindex.remember(self.index_file, "token", TITLE, "room-1")
+		roomindex.remember(self.index_file, "token", "Other room", "room-2")
+		roomindex.forget(self.index_file, "token", TITLE)
+		roomindex.forget(self.index_file, "other-token", TITLE)
+
+		self.assertIsNone(roomindex.lookup(self.index_file, "token", TITLE))
+		self.assertEqual(roomindex.lookup(self.index_file, "token", "Other room"), "room-2")
+
+	def test_default_index_file(self):
+
+		self.assertEqual(roomindex.default_index_file(), fsprobe.state_dir("rooms.json"))
+
+	def test_corrupt_file(self):
+
+		os.makedirs(os.path.dirname(self.index_file))
+		with open(self.index_file, "w") as index_out:
+			index_out.write("{not json")
+
+		self.assertIsNone(roomindex.lookup(self.index_file, "token", TITLE))
+		roomindex.remember(self.index_file, "token", TITLE, "room-1")
+		self.assertEqual(roomindex.lookup(self.index_file, "token", TITLE), "room-1")
@@ -0,0 +1,126 @@
+#####################################################################
+#																	#
+#	Module: 		test_scheduler.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the dependency-ordered check runner	#
+#																	#
+#####################################################################
+
+import sys
+import threading
+import unittest
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+import scheduler
+from scheduler import Check
+
+
+
+class RunChecksTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.stdout = sys.stdout
+		sys.stdout = self.captured = StringIO()
+
+	def tearDown(self):
+
+		sys.stdout = self.stdout
+
+	def test_results_follow_check_order(self):
+
+		checks = [Check("a", lambda: 1, []), Check("b", lambda: 0, []), Check("c", lambda: "yes", ["a"])]
+		results = scheduler.run_checks(checks)
+
+		self.assertEqual([result.name for result in results], ["a", "b", "c"])
+		self.assertEqual([result.status for result in results], [scheduler.PASSED, scheduler.FAILED, scheduler.PASSED])
+		self.assertEqual(results[2].value, "yes")
+
+	def test_output_reads_like_a_serial_run(self):
+
+		second_printed = threading.Event()
+
+		def first():
+			second_printed.wait(5)
+			print("first check")
+			return True
+
+		def second():
+			print("second check")
+			second_printed.set()
+			return True
+
+		scheduler.run_checks([Check("first", first, []), Check("second", second, [])], workers=2)
+		self.assertEqual(self.captured.getvalue(), "first check\nsecond check\n")
+
+	def test_checks_wait_for_requirements(self):
+
+		finished = []
+
+		def check(name):
+			def run():
+				finished.append(name)
+				return True
+			return run
+
+		checks = [Check("install", check("install"), ["venv"]), Check("venv", check("venv"), ["python"]),
+					Check("python", check("python"), [])]
+		scheduler.run_checks(checks, workers=3)
+		self.assertEqual(finished, ["python", "venv", "install"])
+
+	def test_failure_cancels_dependents(self):
+
+		ran = []
+		checks = [Check("python", lambda: False, []), Check("venv", lambda: ran.append("venv") or True, ["python"]),
+					Check("install", lambda: ran.append("install") or True, ["venv"]), Check("git", lambda: True, [])]
+		results = scheduler.run_checks(checks)
+
+		self.assertEqual(ran, [])
+		self.assertEqual([result.status for result in results],
+			[scheduler.FAILED, scheduler.CANCELLED, scheduler.CANCELLED, scheduler.PASSED])
+		self.assertIn("Skipped venv check, python did not pass", self.captured.getvalue())
+		self.assertIn("Skipped install check, python did not pass", self.captured.getvalue())
+
+	def test_exception_fails_the_check(self):
+
+		def broken():
+			raise RuntimeError("no route")
+
+		results = scheduler.run_checks([Check("network", broken, []), Check("spark", lambda: True, ["network"])])
+		self.assertEqual([result.status for result in results], [scheduler.FAILED, scheduler.CANCELLED])
+		self.assertIn("network raised RuntimeError: no route", self.captured.getvalue())
+
+	def test_stdout_is_restored(self):
+
+		scheduler.run_checks([Check("a", lambda: True, [])])
+		self.assertIs(sys.stdout, self.captured)
+
+	def test_invalid_graphs_are_rejected(self):
+
+		self.assertRaises(ValueError, scheduler.run_checks, [Check("a", bool, []), Check("a", bool, [])])
+		self.assertRaises(ValueError, scheduler.run_checks, [Check("a", bool, ["missing"])])
+		self.assertRaises(ValueError, scheduler.run_checks, [Check("a", bool, ["b"]), Check("b", bool, ["a"])])
+
+
+
+class CriticalPathTest(unittest.TestCase):
+
+	def test_longest_chain(self):
+
+		checks = [Check("python", None, []), Check("venv", None, ["python"]), Check("install", None, ["venv"]),
+					Check("git", None, []), Check("spark", None, [])]
+		results = [scheduler.CheckResult("python", scheduler.PASSED, True, 1.0),
+					scheduler.CheckResult("venv", scheduler.PASSED, True, 2.0),
+					scheduler.CheckResult("install", scheduler.PASSED, True, 3.0),
+					scheduler.CheckResult("git", scheduler.PASSED, True, 5.0),
+					scheduler.CheckResult("spark", scheduler.PASSED, True, 0.5)]
+
+		self.assertEqual(scheduler.critical_path(checks, results), (6.0, ["python", "venv", "install"]))
+
+	def test_no_checks(self):
+
+		self.assertEqual(scheduler.critical_path([], []), (0.0, []))
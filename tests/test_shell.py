@@ -0,0 +1,187 @@
+#####################################################################
+#																	#
+#	Module: 		test_shell.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for running and caching shell commands	#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+import shell
+
+# Command printing its second argument and appending a mark to the log file named by its first
+LOGGED_ECHO = '"%s" -c "import sys; open(sys.argv[1], \'a\').write(\'x\'); print(sys.argv[2])" "%%s" %%s' % sys.executable
+
+
+
+class CmdCacheTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		shell.invalidate_cmd_cache()
+
+	def tearDown(self):
+
+		shell.invalidate_cmd_cache()
+		shutil.rmtree(self.work_dir)
+
+	def cmd(self, name, word=None):
+
+		return LOGGED_ECHO % (os.path.join(self.work_dir, name), word or name)
+
+	def runs(self, name):
+
+		try:
+			with open(os.path.join(self.work_dir, name)) as log_file:
+				return len(log_file.read())
+		except IOError:
+			return 0
+
+	def test_repeated_command_is_cached(self):
+
+		before = shell.get_cmd_cache_stats()
+		first = shell.run_cmd_cached(self.cmd("a"), ["tag"])
+		first.append("changed by the caller")
+		second = shell.run_cmd_cached(self.cmd("a"), ["tag"])
+
+		self.assertEqual(second, ["a\n"])
+		self.assertEqual(self.runs("a"), 1)
+		after = shell.get_cmd_cache_stats()
+		self.assertEqual(after["hits"] - before["hits"], 1)
+		self.assertEqual(after["misses"] - before["misses"], 1)
+
+	def test_invalidate_by_tag(self):
+
+		shell.run_cmd_cached(self.cmd("a"), ["pip"])
+		shell.run_cmd_cached(self.cmd("b"), ["git"])
+
+		self.assertEqual(shell.invalidate_cmd_cache("pip"), 1)
+		self.assertEqual(shell.invalidate_cmd_cache("pip"), 0)
+		shell.run_cmd_cached(self.cmd("a"), ["pip"])
+		shell.run_cmd_cached(self.cmd("b"), ["git"])
+		self.assertEqual((self.runs("a"), self.runs("b")), (2, 1))
+
+	def test_invalidate_everything(self):
+
+		shell.run_cmd_cached(self.cmd("a"), ["pip"])
+		shell.run_cmd_cached(self.cmd("b"))
+
+		self.assertEqual(shell.invalidate_cmd_cache(), 2)
+		shell.run_cmd_cached(self.cmd("b"))
+		self.assertEqual(self.runs("b"), 2)
+
+	def test_environment_is_part_of_the_key(self):
+
+		saved = os.environ.get("PIP_INDEX_URL")
+		try:
+			os.environ["PIP_INDEX_URL"] = "http://one.example.com/simple/"
+			shell.run_cmd_cached(self.cmd("a"))
+			os.environ["PIP_INDEX_URL"] = "http://two.example.com/simple/"
+			shell.run_cmd_cached(self.cmd("a"))
+			shell.run_cmd_cached(self.cmd("a"))
+		finally:
+			if saved is None:
+				del os.environ["PIP_INDEX_URL"]
+			else:
+				os.environ["PIP_INDEX_URL"] = saved
+
+		self.assertEqual(self.runs("a"), 2)
+
+	def test_empty_output_is_not_cached(self):
+
+		silent = '"%s" -c "import sys; open(sys.argv[1], \'a\').write(\'x\')" "%s"' % (sys.executable, os.path.join(self.work_dir, "a"))
+		self.assertEqual(shell.run_cmd_cached(silent), [])
+		self.assertEqual(shell.run_cmds_cached([(silent, [])]), [[]])
+		self.assertEqual(self.runs("a"), 2)
+
+	def test_batch_runs_only_missing_commands(self):
+
+		shell.run_cmd_cached(self.cmd("b"))
+		results = shell.run_cmds_cached([(self.cmd("a"), []), (self.cmd("b"), []), (self.cmd("c"), ["tag"])])
+
+		self.assertEqual(results, [["a\n"], ["b\n"], ["c\n"]])
+		self.assertEqual((self.runs("a"), self.runs("b"), self.runs("c")), (1, 1, 1))
+		self.assertEqual(shell.invalidate_cmd_cache("tag"), 1)
+
+
+
+class StreamCmdTest(unittest.TestCase):
+
+	def python(self, code):
+
+		return '"%s" -c "%s"' % (sys.executable, code)
+
+	def test_lines_reach_the_callback(self):
+
+		lines = []
+		result = shell.stream_cmd(self.python("import sys; print('out'); sys.stdout.flush(); sys.stderr.write('err\\n')"),
+									lambda stream, line: lines.append((stream, line)))
+
+		self.assertEqual(sorted(lines), [("stderr", "err\n"), ("stdout", "out\n")])
+		self.assertEqual(result.returncode, 0)
+		self.assertFalse(result.timed_out)
+		self.assertFalse(result.cancelled)
+		self.assertEqual(result.output_bytes, 8)
+
+	def test_tail_is_bounded(self):
+
+		result = shell.stream_cmd(self.python("import sys; sys.stdout.write(''.join('%d\\n' % index for index in range(1000))); sys.exit(3)"), tail_lines=5)
+		self.assertEqual(result.tail, ["995\n", "996\n", "997\n", "998\n", "999\n"])
+		self.assertEqual(result.returncode, 3)
+
+	def test_long_line_is_read_in_chunks(self):
+
+		chunks = []
+		shell.stream_cmd(self.python("import sys; sys.stdout.write('x' * 200000)"), lambda stream, line: chunks.append(line))
+		self.assertEqual(sum(len(chunk) for chunk in chunks), 200000)
+		self.assertTrue(all(len(chunk) <= shell.READ_CHUNK for chunk in chunks))
+
+	def test_timeout_stops_the_command(self):
+
+		start = time.time()
+		result = shell.stream_cmd(self.python("import time; print('started'); time.sleep(30)"), timeout=0.5)
+		self.assertTrue(result.timed_out)
+		self.assertLess(time.time() - start, 10)
+
+	def test_cancel_stops_the_command(self):
+
+		cancel = threading.Event()
+		timer = threading.Timer(0.3, cancel.set)
+		timer.start()
+		start = time.time()
+		result = shell.stream_cmd(self.python("import time; time.sleep(30)"), cancel=cancel)
+		timer.join()
+		self.assertTrue(result.cancelled)
+		self.assertFalse(result.timed_out)
+		self.assertLess(time.time() - start, 10)
+
+	def test_run_cmd_drops_output_of_a_timed_out_command(self):
+
+		stdout = sys.stdout
+		sys.stdout = StringIO()
+		try:
+			result = shell.run_cmd(self.python("import sys, time; print('partial'); sys.stdout.flush(); time.sleep(30)"), timeout=0.5)
+			report = sys.stdout.getvalue()
+		finally:
+			sys.stdout = stdout
+
+		self.assertEqual(result, [])
+		self.assertIn("did not finish within 0.5 seconds", report)
+		self.assertIn("partial", report)
+
+	def test_decode_lines(self):
+
+		self.assertEqual(shell.decode_lines(b"a\r\nb\rc\nd"), ["a\n", "b\n", "c\n", "d"])
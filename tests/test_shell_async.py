@@ -0,0 +1,85 @@
+#####################################################################
+#																	#
+#	Module: 		test_shell_async.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the batch command engine				#
+#																	#
+#####################################################################
+
+import sys
+import time
+import threading
+import unittest
+
+import shell
+
+try:
+	import shell_async
+except (ImportError, SyntaxError):
+	shell_async = None
+
+# Command printing its argument after sleeping, run with this interpreter
+SLEEP_ECHO = '"%s" -c "import sys, time; time.sleep(float(sys.argv[1])); print(sys.argv[2])" %%s %%s' % sys.executable
+
+
+
+@unittest.skipIf(shell_async is None, "asyncio subprocesses need Python 3.5+")
+class RunCmdsTest(unittest.TestCase):
+
+	def test_results_keep_command_order(self):
+
+		results = shell_async.run_cmds([SLEEP_ECHO % (0.3, "slow"), SLEEP_ECHO % (0, "fast")], 2)
+		self.assertEqual([line.strip() for result in results for line in result], ["slow", "fast"])
+
+	def test_commands_run_concurrently_up_to_the_limit(self):
+
+		cmds = [SLEEP_ECHO % (0.5, index) for index in range(4)]
+		start = time.time()
+		shell_async.run_cmds(cmds, 4)
+		concurrent = time.time() - start
+
+		start = time.time()
+		shell_async.run_cmds(cmds, 2)
+		limited = time.time() - start
+
+		self.assertLess(concurrent, 1.5)
+		self.assertGreaterEqual(limited, 1.0)
+
+	def test_timed_out_command_returns_no_output(self):
+
+		start = time.time()
+		results = shell_async.run_cmds([SLEEP_ECHO % (30, "late"), SLEEP_ECHO % (0, "done")], 2, timeout=1)
+		self.assertEqual(results[0], [])
+		self.assertEqual(results[1], ["done\n"])
+		self.assertLess(time.time() - start, 10)
+
+	def test_subprocess_support_by_thread(self):
+
+		self.assertTrue(shell_async.subprocess_supported())
+		supported = []
+		thread = threading.Thread(target=lambda: supported.append(shell_async.subprocess_supported()))
+		thread.start()
+		thread.join()
+		self.assertEqual(supported, [sys.platform == "win32" or sys.version_info >= (3, 8)])
+
+
+
+class ShellRunCmdsTest(unittest.TestCase):
+
+	def test_batch_runs_from_a_worker_thread(self):
+
+		results = []
+		thread = threading.Thread(target=lambda: results.append(shell.run_cmds([SLEEP_ECHO % (0, "a"), SLEEP_ECHO % (0, "b")])))
+		thread.start()
+		thread.join()
+		self.assertEqual(results, [[["a\n"], ["b\n"]]])
+
+	def test_empty_batch(self):
+
+		self.assertEqual(shell.run_cmds([]), [])
+
+
+
+if __name__ == "__main__":
+	unittest.main()
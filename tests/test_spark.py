@@ -0,0 +1,336 @@
+#####################################################################
+#																	#
+#	Module: 		test_spark.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the pooled Spark API client and its 	#
+#					request scheduler								#
+#																	#
+#####################################################################
+
+import json
+import threading
+import time
+import unittest
+from email.utils import formatdate
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+	from urllib.parse import urlsplit, parse_qs
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+	from urlparse import urlsplit, parse_qs
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+try:
+	import requests
+	import spark
+except ImportError:
+	spark = None
+
+
+
+# Stand-in for the Spark API, keeping connections alive and recording every request
+class SparkHandler(BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+
+	def do_GET(self):
+
+		self.answer()
+
+	def do_POST(self):
+
+		self.answer()
+
+	def answer(self):
+
+		length = int(self.headers.get("Content-Length") or 0)
+		body = self.rfile.read(length).decode("utf-8")
+		self.server.requests.append({"command": self.command, "path": self.path, "port": self.client_address[1],
+									"authorization": self.headers.get("Authorization"),
+									"content_type": self.headers.get("Content-Type"), "body": body})
+
+		answer, link = {"id": "id-1", "text": "hello", "items": []}, None
+		parts = urlsplit(self.path)
+		if self.command == "GET" and parts.path == "/v1/rooms":
+			query = parse_qs(parts.query)
+			start, size = int(query.get("cursor", ["0"])[0]), int(query["max"][0])
+			answer["items"] = self.server.rooms[start:start + size]
+			if start + size < len(self.server.rooms):
+				link = '<http://%s:%d/v1/rooms?cursor=%d&max=%d>; rel="next"' % (self.server.server_address + (start + size, size))
+
+		data = json.dumps(answer).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		if link:
+			self.send_header("Link", link)
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, *args):
+
+		pass
+
+
+
+class SparkServer(ThreadingMixIn, HTTPServer):
+
+	daemon_threads = True
+
+
+
+@unittest.skipIf(spark is None, "requests is not installed")
+class SparkClientTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.server = SparkServer(("127.0.0.1", 0), SparkHandler)
+		self.server.requests = []
+		self.server.rooms = [{"id": "room-%d" % index, "title": "Lab %d" % index} for index in range(6)]
+		thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+		thread.daemon = True
+		thread.start()
+		self.client = spark.SparkClient("secret", base_uri="http://127.0.0.1:%d/v1" % self.server.server_address[1])
+
+	def tearDown(self):
+
+		self.client.close()
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_connection_is_reused(self):
+
+		self.client.get_user_info("learner@example.com")
+		self.assertEqual(self.client.get_message("message-1"), "hello")
+		self.assertEqual(self.client.post_message("Hi", "room-1").status_code, 200)
+		self.assertEqual(self.client.post_create_room("Lab"), "id-1")
+
+		requests_seen = self.server.requests
+		self.assertEqual([request["command"] for request in requests_seen], ["GET", "GET", "POST", "POST"])
+		self.assertEqual(len(set(request["port"] for request in requests_seen)), 1)
+
+	def test_headers_and_body(self):
+
+		self.client.get_user_info("learner@example.com")
+		self.client.post_membership("learner@example.com", "room-1")
+
+		get, post = self.server.requests
+		self.assertEqual(get["path"], "/v1/people?email=learner%40example.com")
+		self.assertEqual(post["path"], "/v1/memberships")
+		for request in [get, post]:
+			self.assertEqual(request["authorization"], "Bearer secret")
+			self.assertEqual(request["content_type"], "application/json")
+		self.assertEqual(json.loads(post["body"]), {"roomId": "room-1", "personEmail": "learner@example.com"})
+
+	def test_rooms_are_paged(self):
+
+		rooms = list(self.client.iter_rooms("group", page_size=4))
+		self.assertEqual([room["id"] for room in rooms], ["room-%d" % index for index in range(6)])
+		self.assertEqual([request["path"] for request in self.server.requests],
+							["/v1/rooms?max=4&type=group", "/v1/rooms?cursor=4&max=4"])
+
+	def test_room_lookup_stops_at_first_match(self):
+
+		self.assertEqual(self.client.get_room_id("Lab 3", page_size=2), "room-3")
+		self.assertEqual(len(self.server.requests), 2)
+
+	def test_missing_room(self):
+
+		self.assertEqual(self.client.get_room_id("Lab 9", page_size=2), "")
+		self.assertEqual(len(self.server.requests), 3)
+
+
+
+@unittest.skipIf(spark is None, "requests is not installed")
+class GetClientTest(unittest.TestCase):
+
+	def tearDown(self):
+
+		for token in ["token-a", "token-b"]:
+			client = spark.spark_clients.pop(token, None)
+			if client is not None:
+				client.close()
+
+	def test_one_client_per_token(self):
+
+		client = spark.get_client("token-a")
+		self.assertIs(spark.get_client("token-a"), client)
+		self.assertIsNot(spark.get_client("token-b"), client)
+		self.assertEqual(client.session.headers["Authorization"], "Bearer token-a")
+
+
+
+class FakeResponse(object):
+
+	def __init__(self, status_code, headers=None):
+
+		self.status_code = status_code
+		self.headers = headers or {}
+
+
+
+# Stands in for requests.Session.request, answering each call with the next response or raising the next error
+class FakeSender(object):
+
+	def __init__(self, outcomes):
+
+		self.outcomes = list(outcomes)
+		self.calls = []
+
+	def __call__(self, method, url, **kwargs):
+
+		self.calls.append(method)
+		outcome = self.outcomes.pop(0)
+		if isinstance(outcome, Exception):
+			raise outcome
+		return FakeResponse(outcome) if isinstance(outcome, int) else outcome
+
+
+
+@unittest.skipIf(spark is None, "requests is not installed")
+class RetryAfterTest(unittest.TestCase):
+
+	def test_seconds(self):
+
+		self.assertEqual(spark.retry_after(FakeResponse(429, {"Retry-After": " 3 "})), 3.0)
+		self.assertEqual(spark.retry_after(FakeResponse(429, {"Retry-After": "86400"})), spark.MAX_RETRY_AFTER)
+
+	def test_http_date(self):
+
+		seconds = spark.retry_after(FakeResponse(503, {"Retry-After": formatdate(time.time() + 60, usegmt=True)}))
+		self.assertTrue(55 <= seconds <= 61, seconds)
+		self.assertEqual(spark.retry_after(FakeResponse(503, {"Retry-After": formatdate(time.time() - 60, usegmt=True)})), 0)
+
+	def test_missing_or_unusable(self):
+
+		self.assertIsNone(spark.retry_after(FakeResponse(429)))
+		self.assertIsNone(spark.retry_after(FakeResponse(429, {"Retry-After": "soon"})))
+
+
+
+@unittest.skipIf(spark is None, "requests is not installed")
+class RequestSchedulerTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.sleeps = []
+		patches = [mock.patch.object(spark, "BACKOFF_BASE", 0.001), mock.patch.object(spark.time, "sleep", self.sleeps.append)]
+		for patch in patches:
+			patch.start()
+			self.addCleanup(patch.stop)
+		self.scheduler = spark.RequestScheduler(rate=1000, max_retries=3, failure_threshold=3, reset_seconds=30)
+
+	def send(self, sender, method="GET"):
+
+		return self.scheduler.send(sender, method, "https://api.example.com/v1/people")
+
+	def test_throttled_request_is_retried(self):
+
+		sender = FakeSender([FakeResponse(429, {"Retry-After": "0.001"}), 200])
+		self.assertEqual(self.send(sender).status_code, 200)
+
+		stats = self.scheduler.stats()
+		self.assertEqual((stats["sent"], stats["throttled"], stats["retried"], stats["failed"]), (2, 1, 1, 0))
+		self.assertLess(stats["rate"], 1000)
+		self.assertFalse(stats["circuit_open"])
+
+	def test_server_errors_retry_idempotent_methods_only(self):
+
+		sender = FakeSender([503, 200])
+		self.assertEqual(self.send(sender, "GET").status_code, 200)
+		self.assertEqual(sender.calls, ["GET", "GET"])
+
+		sender = FakeSender([503, 200])
+		self.assertEqual(self.send(sender, "post").status_code, 503)
+		self.assertEqual(sender.calls, ["POST"])
+		self.assertEqual(self.scheduler.stats()["failed"], 1)
+
+	def test_connection_errors(self):
+
+		sender = FakeSender([requests.exceptions.ConnectionError("reset"), 200])
+		self.assertRaises(requests.exceptions.ConnectionError, self.send, sender, "POST")
+
+		# A connection that was never made is safe to retry for any method
+		sender = FakeSender([requests.exceptions.ConnectTimeout("no answer"), 200])
+		self.assertEqual(self.send(sender, "POST").status_code, 200)
+
+		sender = FakeSender([requests.exceptions.SSLError("bad certificate"), 200])
+		self.assertRaises(requests.exceptions.SSLError, self.send, sender, "GET")
+
+	def test_retries_are_limited(self):
+
+		sender = FakeSender([500] * 10)
+		self.scheduler.failure_threshold = 100
+		self.assertEqual(self.send(sender).status_code, 500)
+		self.assertEqual(len(sender.calls), 4)
+		self.assertEqual(self.scheduler.stats()["retried"], 3)
+
+	def test_breaker_opens_after_threshold(self):
+
+		self.scheduler.max_retries = 0
+		for index in range(3):
+			self.assertEqual(self.send(FakeSender([500])).status_code, 500)
+
+		sender = FakeSender([200])
+		self.assertRaises(spark.SparkUnavailable, self.send, sender)
+		self.assertEqual(sender.calls, [])
+		stats = self.scheduler.stats()
+		self.assertTrue(stats["circuit_open"])
+		self.assertEqual(stats["rejected"], 1)
+
+	def test_successful_trial_closes_breaker(self):
+
+		self.scheduler.max_retries = 0
+		for index in range(3):
+			self.send(FakeSender([500]))
+		self.scheduler.opened_at -= self.scheduler.reset_seconds
+
+		self.assertEqual(self.send(FakeSender([200])).status_code, 200)
+		self.assertFalse(self.scheduler.stats()["circuit_open"])
+		self.assertEqual(self.send(FakeSender([200])).status_code, 200)
+
+	def test_failed_trial_reopens_breaker(self):
+
+		self.scheduler.max_retries = 0
+		for index in range(3):
+			self.send(FakeSender([500]))
+		self.scheduler.opened_at -= self.scheduler.reset_seconds
+
+		self.assertEqual(self.send(FakeSender([500])).status_code, 500)
+		self.assertRaises(spark.SparkUnavailable, self.send, FakeSender([200]))
+
+	def test_one_trial_at_a_time(self):
+
+		self.scheduler.max_retries = 0
+		for index in range(3):
+			self.send(FakeSender([500]))
+		self.scheduler.opened_at -= self.scheduler.reset_seconds
+
+		self.assertTrue(self.scheduler.admit())
+		self.assertRaises(spark.SparkUnavailable, self.scheduler.admit)
+		self.scheduler.end_trial()
+		self.assertTrue(self.scheduler.admit())
+
+	def test_trial_raising_does_not_lock_breaker(self):
+
+		self.scheduler.max_retries = 0
+		for index in range(3):
+			self.send(FakeSender([500]))
+		self.scheduler.opened_at -= self.scheduler.reset_seconds
+
+		self.assertRaises(ValueError, self.send, FakeSender([ValueError("bad request")]))
+		self.assertEqual(self.send(FakeSender([200])).status_code, 200)
+		self.assertFalse(self.scheduler.stats()["circuit_open"])
+
+	def test_backoff_is_bounded(self):
+
+		for attempt in range(16):
+			for index in range(20):
+				delay = self.scheduler.backoff(attempt)
+				self.assertTrue(0 <= delay <= min(spark.BACKOFF_MAX, spark.BACKOFF_BASE * 2 ** attempt))
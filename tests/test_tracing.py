@@ -0,0 +1,136 @@
+#####################################################################
+#																	#
+#	Module: 		test_tracing.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for check and command tracing				#
+#																	#
+#####################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import tracing
+
+
+
+class TracingTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		tracing.enable()
+
+	def tearDown(self):
+
+		tracing.enabled = False
+		del tracing.spans[:]
+		shutil.rmtree(self.work_dir)
+
+	def span(self, name, category, start, end, parent=None, args=None):
+
+		tracing.record_span(name, category, tracing.trace_start + start, tracing.trace_start + end, parent, args or {})
+
+	def load(self, name):
+
+		with open(os.path.join(self.work_dir, name)) as trace_file:
+			return json.load(trace_file)
+
+
+
+class TracedCheckTest(TracingTestCase):
+
+	def test_disabled_records_nothing(self):
+
+		tracing.enabled = False
+		check = tracing.traced_check(lambda: True)
+		self.assertTrue(check())
+		tracing.record_cmd("git status", 0.0, 1.0, 0, 10)
+		self.assertEqual(tracing.spans, [])
+
+	def test_commands_are_recorded_under_their_check(self):
+
+		@tracing.traced_check
+		def check_git():
+			self.assertEqual(tracing.current_check(), "check_git")
+			tracing.record_cmd("git --version", tracing.clock(), tracing.clock(), 0, 18)
+			return "2.30"
+
+		self.assertEqual(check_git(), "2.30")
+		self.assertIsNone(tracing.current_check())
+
+		cmd, check = tracing.spans
+		self.assertEqual((cmd["name"], cmd["category"], cmd["parent"]), ("git --version", "cmd", "check_git"))
+		self.assertEqual(cmd["args"], {"exit_code": 0, "output_bytes": 18})
+		self.assertEqual((check["name"], check["category"], check["parent"]), ("check_git", "check", None))
+		self.assertEqual(check["args"], {"result": "2.30"})
+		self.assertLessEqual(check["start"], cmd["start"])
+		self.assertGreaterEqual(check["end"], cmd["end"])
+
+	def test_failing_check_is_still_recorded(self):
+
+		@tracing.traced_check
+		def check_network():
+			raise IOError("unreachable")
+
+		self.assertRaises(IOError, check_network)
+		self.assertEqual([span["name"] for span in tracing.spans], ["check_network"])
+		self.assertEqual(tracing.spans[0]["args"], {"result": False})
+		self.assertIsNone(tracing.current_check())
+
+	def test_enable_clears_earlier_spans(self):
+
+		self.span("old", "cmd", 0.0, 1.0)
+		tracing.enable()
+		self.assertEqual(tracing.spans, [])
+
+
+
+class ChromeTraceTest(TracingTestCase):
+
+	def test_events(self):
+
+		self.span("check_pip", "check", 0.0, 2.0)
+		self.span("pip list", "cmd", 0.5, 1.5, "check_pip", {"exit_code": 0, "output_bytes": 100})
+		tracing.write_chrome_trace(os.path.join(self.work_dir, "trace.json"))
+
+		trace = self.load("trace.json")
+		check, cmd = trace["traceEvents"]
+		self.assertEqual((check["name"], check["ph"], check["ts"], check["dur"]), ("check_pip", "X", 0, 2000000))
+		self.assertEqual((cmd["name"], cmd["cat"], cmd["ts"], cmd["dur"]), ("pip list", "cmd", 500000, 1000000))
+		self.assertEqual(cmd["args"]["parent"], "check_pip")
+		self.assertEqual(cmd["args"]["output_bytes"], 100)
+
+	def test_overlapping_spans_get_their_own_rows(self):
+
+		self.span("check_pip", "check", 0.0, 4.0)
+		self.span("pip list", "cmd", 1.0, 2.0, "check_pip")
+		self.span("git status", "cmd", 1.5, 3.0)
+		self.span("git fetch", "cmd", 3.5, 3.8)
+		tracing.write_chrome_trace(os.path.join(self.work_dir, "trace.json"))
+
+		rows = dict((event["name"], event["tid"]) for event in self.load("trace.json")["traceEvents"])
+		self.assertEqual(rows["pip list"], rows["check_pip"])
+		self.assertNotEqual(rows["git status"], rows["check_pip"])
+		self.assertEqual(rows["git fetch"], rows["check_pip"])
+
+
+
+class SummaryTest(TracingTestCase):
+
+	def test_grouped_and_ranked(self):
+
+		self.span("pip list", "cmd", 0.0, 1.0, "check_pip", {"exit_code": 0, "output_bytes": 10})
+		self.span("pip list", "cmd", 1.0, 3.0, "check_pip", {"exit_code": 1, "output_bytes": 5})
+		self.span("git status", "cmd", 0.0, 0.5, None, {"exit_code": 0, "output_bytes": 1})
+		summary = tracing.write_summary(os.path.join(self.work_dir, "summary.json"))
+
+		self.assertEqual(summary, self.load("summary.json"))
+		self.assertEqual([entry["name"] for entry in summary], ["pip list", "git status"])
+		pip = summary[0]
+		self.assertEqual((pip["count"], pip["total_ms"], pip["max_ms"]), (2, 3000.0, 2000.0))
+		self.assertEqual(pip["output_bytes"], 15)
+		self.assertEqual(pip["exit_codes"], [0, 1])
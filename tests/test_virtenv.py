@@ -0,0 +1,200 @@
+#####################################################################
+#																	#
+#	Module: 		test_virtenv.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for cloning and relocating template 		#
+#					environments									#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import virtenv
+
+
+
+def write_file(path, data, mode=None):
+
+	if not os.path.isdir(os.path.dirname(path)):
+		os.makedirs(os.path.dirname(path))
+	with open(path, "wb") as env_file:
+		env_file.write(data)
+	if mode is not None:
+		os.chmod(path, mode)
+
+
+
+def read_file(path):
+
+	with open(path, "rb") as env_file:
+		return env_file.read()
+
+
+
+class VirtEnvTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.template = os.path.join(self.work_dir, "template")
+		self.scripts = virtenv.scripts_dir_name()
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+	def make_template(self):
+
+		prefix = os.path.abspath(self.template).encode("utf-8")
+		write_file(os.path.join(self.template, "pyvenv.cfg"), b"home = /usr/bin\nprompt = template\n")
+		write_file(os.path.join(self.template, self.scripts, "activate"),
+			b'VIRTUAL_ENV="' + prefix + b'"\nPS1="(template) ${PS1:-}"\n# template-tools is left alone\n')
+		write_file(os.path.join(self.template, self.scripts, "pip"),
+			b"#!" + prefix + b"/" + self.scripts.encode("utf-8") + b"/python\nimport pip\n", 0o755)
+		write_file(os.path.join(self.template, "lib", "site-packages", "module.py"), b"value = 1\n")
+
+
+
+class CloneEnvTest(VirtEnvTestCase):
+
+	def test_files_are_cloned(self):
+
+		self.make_template()
+		destination = os.path.join(self.work_dir, "clone")
+		counts = virtenv.clone_env(self.template, destination)
+
+		self.assertEqual(counts["symlink"], 0)
+		self.assertEqual(counts["reflink"] + counts["hardlink"] + counts["copy"], 4)
+		for path in ["pyvenv.cfg", os.path.join(self.scripts, "activate"), os.path.join(self.scripts, "pip"),
+						os.path.join("lib", "site-packages", "module.py")]:
+			self.assertEqual(read_file(os.path.join(destination, path)), read_file(os.path.join(self.template, path)))
+		self.assertTrue(os.stat(os.path.join(destination, self.scripts, "pip")).st_mode & stat.S_IXUSR)
+
+	def test_destination_must_not_exist(self):
+
+		self.make_template()
+		destination = os.path.join(self.work_dir, "clone")
+		os.makedirs(destination)
+		self.assertRaises(OSError, virtenv.clone_env, self.template, destination)
+
+	@unittest.skipIf(not hasattr(os, "symlink") or os.name == "nt", "symlinks are not available")
+	def test_symlinks_are_recreated(self):
+
+		self.make_template()
+		os.symlink("lib", os.path.join(self.template, "lib64"))
+		os.symlink("/usr/bin/python3", os.path.join(self.template, self.scripts, "python"))
+		destination = os.path.join(self.work_dir, "clone")
+		counts = virtenv.clone_env(self.template, destination)
+
+		self.assertEqual(counts["symlink"], 2)
+		self.assertEqual(os.readlink(os.path.join(destination, "lib64")), "lib")
+		self.assertEqual(os.readlink(os.path.join(destination, self.scripts, "python")), "/usr/bin/python3")
+
+
+
+class RelocateEnvTest(VirtEnvTestCase):
+
+	def test_paths_and_prompt_are_replaced(self):
+
+		self.make_template()
+		destination = os.path.join(self.work_dir, "project-env")
+		virtenv.clone_env(self.template, destination)
+		relocated = virtenv.relocate_env(destination, self.template)
+
+		new_prefix = os.path.abspath(destination).encode("utf-8")
+		activate = read_file(os.path.join(destination, self.scripts, "activate"))
+		self.assertIn(b'VIRTUAL_ENV="' + new_prefix + b'"', activate)
+		self.assertIn(b'PS1="(project-env) ', activate)
+		self.assertIn(b"template-tools", activate)
+		self.assertTrue(read_file(os.path.join(destination, self.scripts, "pip")).startswith(b"#!" + new_prefix + b"/"))
+		self.assertIn(b"prompt = project-env\n", read_file(os.path.join(destination, "pyvenv.cfg")))
+		self.assertEqual(sorted(os.path.basename(path) for path in relocated), ["activate", "pip", "pyvenv.cfg"])
+
+	def test_template_is_not_changed(self):
+
+		self.make_template()
+		before = read_file(os.path.join(self.template, self.scripts, "activate"))
+		destination = os.path.join(self.work_dir, "project-env")
+		virtenv.clone_env(self.template, destination)
+		virtenv.relocate_env(destination, self.template)
+
+		self.assertEqual(read_file(os.path.join(self.template, self.scripts, "activate")), before)
+		self.assertIn(b"prompt = template\n", read_file(os.path.join(self.template, "pyvenv.cfg")))
+
+	def test_script_mode_is_kept(self):
+
+		self.make_template()
+		destination = os.path.join(self.work_dir, "project-env")
+		virtenv.clone_env(self.template, destination)
+		virtenv.relocate_env(destination, self.template)
+
+		self.assertTrue(os.stat(os.path.join(destination, self.scripts, "pip")).st_mode & stat.S_IXUSR)
+
+
+
+class FindSeedWheelsTest(VirtEnvTestCase):
+
+	def test_newest_seed_wheels_are_picked(self):
+
+		wheel_dir = os.path.join(self.work_dir, "wheels")
+		for name in ["pip-900.0-py3-none-any.whl", "pip-900.1-py3-none-any.whl", "pip-901.0rc1-py3-none-any.whl",
+						"setuptools-900.0-py2.py3-none-any.whl", "wheel-900.0-py3-none-any.whl",
+						"pip-999.0-cp36-cp36m-linux_x86_64.whl"]:
+			write_file(os.path.join(wheel_dir, name), b"")
+
+		wheels = [os.path.basename(path) for path in virtenv.find_seed_wheels([wheel_dir])]
+		self.assertEqual(wheels, ["pip-901.0rc1-py3-none-any.whl", "setuptools-900.0-py2.py3-none-any.whl"])
+
+
+
+class InstallWheelTest(VirtEnvTestCase):
+
+	def make_wheel(self):
+
+		wheel = os.path.join(self.work_dir, "demo_tool-1.0-py3-none-any.whl")
+		with zipfile.ZipFile(wheel, "w") as wheel_zip:
+			wheel_zip.writestr("demo_tool/__init__.py", "import sys\n\ndef main():\n\tsys.stdout.write('demo ran')\n")
+			wheel_zip.writestr("demo_tool-1.0.dist-info/METADATA", "Name: demo-tool\nVersion: 1.0\n")
+			wheel_zip.writestr("demo_tool-1.0.dist-info/entry_points.txt",
+								"[console_scripts]\ndemo-tool = demo_tool:main\npip3.6 = demo_tool:main\n")
+		return wheel
+
+	def script_path(self, env_dir, name):
+
+		return os.path.join(env_dir, self.scripts, name + "-script.py" if os.name == "nt" else name)
+
+	def test_files_and_scripts_are_installed(self):
+
+		env_dir = os.path.join(self.work_dir, "env")
+		site_dir = virtenv.env_site_packages(env_dir)
+		os.makedirs(site_dir)
+		os.makedirs(os.path.join(env_dir, self.scripts))
+
+		scripts = virtenv.install_wheel(self.make_wheel(), env_dir, "/opt/python")
+
+		self.assertEqual(scripts, ["demo-tool", "pip%d.%d" % sys.version_info[:2]])
+		self.assertTrue(os.path.isfile(os.path.join(site_dir, "demo_tool", "__init__.py")))
+		self.assertEqual(read_file(os.path.join(site_dir, "demo_tool-1.0.dist-info", "INSTALLER")), b"pip\n")
+		script = read_file(self.script_path(env_dir, "demo-tool"))
+		self.assertTrue(script.startswith(b"#!/opt/python\n"))
+		self.assertIn(b"from demo_tool import main", script)
+
+	@unittest.skipIf(virtenv.venv is None, "venv needs Python 3")
+	def test_created_env_runs_the_seed_scripts(self):
+
+		env_dir = os.path.join(self.work_dir, "env")
+		python = virtenv.create_env(env_dir, [self.make_wheel()])
+
+		self.assertEqual(python, os.path.abspath(virtenv.env_python(env_dir)))
+		self.assertTrue(virtenv.can_create_in_process(sys.executable))
+		self.assertFalse(virtenv.can_create_in_process(None))
+		output = subprocess.check_output([python, self.script_path(env_dir, "demo-tool")])
+		self.assertEqual(output, b"demo ran")
@@ -0,0 +1,218 @@
+#####################################################################
+#																	#
+#	Module: 		test_wheelcache.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the content-addressed wheel cache		#
+#																	#
+#####################################################################
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+import wheelcache
+
+TAG = "cp36-cp36m-linux_x86_64"
+
+
+
+class WheelCacheTestCase(unittest.TestCase):
+
+	def setUp(self):
+
+		self.work_dir = tempfile.mkdtemp()
+		self.cache_dir = os.path.join(self.work_dir, "cache")
+		self.shared_dir = os.path.join(self.work_dir, "shared")
+		os.makedirs(self.shared_dir)
+
+	def tearDown(self):
+
+		shutil.rmtree(self.work_dir)
+
+	def wheel(self, filename, content=None):
+
+		path = os.path.join(self.shared_dir, filename)
+		with open(path, "wb") as wheel_file:
+			wheel_file.write((content or filename).encode("utf-8"))
+		return path
+
+	def set_last_used(self, tag, filename, last_used):
+
+		index = wheelcache._load_index(self.cache_dir, tag)
+		index[filename]["last_used"] = last_used
+		wheelcache._save_index(self.cache_dir, tag, index)
+
+	def blobs(self):
+
+		return sorted(os.listdir(os.path.join(self.cache_dir, "blobs")))
+
+
+
+class TagTest(WheelCacheTestCase):
+
+	def test_current_tag(self):
+
+		self.assertTrue(re.match(r"^(cp|pp)\d+-\w+-\w+$", wheelcache.current_tag()), wheelcache.current_tag())
+
+	def test_snippet_matches_current_tag(self):
+
+		output = subprocess.check_output([sys.executable, "-c", wheelcache.TAG_SNIPPET])
+		self.assertEqual(output.decode("utf-8").strip(), wheelcache.current_tag())
+
+	def test_tag_dir_is_created(self):
+
+		path = wheelcache.tag_dir(self.cache_dir, TAG)
+		self.assertEqual(path, os.path.join(self.cache_dir, "tags", TAG))
+		self.assertTrue(os.path.isdir(path))
+
+
+
+class IngestTest(WheelCacheTestCase):
+
+	def test_same_wheel_is_stored_once(self):
+
+		wheel = self.wheel("requests-2.18.4-py2.py3-none-any.whl")
+		self.assertEqual(wheelcache.ingest(self.cache_dir, TAG, [wheel]), ["requests-2.18.4-py2.py3-none-any.whl"])
+		self.assertEqual(wheelcache.ingest(self.cache_dir, TAG, [wheel]), [])
+		self.assertEqual(wheelcache.ingest(self.cache_dir, "cp37-cp37m-linux_x86_64", [wheel]), ["requests-2.18.4-py2.py3-none-any.whl"])
+
+		self.assertEqual(len(self.blobs()), 1)
+		linked = os.path.join(wheelcache.tag_dir(self.cache_dir, "cp37-cp37m-linux_x86_64"), "requests-2.18.4-py2.py3-none-any.whl")
+		with open(linked, "rb") as wheel_file:
+			self.assertEqual(wheel_file.read(), b"requests-2.18.4-py2.py3-none-any.whl")
+
+	def test_cached_projects(self):
+
+		wheelcache.ingest(self.cache_dir, TAG, [self.wheel("PyYAML-5.1-cp36-cp36m-linux_x86_64.whl"),
+												self.wheel("requests-2.18.4-py2.py3-none-any.whl")])
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, TAG), set(["pyyaml", "requests"]))
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, "cp37-cp37m-linux_x86_64"), set())
+
+
+
+class PruneTest(WheelCacheTestCase):
+
+	def setUp(self):
+
+		WheelCacheTestCase.setUp(self)
+		self.old = self.wheel("old-1.0-py3-none-any.whl", "o" * 100)
+		self.new = self.wheel("new-1.0-py3-none-any.whl", "n" * 100)
+		wheelcache.ingest(self.cache_dir, TAG, [self.old, self.new])
+		self.set_last_used(TAG, "old-1.0-py3-none-any.whl", 1000)
+		self.set_last_used(TAG, "new-1.0-py3-none-any.whl", 2000)
+
+	def test_least_recently_used_is_removed(self):
+
+		self.assertEqual(wheelcache.prune(self.cache_dir, 150), 1)
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, TAG), set(["new"]))
+		self.assertEqual(len(self.blobs()), 1)
+
+	def test_touch_keeps_a_wheel(self):
+
+		wheelcache.touch(self.cache_dir, TAG, ["Old"])
+		self.assertEqual(wheelcache.prune(self.cache_dir, 150), 1)
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, TAG), set(["old"]))
+
+	def test_shared_blob_is_kept_until_its_last_user_goes(self):
+
+		wheelcache.ingest(self.cache_dir, "cp37-cp37m-linux_x86_64", [self.old])
+		self.set_last_used("cp37-cp37m-linux_x86_64", "old-1.0-py3-none-any.whl", 3000)
+
+		self.assertEqual(wheelcache.prune(self.cache_dir, 150), 2)
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, TAG), set())
+		self.assertEqual(wheelcache.cached_projects(self.cache_dir, "cp37-cp37m-linux_x86_64"), set(["old"]))
+		self.assertEqual(len(self.blobs()), 1)
+
+	def test_within_limit(self):
+
+		self.assertEqual(wheelcache.prune(self.cache_dir, 1000), 0)
+		self.assertEqual(len(self.blobs()), 2)
+
+	def test_unreferenced_blobs_are_deleted(self):
+
+		with open(os.path.join(self.cache_dir, "blobs", "0" * 64 + ".whl"), "w") as blob_file:
+			blob_file.write("stray")
+
+		self.assertEqual(wheelcache.prune(self.cache_dir, 1000), 0)
+		self.assertEqual(len(self.blobs()), 2)
+
+
+
+@unittest.skipIf(mock is None, "mock is not available")
+class WheelFitsTest(unittest.TestCase):
+
+	def setUp(self):
+
+		patch = mock.patch.object(wheelcache, "_libc_version", return_value=("glibc", (2, 17)))
+		patch.start()
+		self.addCleanup(patch.stop)
+
+	def test_interpreter_and_abi(self):
+
+		self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-linux_x86_64.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("requests-2.18.4-py2.py3-none-any.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("tool-1.0-py35-none-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36dm-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp37-cp37m-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("lxml-4.2-cp27-cp27mu-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("tool-1.0-py37-none-any.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("README.txt", TAG))
+
+	def test_stable_abi(self):
+
+		self.assertTrue(wheelcache.wheel_fits("cryptography-2.6-cp34-abi3-linux_x86_64.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("cryptography-2.6-cp36-abi3-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("cryptography-41.0-cp37-abi3-linux_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("cryptography-2.6-cp34-abi3-linux_x86_64.whl", "pp36-pypy36_pp73-linux_x86_64"))
+
+	def test_architecture(self):
+
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-linux_aarch64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-manylinux2014_aarch64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-win_amd64.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-win_amd64.whl", "cp36-cp36m-win_amd64"))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-win32.whl", "cp36-cp36m-win_amd64"))
+
+	def test_manylinux_needs_new_enough_glibc(self):
+
+		self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-manylinux1_x86_64.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-manylinux_2_17_x86_64.manylinux2014_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-manylinux_2_28_x86_64.whl", TAG))
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-musllinux_1_1_x86_64.whl", TAG))
+
+		wheelcache._libc_version.return_value = ("", None)
+		self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-manylinux1_x86_64.whl", TAG))
+		self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-musllinux_1_1_x86_64.whl", TAG))
+
+	def test_macos(self):
+
+		tag = "cp36-cp36m-macosx_10_9_x86_64"
+		with mock.patch.object(wheelcache.platform, "mac_ver", return_value=("10.15.7", ("", "", ""), "x86_64")):
+			self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-macosx_10_6_intel.whl", tag))
+			self.assertTrue(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-macosx_10_15_universal2.whl", tag))
+			self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-macosx_11_0_x86_64.whl", tag))
+			self.assertFalse(wheelcache.wheel_fits("PyYAML-5.1-cp36-cp36m-macosx_10_9_arm64.whl", tag))
+
+
+
+class SeedTest(WheelCacheTestCase):
+
+	def test_only_fitting_wheels_are_added(self):
+
+		self.wheel("requests-2.18.4-py2.py3-none-any.whl")
+		self.wheel("PyYAML-5.1-cp36-cp36m-linux_x86_64.whl")
+		self.wheel("PyYAML-5.1-cp36-cp36m-win_amd64.whl")
+		self.wheel("lxml-4.2-cp27-cp27mu-linux_x86_64.whl")
+		self.wheel("README.txt")
+
+		added = wheelcache.seed(self.cache_dir, TAG, self.shared_dir)
+		self.assertEqual(sorted(added), ["PyYAML-5.1-cp36-cp36m-linux_x86_64.whl", "requests-2.18.4-py2.py3-none-any.whl"])
@@ -0,0 +1,176 @@
+#####################################################################
+#																	#
+#	Module: 		test_wheelhouse.py		 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Tests for the wheelhouse index server			#
+#																	#
+#####################################################################
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+import collections
+
+try:
+	from unittest import mock
+except ImportError:
+	mock = None
+
+try:
+	import http.client as http_client
+	import wheelhouse
+except (ImportError, SyntaxError):
+	wheelhouse = None
+
+# Contents of the test package file, long enough for ranges inside it
+PACKAGE_DATA = bytes(bytearray(range(256))) * 4
+PACKAGE_FILE = "Demo_Pkg-1.0-py3-none-any.whl"
+
+
+
+class ProjectNameTest(unittest.TestCase):
+
+	@unittest.skipIf(wheelhouse is None, "the wheelhouse needs Python 3")
+	def test_names_are_normalised(self):
+
+		self.assertEqual(wheelhouse.project_name("Demo_Pkg-1.0-py3-none-any.whl"), "demo-pkg")
+		self.assertEqual(wheelhouse.project_name("zope.interface-5.4.0.tar.gz"), "zope-interface")
+		self.assertEqual(wheelhouse.project_name("ncclient-0.6.3.zip"), "ncclient")
+		self.assertIsNone(wheelhouse.project_name("notes.txt"))
+		self.assertIsNone(wheelhouse.project_name("nodash.tar.gz"))
+
+
+
+@unittest.skipIf(wheelhouse is None, "the wheelhouse needs Python 3")
+class FillWheelhouseTest(unittest.TestCase):
+
+	def test_packaging_tools_are_downloaded_for_every_platform(self):
+
+		cmds = []
+
+		def stream_cmd(cmd, on_line=None):
+			cmds.append(cmd)
+			return collections.namedtuple("Status", ["returncode", "tail"])(0, [])
+
+		directory = tempfile.mkdtemp()
+		try:
+			with mock.patch.object(wheelhouse.shell, "stream_cmd", stream_cmd):
+				self.assertTrue(wheelhouse.fill_wheelhouse(os.path.join(directory, "room wheels"), "requirements.txt", ["win_amd64"], "36"))
+		finally:
+			shutil.rmtree(directory, True)
+
+		self.assertEqual(len(cmds), 2)
+		for cmd in cmds:
+			self.assertIn('--dest "%s"' % os.path.join(directory, "room wheels"), cmd)
+			for package in ["pip", "setuptools", "wheel", "virtualenv"]:
+				self.assertIn(" %s" % package, cmd)
+		self.assertIn("--platform win_amd64 --python-version 36", cmds[1])
+
+
+
+@unittest.skipIf(wheelhouse is None, "the wheelhouse needs Python 3")
+class WheelhouseServerTest(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+
+		cls.directory = tempfile.mkdtemp()
+		with open(os.path.join(cls.directory, PACKAGE_FILE), "wb") as package_file:
+			package_file.write(PACKAGE_DATA)
+		with open(os.path.join(cls.directory, "README.txt"), "w") as other_file:
+			other_file.write("not a package")
+
+		cls.server = wheelhouse.make_server(cls.directory, "127.0.0.1", 0)
+		cls.thread = threading.Thread(target=cls.server.serve_forever)
+		cls.thread.daemon = True
+		cls.thread.start()
+
+	@classmethod
+	def tearDownClass(cls):
+
+		cls.server.shutdown()
+		cls.server.server_close()
+		shutil.rmtree(cls.directory, True)
+
+	def request(self, path, headers=None, method="GET"):
+
+		connection = http_client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+		try:
+			connection.request(method, path, headers=headers or {})
+			response = connection.getresponse()
+			return response.status, dict((name.lower(), value) for name, value in response.getheaders()), response.read()
+		finally:
+			connection.close()
+
+	def test_root_page_lists_projects(self):
+
+		status, headers, body = self.request("/simple/")
+		self.assertEqual(status, 200)
+		self.assertIn(b'<a href="/simple/demo-pkg/">demo-pkg</a>', body)
+		self.assertNotIn(b"readme", body.lower())
+
+	def test_project_page_links_files_with_hash(self):
+
+		status, headers, body = self.request("/simple/demo-pkg/")
+		self.assertEqual(status, 200)
+		digest = hashlib.sha256(PACKAGE_DATA).hexdigest()
+		self.assertIn(("/packages/%s#sha256=%s" % (PACKAGE_FILE, digest)).encode("ascii"), body)
+
+	def test_unnormalised_project_name_redirects(self):
+
+		status, headers, body = self.request("/simple/Demo_Pkg/")
+		self.assertEqual(status, 301)
+		self.assertEqual(headers["location"], "/simple/demo-pkg/")
+
+	def test_unknown_project_and_non_package_files_are_not_found(self):
+
+		self.assertEqual(self.request("/simple/missing/")[0], 404)
+		self.assertEqual(self.request("/packages/README.txt")[0], 404)
+		self.assertEqual(self.request("/packages/..%2F" + PACKAGE_FILE)[0], 404)
+
+	def test_whole_file(self):
+
+		status, headers, body = self.request("/packages/" + PACKAGE_FILE)
+		self.assertEqual(status, 200)
+		self.assertEqual(headers["accept-ranges"], "bytes")
+		self.assertEqual(body, PACKAGE_DATA)
+
+	def test_head_sends_no_body(self):
+
+		status, headers, body = self.request("/packages/" + PACKAGE_FILE, method="HEAD")
+		self.assertEqual(status, 200)
+		self.assertEqual(headers["content-length"], str(len(PACKAGE_DATA)))
+		self.assertEqual(body, b"")
+
+	def test_byte_ranges(self):
+
+		size = len(PACKAGE_DATA)
+		cases = [("bytes=10-19", 10, 19), ("bytes=1000-", 1000, size - 1),
+					("bytes=-24", size - 24, size - 1), ("bytes=1020-5000", 1020, size - 1)]
+		for byte_range, start, end in cases:
+			status, headers, body = self.request("/packages/" + PACKAGE_FILE, {"Range": byte_range})
+			self.assertEqual(status, 206, byte_range)
+			self.assertEqual(headers["content-range"], "bytes %d-%d/%d" % (start, end, size), byte_range)
+			self.assertEqual(body, PACKAGE_DATA[start:end + 1], byte_range)
+
+	def test_unsatisfiable_range(self):
+
+		for byte_range in ["bytes=%d-" % len(PACKAGE_DATA), "bytes=20-10", "bytes=-0"]:
+			status, headers, body = self.request("/packages/" + PACKAGE_FILE, {"Range": byte_range})
+			self.assertEqual(status, 416, byte_range)
+			self.assertEqual(headers["content-range"], "bytes */%d" % len(PACKAGE_DATA), byte_range)
+
+	def test_unsupported_range_sends_whole_file(self):
+
+		status, headers, body = self.request("/packages/" + PACKAGE_FILE, {"Range": "bytes=0-1,5-6"})
+		self.assertEqual(status, 200)
+		self.assertEqual(body, PACKAGE_DATA)
+
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,274 @@
+#####################################################################
+#																	#
+#	Module: 		tracing.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Timing spans for checks and shell commands, 	#
+#					exported as Chrome trace and JSON summary		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for timestamps
+import time
+
+# Used for tracking the running check per thread
+import threading
+import functools
+
+# Used for writing trace files
+import json
+import os
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Spans are only recorded once tracing is enabled
+enabled = False
+
+# High resolution clock where available
+clock = getattr(time, "perf_counter", time.time)
+
+# Recorded spans and the clock reading tracing started at
+spans = []
+spans_lock = threading.Lock()
+trace_start = clock()
+
+# Stack of running checks, per thread
+check_stack = threading.local()
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		enable
+
+Description:	Clears any recorded spans and starts recording.
+
+Arguments:		None
+
+Return:			None
+"""
+def enable():
+
+	global enabled, trace_start
+
+	with spans_lock:
+		del spans[:]
+	trace_start = clock()
+	enabled = True
+
+
+
+"""
+Function: 		traced_check
+
+Description:	Decorator recording a span for each call of a top-level check function.
+				Commands run while the check is in progress are recorded with the check
+				as their parent.
+
+Arguments:		func 	- check function to wrap
+
+Return:			wrapper - wrapped check function
+"""
+def traced_check(func):
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+
+		if not enabled:
+			return func(*args, **kwargs)
+
+		parent = current_check()
+		stack = _check_stack()
+		stack.append(func.__name__)
+		start = clock()
+		result = None
+		try:
+			result = func(*args, **kwargs)
+			return result
+		finally:
+			stack.pop()
+			record_span(func.__name__, "check", start, clock(), parent,
+						{"result": result if isinstance(result, (bool, str)) else result is not None})
+
+	return wrapper
+
+
+
+"""
+Function: 		record_cmd
+
+Description:	Records a span for one shell command.
+
+Arguments:		cmd 			- command string that was run
+				start 			- clock() reading when the command started
+				end 			- clock() reading when the command finished
+				exit_code 		- command exit code, None if unknown
+				output_bytes 	- number of bytes the command printed
+
+Return:			None
+"""
+def record_cmd(cmd, start, end, exit_code, output_bytes):
+
+	if enabled:
+		record_span(cmd, "cmd", start, end, current_check(),
+					{"exit_code": exit_code, "output_bytes": output_bytes})
+
+
+
+"""
+Function: 		record_span
+
+Description:	Records a finished span.
+
+Arguments:		name 		- span name, the check name or command string
+				category 	- "check" or "cmd"
+				start 		- clock() reading when the span started
+				end 		- clock() reading when the span finished
+				parent 		- name of the check the span ran under, or None
+				args 		- dictionary of extra details
+
+Return:			None
+"""
+def record_span(name, category, start, end, parent, args):
+
+	span = {"name": name,
+			"category": category,
+			"start": start - trace_start,
+			"end": end - trace_start,
+			"parent": parent,
+			"thread": threading.current_thread().name,
+			"args": args}
+
+	with spans_lock:
+		spans.append(span)
+
+
+
+"""
+Function: 		current_check
+
+Description:	Returns the check running on the current thread.
+
+Arguments:		None
+
+Return:			name 	- check function name, or None outside any check
+"""
+def current_check():
+
+	stack = _check_stack()
+	if stack:
+		return stack[-1]
+	return None
+
+
+
+"""
+Function: 		write_chrome_trace
+
+Description:	Writes recorded spans as a Chrome Trace Event file,
+				viewable in chrome://tracing or https://ui.perfetto.dev.
+				Overlapping commands are spread over separate rows.
+
+Arguments:		path 	- output file path
+
+Return:			None
+"""
+def write_chrome_trace(path):
+
+	with spans_lock:
+		recorded = list(spans)
+
+	events = []
+	lanes = []
+	for span in sorted(recorded, key=lambda s: (s["start"], s["start"] - s["end"])):
+		args = dict(span["args"])
+		args["parent"] = span["parent"]
+		args["thread"] = span["thread"]
+		events.append({"name": span["name"],
+						"cat": span["category"],
+						"ph": "X",
+						"ts": int(span["start"] * 1000000),
+						"dur": int((span["end"] - span["start"]) * 1000000),
+						"pid": os.getpid(),
+						"tid": _assign_lane(lanes, span),
+						"args": args})
+
+	with open(path, "w") as trace_file:
+		json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file, indent=1)
+
+
+
+"""
+Function: 		write_summary
+
+Description:	Writes a flat JSON summary of the recorded spans,
+				grouped by name and ranked by total time spent.
+
+Arguments:		path 	- output file path
+
+Return:			summary - list of summary entries written to the file
+"""
+def write_summary(path):
+
+	with spans_lock:
+		recorded = list(spans)
+
+	totals = {}
+	for span in recorded:
+		key = (span["category"], span["name"], span["parent"])
+		duration = span["end"] - span["start"]
+		entry = totals.setdefault(key, {"name": span["name"],
+										"category": span["category"],
+										"parent": span["parent"],
+										"count": 0,
+										"total_ms": 0.0,
+										"max_ms": 0.0,
+										"output_bytes": 0,
+										"exit_codes": []})
+		entry["count"] += 1
+		entry["total_ms"] += duration * 1000
+		entry["max_ms"] = max(entry["max_ms"], duration * 1000)
+		entry["output_bytes"] += span["args"].get("output_bytes") or 0
+		exit_code = span["args"].get("exit_code")
+		if span["category"] == "cmd" and exit_code not in entry["exit_codes"]:
+			entry["exit_codes"].append(exit_code)
+
+	summary = sorted(totals.values(), key=lambda entry: entry["total_ms"], reverse=True)
+	for entry in summary:
+		entry["total_ms"] = round(entry["total_ms"], 3)
+		entry["max_ms"] = round(entry["max_ms"], 3)
+
+	with open(path, "w") as summary_file:
+		json.dump(summary, summary_file, indent=1)
+
+	return summary
+
+
+
+def _check_stack():
+
+	if not hasattr(check_stack, "names"):
+		check_stack.names = []
+	return check_stack.names
+
+
+
+def _assign_lane(lanes, span):
+
+	# Each lane is a stack of end times, a span goes in the first lane it nests in or follows
+	for index, lane in enumerate(lanes):
+		while lane and lane[-1] <= span["start"]:
+			lane.pop()
+		if not lane or span["end"] <= lane[-1]:
+			lane.append(span["end"])
+			return index + 1
+
+	lanes.append([span["end"]])
+	return len(lanes)
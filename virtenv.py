@@ -0,0 +1,433 @@
+#####################################################################
+#																	#
+#	Module: 		virtenv.py				 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Virtual environment cloning from a provisioned 	#
+#					template, with relocation of its scripts		#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for copying the template
+import os
+import re
+import sys
+import shutil
+import stat
+import errno
+import glob
+
+# Used for creating environments and installing seed wheels in-process
+import zipfile
+try:
+	import venv
+	import ensurepip
+except ImportError:
+	venv = None
+	ensurepip = None
+try:
+	import configparser
+except ImportError:
+	import ConfigParser as configparser
+
+# Used for picking the newest seed wheels
+import lockfile
+
+# Used for finding the per-user template folder
+import fsprobe
+
+# Copy-on-write clones, Linux uses the FICLONE ioctl and macOS clonefile()
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+try:
+	import ctypes
+	import ctypes.util
+except ImportError:
+	ctypes = None
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# ioctl request number sharing a file's extents with another (copy-on-write)
+FICLONE = 0x40049409
+
+# Template files rewritten when a clone is relocated
+relocated_cfg = "pyvenv.cfg"
+
+# Files larger than this in the scripts folder are not searched for the old path
+RELOCATE_MAX_BYTES = 4 * 1024 * 1024
+
+# Packages installed into new environments by create_env
+seed_projects = ["pip", "setuptools"]
+
+# Console script generated for each seed package entry point
+SCRIPT_TEMPLATE = """#!%(python)s
+# -*- coding: utf-8 -*-
+import re
+import sys
+from %(module)s import %(function)s
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe|\\.bat)?$", "", sys.argv[0])
+    sys.exit(%(function)s())
+"""
+
+# Windows runs the script above through a batch file next to it
+BATCH_TEMPLATE = '@"%%~dp0python.exe" "%%~dp0%(name)s-script.py" %%*\r\n'
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		default_template_root
+
+Description:	Returns the per-user folder holding template environments.
+
+Arguments:		None
+
+Return:			result 	- template folder path
+"""
+def default_template_root():
+
+	return fsprobe.state_dir("templates")
+
+
+
+"""
+Function: 		scripts_dir_name
+
+Description:	Returns the name of the folder holding an environment's executables.
+
+Arguments:		None
+
+Return:			result 	- 'Scripts' on Windows, otherwise 'bin'
+"""
+def scripts_dir_name():
+
+	return "Scripts" if os.name == "nt" else "bin"
+
+
+
+"""
+Function: 		clone_env
+
+Description:	Clones a template environment, sharing file contents with it where the filesystem
+				allows: copy-on-write clones first, then hard links, then plain copies.
+				Files rewritten by relocate_env are always replaced, never edited in place,
+				so the template is not changed through a shared hard link.
+
+Arguments:		template 	- template environment folder
+				destination - new environment folder, must not exist
+
+Return:			result 		- dictionary counting files by how they were cloned
+"""
+def clone_env(template, destination):
+
+	counts = {"reflink": 0, "hardlink": 0, "copy": 0, "symlink": 0}
+	methods = [_reflink, _hardlink, shutil.copyfile]
+
+	for root, dirs, files in os.walk(template):
+		target_root = os.path.join(destination, os.path.relpath(root, template))
+		os.makedirs(target_root)
+		shutil.copystat(root, target_root)
+
+		# Symlinked folders (i.e. lib64 -> lib) are recreated as links, not followed
+		for name in list(dirs):
+			source = os.path.join(root, name)
+			if os.path.islink(source):
+				os.symlink(os.readlink(source), os.path.join(target_root, name))
+				counts["symlink"] += 1
+				dirs.remove(name)
+
+		for name in files:
+			source = os.path.join(root, name)
+			target = os.path.join(target_root, name)
+			if os.path.islink(source):
+				os.symlink(os.readlink(source), target)
+				counts["symlink"] += 1
+				continue
+
+			# Drop a method for the rest of the clone once the filesystem refuses it
+			while True:
+				method = methods[0]
+				try:
+					method(source, target)
+					break
+				except (OSError, IOError):
+					if method is shutil.copyfile:
+						raise
+					_remove(target)
+					methods.pop(0)
+
+			if method is not _hardlink:
+				shutil.copymode(source, target)
+			counts[{_reflink: "reflink", _hardlink: "hardlink"}.get(method, "copy")] += 1
+
+	return counts
+
+
+
+"""
+Function: 		relocate_env
+
+Description:	Points a cloned environment at its new folder: the activate scripts, script
+				shebangs (including the ones inside Windows launcher .exe files) and pyvenv.cfg
+				have the template folder and prompt name replaced.
+
+Arguments:		env_dir 	- cloned environment folder
+				template 	- template environment folder it was cloned from
+
+Return:			result 		- list of relocated file paths
+"""
+def relocate_env(env_dir, template):
+
+	old_prefix = os.path.abspath(template).encode("utf-8")
+	new_prefix = os.path.abspath(env_dir).encode("utf-8")
+	old_name = os.path.basename(os.path.abspath(template)).encode("utf-8")
+	new_name = os.path.basename(os.path.abspath(env_dir)).encode("utf-8")
+	prompt_pattern = re.compile(br"(?<![\w.-])" + re.escape(old_name) + br"(?![\w.-])")
+
+	candidates = [os.path.join(env_dir, relocated_cfg)]
+	scripts_dir = os.path.join(env_dir, scripts_dir_name())
+	for name in sorted(os.listdir(scripts_dir)):
+		path = os.path.join(scripts_dir, name)
+		if os.path.isfile(path) and not os.path.islink(path) and os.path.getsize(path) <= RELOCATE_MAX_BYTES:
+			candidates.append(path)
+
+	relocated = []
+	for path in candidates:
+		with open(path, "rb") as env_file:
+			data = env_file.read()
+
+		new_data = data.replace(old_prefix, new_prefix)
+		name = os.path.basename(path).lower()
+		if name.startswith("activate") or name == relocated_cfg:
+			new_data = prompt_pattern.sub(new_name, new_data)
+
+		if new_data != data:
+			_replace_file(path, new_data)
+			relocated.append(path)
+
+	return relocated
+
+
+
+"""
+Function: 		env_python
+
+Description:	Returns the interpreter path of an environment.
+
+Arguments:		env_dir 	- environment folder
+
+Return:			result 		- interpreter path
+"""
+def env_python(env_dir):
+
+	return os.path.join(env_dir, scripts_dir_name(), "python.exe" if os.name == "nt" else "python")
+
+
+
+"""
+Function: 		can_create_in_process
+
+Description:	Checks whether create_env can build environments for an interpreter,
+				which is only the case for the interpreter running this script.
+
+Arguments:		python_path 	- path of the interpreter environments are wanted for
+
+Return:			result 			- Boolean value
+"""
+def can_create_in_process(python_path):
+
+	if venv is None or not python_path:
+		return False
+	return os.path.normcase(os.path.realpath(python_path)) == os.path.normcase(os.path.realpath(sys.executable))
+
+
+
+"""
+Function: 		find_seed_wheels
+
+Description:	Picks the newest pip and setuptools wheels from local folders and the
+				wheels bundled with ensurepip, so seeding never needs the network.
+
+Arguments:		wheel_dirs 	- list of extra folders to look in, i.e. the wheel cache
+
+Return:			result 		- list of wheel paths, one per seed package found
+"""
+def find_seed_wheels(wheel_dirs=()):
+
+	search_dirs = list(wheel_dirs)
+	if ensurepip is not None:
+		search_dirs.append(os.path.join(os.path.dirname(ensurepip.__file__), "_bundled"))
+
+	newest = {}
+	for directory in search_dirs:
+		for path in glob.glob(os.path.join(directory, "*-py3-none-any.whl")) + glob.glob(os.path.join(directory, "*-py2.py3-none-any.whl")):
+			project, version = os.path.basename(path).split("-")[:2]
+			key = lockfile.parse_version(version)
+			if project in seed_projects and key is not None and (project not in newest or key > newest[project][0]):
+				newest[project] = (key, path)
+
+	return [newest[project][1] for project in seed_projects if project in newest]
+
+
+
+"""
+Function: 		create_env
+
+Description:	Creates a virtual environment in-process with venv.EnvBuilder, then installs the
+				seed wheels by unpacking them into site-packages and writing their console
+				scripts, instead of running ensurepip.
+
+Arguments:		env_dir 	- new environment folder
+				seed_wheels - list of wheel paths from find_seed_wheels
+
+Return:			result 		- interpreter path of the new environment
+"""
+def create_env(env_dir, seed_wheels):
+
+	builder = venv.EnvBuilder(symlinks=(os.name != "nt"), with_pip=False)
+	builder.create(env_dir)
+
+	python = os.path.abspath(env_python(env_dir))
+	for wheel in seed_wheels:
+		install_wheel(wheel, env_dir, python)
+
+	return python
+
+
+
+"""
+Function: 		install_wheel
+
+Description:	Installs a pure Python wheel into an environment without pip.
+				The files are unpacked into site-packages and a launcher is written
+				for each console script entry point.
+
+Arguments:		wheel 		- wheel path
+				env_dir 	- environment folder
+				python 		- environment interpreter path, used in the script shebangs
+
+Return:			result 		- list of console script names written
+"""
+def install_wheel(wheel, env_dir, python):
+
+	site_dir = env_site_packages(env_dir)
+	scripts_dir = os.path.join(env_dir, scripts_dir_name())
+
+	with zipfile.ZipFile(wheel) as wheel_zip:
+		wheel_zip.extractall(site_dir)
+		entry_points = [name for name in wheel_zip.namelist() if name.endswith(".dist-info/entry_points.txt")]
+
+	# pip checks INSTALLER when deciding whether it may upgrade a package
+	for name in entry_points:
+		with open(os.path.join(site_dir, os.path.dirname(name), "INSTALLER"), "w") as installer_file:
+			installer_file.write("pip\n")
+
+	scripts = []
+	for name in entry_points:
+		parser = configparser.ConfigParser()
+		parser.optionxform = str
+		parser.read(os.path.join(site_dir, name))
+		if not parser.has_section("console_scripts"):
+			continue
+
+		for script, target in parser.items("console_scripts"):
+
+			# Versioned names such as pip3.6 are for the interpreter the wheel was built with
+			if re.match(r"^pip\d\.\d+$", script):
+				script = "pip%d.%d" % sys.version_info[:2]
+			module, function = [part.strip() for part in target.split(":")]
+			_write_script(scripts_dir, script, python, module, function.split(".")[0])
+			scripts.append(script)
+
+	return scripts
+
+
+
+"""
+Function: 		env_site_packages
+
+Description:	Returns the site-packages folder of an environment created for the running interpreter.
+
+Arguments:		env_dir 	- environment folder
+
+Return:			result 		- site-packages folder path
+"""
+def env_site_packages(env_dir):
+
+	if os.name == "nt":
+		return os.path.join(env_dir, "Lib", "site-packages")
+	return os.path.join(env_dir, "lib", "python%d.%d" % sys.version_info[:2], "site-packages")
+
+
+
+def _write_script(scripts_dir, name, python, module, function):
+
+	script = SCRIPT_TEMPLATE % {"python": python, "module": module, "function": function}
+	if os.name == "nt":
+		with open(os.path.join(scripts_dir, name + "-script.py"), "w") as script_file:
+			script_file.write(script)
+		with open(os.path.join(scripts_dir, name + ".bat"), "w") as batch_file:
+			batch_file.write(BATCH_TEMPLATE % {"name": name})
+		return
+
+	path = os.path.join(scripts_dir, name)
+	with open(path, "w") as script_file:
+		script_file.write(script)
+	os.chmod(path, 0o755)
+
+
+
+def _reflink(source, destination):
+
+	if sys.platform.startswith("linux") and fcntl is not None:
+		with open(source, "rb") as source_file:
+			with open(destination, "wb") as destination_file:
+				fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+		return
+
+	if sys.platform == "darwin" and ctypes is not None:
+		libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+		if libc.clonefile(source.encode("utf-8"), destination.encode("utf-8"), 0) != 0:
+			error = ctypes.get_errno()
+			raise OSError(error, os.strerror(error))
+		return
+
+	raise OSError(errno.EOPNOTSUPP, "Copy-on-write clones are not supported")
+
+
+
+def _hardlink(source, destination):
+
+	if not hasattr(os, "link"):
+		raise OSError(errno.EOPNOTSUPP, "Hard links are not supported")
+	os.link(source, destination)
+
+
+
+def _replace_file(path, data):
+
+	# Write a new file rather than editing in place, which would also change a hard linked template
+	mode = stat.S_IMODE(os.stat(path).st_mode)
+	os.remove(path)
+	with open(path, "wb") as env_file:
+		env_file.write(data)
+	os.chmod(path, mode)
+
+
+
+def _remove(path):
+
+	try:
+		os.remove(path)
+	except OSError:
+		pass
@@ -0,0 +1,473 @@
+#####################################################################
+#																	#
+#	Module: 		wheelcache.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Content-addressed cache of built wheels, keyed 	#
+#					by interpreter and platform tag					#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for storing wheels
+import os
+import shutil
+import hashlib
+import json
+import time
+import tempfile
+
+# Used for working out interpreter, ABI and platform tags
+import sys
+import sysconfig
+import platform
+import re
+
+# Used for normalising package names
+import inventory
+
+# Used for finding the per-user cache folder
+import fsprobe
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Snippet printing the interpreter/ABI/platform tag of another Python interpreter, kept in step with current_tag
+# It runs as 'python -c "..."' on Python 2 and 3, so it has no double quotes and no '%'
+TAG_SNIPPET = ("import sys, sysconfig; v = sys.version_info; c = sysconfig.get_config_var; "
+				"i = ('cp' if sys.version.find('PyPy') < 0 else 'pp') + str(v[0]) + str(v[1]); "
+				"f = getattr(sys, 'abiflags', None); "
+				"f = (('d' if hasattr(sys, 'gettotalrefcount') else '') "
+				"+ ('m' if v < (3, 8) and c('WITH_PYMALLOC') in (None, 1) else '') "
+				"+ ('u' if v < (3, 3) and sys.maxunicode == 0x10FFFF else '')) if f is None else f; "
+				"a = '_'.join((c('SOABI') or 'none').split('-')[:2]) if i[:2] == 'pp' else 'cp' + str(v[0]) + str(v[1]) + f; "
+				"print(i + '-' + a + '-' + sysconfig.get_platform().replace('-', '_').replace('.', '_'))")
+
+# glibc versions promised by the legacy manylinux platform tags
+legacy_manylinux = {"manylinux1": (2, 5), "manylinux2010": (2, 12), "manylinux2014": (2, 17)}
+
+# Wheel architectures each macOS interpreter architecture can load
+macos_archs = {"x86_64": ("x86_64", "intel", "fat64", "fat3", "universal", "universal2"),
+				"arm64": ("arm64", "universal2"),
+				"i386": ("i386", "intel", "fat", "fat3", "fat32", "universal")}
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		default_cache_dir
+
+Description:	Returns the per-user wheel cache folder.
+
+Arguments:		None
+
+Return:			result 	- wheel cache folder path
+"""
+def default_cache_dir():
+
+	return fsprobe.state_dir("wheels")
+
+
+
+"""
+Function: 		current_tag
+
+Description:	Returns the interpreter/ABI/platform tag of the running interpreter, i.e. 'cp36-cp36m-linux_x86_64'.
+				Use TAG_SNIPPET to get the tag of another interpreter.
+
+Arguments:		None
+
+Return:			result 	- tag string
+"""
+def current_tag():
+
+	impl = "pp" if "PyPy" in sys.version else "cp"
+	interpreter = "%s%d%d" % (impl, sys.version_info[0], sys.version_info[1])
+	platform_tag = sysconfig.get_platform().replace("-", "_").replace(".", "_")
+	return "%s-%s-%s" % (interpreter, _abi_tag(impl), platform_tag)
+
+
+
+def _abi_tag(impl):
+
+	if impl == "pp":
+		return "_".join((sysconfig.get_config_var("SOABI") or "none").split("-")[:2])
+
+	flags = getattr(sys, "abiflags", None)
+	if flags is None:
+		# Windows and Python 2 have no sys.abiflags
+		flags = ""
+		if hasattr(sys, "gettotalrefcount"):
+			flags += "d"
+		if sys.version_info < (3, 8) and sysconfig.get_config_var("WITH_PYMALLOC") in (None, 1):
+			flags += "m"
+		if sys.version_info < (3, 3) and sys.maxunicode == 0x10FFFF:
+			flags += "u"
+	return "cp%d%d%s" % (sys.version_info[0], sys.version_info[1], flags)
+
+
+
+"""
+Function: 		tag_dir
+
+Description:	Returns the folder of wheels for a tag, suitable for 'pip install --find-links'.
+				Entries are hard links (or copies) of content-addressed blobs.
+
+Arguments:		cache_dir 	- wheel cache folder
+				tag 		- interpreter/platform tag
+
+Return:			result 		- folder path, created if missing
+"""
+def tag_dir(cache_dir, tag):
+
+	path = os.path.join(cache_dir, "tags", tag)
+	if not os.path.isdir(path):
+		os.makedirs(path)
+	return path
+
+
+
+"""
+Function: 		cached_projects
+
+Description:	Lists the projects with a wheel cached for a tag.
+
+Arguments:		cache_dir 	- wheel cache folder
+				tag 		- interpreter/platform tag
+
+Return:			result 		- set of normalised project names
+"""
+def cached_projects(cache_dir, tag):
+
+	projects = set()
+	for filename in os.listdir(tag_dir(cache_dir, tag)):
+		if filename.endswith(".whl"):
+			projects.add(inventory.normalize_name(filename.split("-")[0]))
+	return projects
+
+
+
+"""
+Function: 		ingest
+
+Description:	Adds wheels to the cache under a tag.
+				Each wheel is stored once by its sha256 and linked into the tag folder.
+
+Arguments:		cache_dir 	- wheel cache folder
+				tag 		- interpreter/platform tag
+				wheel_paths - list of wheel file paths
+
+Return:			result 		- list of wheel file names added
+"""
+def ingest(cache_dir, tag, wheel_paths):
+
+	blob_dir = os.path.join(cache_dir, "blobs")
+	if not os.path.isdir(blob_dir):
+		os.makedirs(blob_dir)
+	links = tag_dir(cache_dir, tag)
+	index = _load_index(cache_dir, tag)
+
+	added = []
+	for wheel_path in wheel_paths:
+		filename = os.path.basename(wheel_path)
+		digest = _file_sha256(wheel_path)
+		blob = os.path.join(blob_dir, digest + ".whl")
+		if not os.path.exists(blob):
+			staging = blob + ".tmp%d" % os.getpid()
+			shutil.copyfile(wheel_path, staging)
+			os.rename(staging, blob)
+
+		link = os.path.join(links, filename)
+		if not os.path.exists(link):
+			_link_or_copy(blob, link)
+			added.append(filename)
+		index[filename] = {"sha256": digest, "last_used": time.time()}
+
+	_save_index(cache_dir, tag, index)
+	return added
+
+
+
+"""
+Function: 		seed
+
+Description:	Pre-seeds the cache from a shared folder of wheels, e.g. one filled by a proctor.
+				Only wheels that can suit the tag are added, pip makes the final choice.
+
+Arguments:		cache_dir 	- wheel cache folder
+				tag 		- interpreter/platform tag
+				shared_dir 	- folder of wheel files
+
+Return:			result 		- list of wheel file names added
+"""
+def seed(cache_dir, tag, shared_dir):
+
+	wheels = [os.path.join(shared_dir, filename) for filename in sorted(os.listdir(shared_dir))
+				if filename.endswith(".whl") and wheel_fits(filename, tag)]
+	return ingest(cache_dir, tag, wheels)
+
+
+
+"""
+Function: 		wheel_fits
+
+Description:	Checks that a wheel file name suits an interpreter/ABI/platform tag.
+				The wheel needs the same interpreter and ABI, the stable ABI of an older or equal CPython, or no ABI.
+				Its platform must be the tag's own, 'any', a manylinux/musllinux tag this machine's libc can load
+				or a macOS tag for the same architecture and an older or equal macOS.
+
+Arguments:		filename 	- wheel file name
+				tag 		- interpreter/ABI/platform tag
+
+Return:			result 		- Boolean value
+"""
+def wheel_fits(filename, tag):
+
+	parts = filename[:-len(".whl")].split("-")
+	if len(parts) < 5:
+		return False
+	python_tags, abi_tags, platform_tags = parts[-3].split("."), parts[-2].split("."), parts[-1].split(".")
+	interpreter, abi, platform_tag = tag.split("-", 2)
+
+	if not any(_abi_fits(python_tag, abi_tag, interpreter, abi) for python_tag in python_tags for abi_tag in abi_tags):
+		return False
+	return any(_platform_fits(candidate, platform_tag) for candidate in platform_tags)
+
+
+
+def _python_version(python_tag):
+
+	match = re.match(r"^(py|cp|pp)(\d)(\d*)$", python_tag)
+	if match is None:
+		return None, None
+	return match.group(1), (int(match.group(2)), int(match.group(3) or 0))
+
+
+
+def _abi_fits(python_tag, abi_tag, interpreter, abi):
+
+	if python_tag == interpreter and abi_tag in (abi, "none"):
+		return True
+	impl, version = _python_version(python_tag)
+	interpreter_impl, interpreter_version = _python_version(interpreter)
+	if version is None or interpreter_version is None or version[0] != interpreter_version[0] or version > interpreter_version:
+		return False
+	if abi_tag == "abi3":
+		return impl == "cp" and interpreter_impl == "cp"
+	return impl == "py" and abi_tag == "none"
+
+
+
+def _platform_fits(candidate, platform_tag):
+
+	if candidate in ("any", platform_tag):
+		return True
+
+	if platform_tag.startswith("linux_"):
+		arch = platform_tag[len("linux_"):]
+		libc, libc_version = _libc_version()
+		match = re.match(r"^(manylinux|musllinux)_(\d+)_(\d+)_(.+)$", candidate)
+		if match is not None:
+			family, wanted, candidate_arch = match.group(1), (int(match.group(2)), int(match.group(3))), match.group(4)
+		else:
+			family, _, candidate_arch = candidate.partition("_")
+			if family not in legacy_manylinux:
+				return False
+			family, wanted = "manylinux", legacy_manylinux[family]
+		if candidate_arch != arch:
+			return False
+		if family == "manylinux":
+			return libc == "glibc" and libc_version is not None and wanted <= libc_version
+		return libc != "glibc"
+
+	match = re.match(r"^macosx_(\d+)_(\d+)_(.+)$", platform_tag)
+	candidate_match = re.match(r"^macosx_(\d+)_(\d+)_(.+)$", candidate)
+	if match is None or candidate_match is None:
+		return False
+	arch = match.group(3)
+	if arch == "universal2":
+		arch = platform.machine()
+	if candidate_match.group(3) not in macos_archs.get(arch, (arch,)):
+		return False
+	release = platform.mac_ver()[0] or "%s.%s" % (match.group(1), match.group(2))
+	os_version = tuple(int(part) for part in (release.split(".") + ["0"])[:2])
+	return (int(candidate_match.group(1)), int(candidate_match.group(2))) <= os_version
+
+
+
+def _libc_version():
+
+	try:
+		libc, version = os.confstr("CS_GNU_LIBC_VERSION").split()
+	except (AttributeError, OSError, ValueError):
+		libc, version = platform.libc_ver()
+	match = re.match(r"^(\d+)\.(\d+)", version or "")
+	return libc, (int(match.group(1)), int(match.group(2))) if match else None
+
+
+
+"""
+Function: 		touch
+
+Description:	Marks the cached wheels of some projects as used, for LRU pruning.
+
+Arguments:		cache_dir 	- wheel cache folder
+				tag 		- interpreter/platform tag
+				projects 	- list of project names
+
+Return:			None
+"""
+def touch(cache_dir, tag, projects):
+
+	wanted = set(inventory.normalize_name(project) for project in projects)
+	index = _load_index(cache_dir, tag)
+	now = time.time()
+	for filename, entry in index.items():
+		if inventory.normalize_name(filename.split("-")[0]) in wanted:
+			entry["last_used"] = now
+	_save_index(cache_dir, tag, index)
+
+
+
+"""
+Function: 		prune
+
+Description:	Removes the least recently used wheels until the cache fits in max_bytes,
+				then deletes blobs no tag refers to.
+
+Arguments:		cache_dir 	- wheel cache folder
+				max_bytes 	- size limit of the blob store
+
+Return:			result 		- number of wheels removed
+"""
+def prune(cache_dir, max_bytes):
+
+	tags_root = os.path.join(cache_dir, "tags")
+	blob_dir = os.path.join(cache_dir, "blobs")
+	if not os.path.isdir(tags_root) or not os.path.isdir(blob_dir):
+		return 0
+
+	indexes = dict((tag, _load_index(cache_dir, tag)) for tag in os.listdir(tags_root)
+					if os.path.isdir(os.path.join(tags_root, tag)))
+	entries = sorted((entry["last_used"], tag, filename, entry["sha256"])
+					for tag, index in indexes.items() for filename, entry in index.items())
+
+	blob_sizes = {}
+	for name in os.listdir(blob_dir):
+		blob_sizes[name[:-len(".whl")]] = os.path.getsize(os.path.join(blob_dir, name))
+	total = sum(blob_sizes.values())
+
+	# Users of each blob, a blob's space is only freed once its last user is removed
+	users = {}
+	for last_used, tag, filename, digest in entries:
+		users[digest] = users.get(digest, 0) + 1
+
+	removed = 0
+	for last_used, tag, filename, digest in entries:
+		if total <= max_bytes:
+			break
+		_remove(os.path.join(tags_root, tag, filename))
+		del indexes[tag][filename]
+		removed += 1
+		users[digest] -= 1
+		if users[digest] == 0:
+			total -= blob_sizes.get(digest, 0)
+
+	for tag, index in indexes.items():
+		_save_index(cache_dir, tag, index)
+
+	# Delete blobs no longer referenced by any tag
+	referenced = set(entry["sha256"] for index in indexes.values() for entry in index.values())
+	for digest in blob_sizes:
+		if digest not in referenced:
+			_remove(os.path.join(blob_dir, digest + ".whl"))
+
+	return removed
+
+
+
+"""
+Function: 		build_wheels
+
+Description:	Builds (or downloads) wheels for some requirements with 'pip wheel'
+				and adds them to the cache.
+
+Arguments:		cache_dir 		- wheel cache folder
+				tag 			- interpreter/platform tag of the pip environment
+				pip_str 		- pip executable name or path
+				requirements 	- list of requirement strings, i.e. 'lxml>=4'
+				pip_opts 		- extra pip options, i.e. the package source
+				run 			- function running a command string, returning True on success
+
+Return:			result 			- list of wheel file names added
+"""
+def build_wheels(cache_dir, tag, pip_str, requirements, pip_opts, run):
+
+	staging = tempfile.mkdtemp(prefix="checkdevnet-wheels-")
+	try:
+		run('%s wheel%s --find-links "%s" --wheel-dir "%s" %s' % (pip_str, pip_opts, tag_dir(cache_dir, tag), staging, " ".join('"%s"' % requirement for requirement in requirements)))
+		wheels = [os.path.join(staging, filename) for filename in os.listdir(staging) if filename.endswith(".whl")]
+		return ingest(cache_dir, tag, wheels)
+	finally:
+		shutil.rmtree(staging, True)
+
+
+
+def _index_path(cache_dir, tag):
+
+	return os.path.join(cache_dir, "tags", tag + ".json")
+
+
+
+def _load_index(cache_dir, tag):
+
+	try:
+		with open(_index_path(cache_dir, tag)) as index_file:
+			return json.load(index_file)
+	except (IOError, OSError, ValueError):
+		return {}
+
+
+
+def _save_index(cache_dir, tag, index):
+
+	path = _index_path(cache_dir, tag)
+	staging = path + ".tmp%d" % os.getpid()
+	with open(staging, "w") as index_file:
+		json.dump(index, index_file, indent=1, sort_keys=True)
+	if os.name == "nt" and os.path.exists(path):
+		os.remove(path)
+	os.rename(staging, path)
+
+
+
+def _file_sha256(path):
+
+	sha256 = hashlib.sha256()
+	with open(path, "rb") as wheel_file:
+		for block in iter(lambda: wheel_file.read(1024 * 1024), b""):
+			sha256.update(block)
+	return sha256.hexdigest()
+
+
+
+def _link_or_copy(source, destination):
+
+	try:
+		os.link(source, destination)
+	except (OSError, AttributeError):
+		shutil.copyfile(source, destination)
+
+
+
+def _remove(path):
+
+	try:
+		os.remove(path)
+	except OSError:
+		pass
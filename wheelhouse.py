@@ -0,0 +1,400 @@
+#####################################################################
+#																	#
+#	Module: 		wheelhouse.py			 						#
+#	Author: 		Joshua Matthews 2017							#
+#	Company: 		Cisco Systems									#
+#	Description:	Local package wheelhouse and PEP 503 simple 	#
+#					index server for a room of workstations			#
+#					(Python 3)										#
+#																	#
+#####################################################################
+
+#####################################################################
+#						Dependancy Imports							#
+#####################################################################
+
+# Used for serving the index over HTTP
+import http.server
+import socketserver
+import html
+import urllib.parse
+
+# Used for reading the wheelhouse folder
+import os
+import re
+import hashlib
+import threading
+
+# Used for downloading packages
+import sys
+import argparse
+import shell
+
+# Used for normalising package names
+import inventory
+
+# Used for listing the wheelhouse folder
+import fsprobe
+
+#####################################################################
+#						Environment Settings						#
+#####################################################################
+
+# Defaults for the wheelhouse subcommand
+DEFAULT_DIR = "wheelhouse"
+DEFAULT_PORT = 8080
+DEFAULT_BIND = "0.0.0.0"
+
+# Packaging tools installed by the check before the requirements, always downloaded
+bootstrap_packages = ["pip", "setuptools", "wheel", "virtualenv"]
+
+# Package file types served from the wheelhouse
+package_exts = (".whl", ".tar.gz", ".zip", ".tar.bz2")
+
+# Block size used when hashing package files
+HASH_BLOCK = 1024 * 1024
+
+#####################################################################
+#						Function Definitions						#
+#####################################################################
+
+"""
+Function: 		fill_wheelhouse
+
+Description:	Downloads every package in a requirements file, and their dependencies,
+				into the wheelhouse folder with 'pip download'. The packaging tools in
+				bootstrap_packages are added, so pip and virtualenv install from the room too.
+				Binary wheels for other platforms (e.g. attendee laptops running another OS)
+				can be added with platform tags.
+
+Arguments:		directory 		- wheelhouse folder
+				requirements 	- requirements file path
+				platforms 		- list of extra platform tags, e.g. win_amd64
+				python_version 	- Python version for the extra platform wheels, e.g. 36
+
+Return:			result 			- Boolean of whether every download succeeded
+"""
+def fill_wheelhouse(directory, requirements, platforms=(), python_version=None):
+
+	if not os.path.isdir(directory):
+		os.makedirs(directory)
+
+	pip_cmd = '"%s" -m pip download --dest "%s" --requirement "%s" %s' % (sys.executable, directory, requirements, " ".join(bootstrap_packages))
+	cmds = [pip_cmd]
+	for platform_tag in platforms:
+		platform_cmd = pip_cmd + " --only-binary=:all: --platform %s" % platform_tag
+		if python_version:
+			platform_cmd += " --python-version %s" % python_version
+		cmds.append(platform_cmd)
+
+	success = True
+	for cmd in cmds:
+		print(u"\t%s" % cmd)
+		status = shell.stream_cmd(cmd, _print_line)
+		if status.returncode != 0:
+			success = False
+			for line in status.tail:
+				print(u"\t\t%s" % line.rstrip("\n"))
+
+	return success
+
+
+
+"""
+Function: 		project_name
+
+Description:	Works out the normalised project name of a wheel or sdist file name.
+
+Arguments:		filename 	- package file name
+
+Return:			result 		- normalised project name, or None if not a package file
+"""
+def project_name(filename):
+
+	if filename.endswith(".whl"):
+		return inventory.normalize_name(filename.split("-")[0])
+
+	for ext in package_exts:
+		if filename.endswith(ext):
+			name, sep, version = filename[:-len(ext)].rpartition("-")
+			if sep:
+				return inventory.normalize_name(name)
+
+	return None
+
+
+
+"""
+Function: 		build_index
+
+Description:	Groups the package files in the wheelhouse folder by project.
+
+Arguments:		directory 	- wheelhouse folder
+
+Return:			result 		- dictionary of normalised project name to sorted file names
+"""
+def build_index(directory):
+
+	projects = {}
+	for filename, entry in sorted(fsprobe.list_dir(directory).items()):
+		name = project_name(filename)
+		if name and entry.is_file:
+			projects.setdefault(name, []).append(filename)
+
+	return projects
+
+
+
+"""
+Function: 		serve
+
+Description:	Serves the wheelhouse folder as a PEP 503 simple index until interrupted.
+				Each request is handled on its own thread. Package files are sent with
+				sendfile and honour single byte-range requests.
+				Workstations use it with 'pip install --index-url http://<host>:<port>/simple/'.
+
+Arguments:		directory 	- wheelhouse folder
+				bind 		- address to listen on
+				port 		- TCP port to listen on
+
+Return:			None
+"""
+def serve(directory, bind=DEFAULT_BIND, port=DEFAULT_PORT):
+
+	server = make_server(directory, bind, port)
+	print(u"\tServing %s at http://%s:%d/simple/ (Ctrl-C to stop)" % (directory, bind, server.server_address[1]))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+
+
+"""
+Function: 		make_server
+
+Description:	Creates, but does not start, the wheelhouse index server.
+
+Arguments:		directory 	- wheelhouse folder
+				bind 		- address to listen on
+				port 		- TCP port to listen on, 0 picks a free port
+
+Return:			server 		- threading HTTP server
+"""
+def make_server(directory, bind=DEFAULT_BIND, port=DEFAULT_PORT):
+
+	class Handler(WheelhouseHandler):
+		pass
+
+	Handler.directory = os.path.abspath(directory)
+	Handler.hashes = {}
+	Handler.hashes_lock = threading.Lock()
+	return WheelhouseServer((bind, port), Handler)
+
+
+
+"""
+Class: 			WheelhouseServer
+
+Description:	HTTP server handling each connection on its own thread.
+"""
+class WheelhouseServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	daemon_threads = True
+	allow_reuse_address = True
+	request_queue_size = 128
+
+
+
+"""
+Class: 			WheelhouseHandler
+
+Description:	Request handler for the simple index pages and package files.
+				make_server subclasses it with the wheelhouse folder to serve.
+"""
+class WheelhouseHandler(http.server.BaseHTTPRequestHandler):
+
+	# HTTP/1.1 keeps connections open between pip requests
+	protocol_version = "HTTP/1.1"
+	directory = None
+	hashes = None
+	hashes_lock = None
+
+	def do_GET(self):
+		self._handle(send_body=True)
+
+	def do_HEAD(self):
+		self._handle(send_body=False)
+
+	def log_message(self, format, *args):
+		if shell.verbose_logging:
+			http.server.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+	def _handle(self, send_body):
+
+		path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+		parts = [part for part in path.split("/") if part]
+
+		if parts == ["simple"]:
+			if not path.endswith("/"):
+				return self._redirect(path + "/")
+			return self._send_html(self._root_page(), send_body)
+
+		if len(parts) == 2 and parts[0] == "simple":
+			name = inventory.normalize_name(parts[1])
+			if name != parts[1] or not path.endswith("/"):
+				return self._redirect("/simple/%s/" % name)
+			files = build_index(self.directory).get(name)
+			if not files:
+				return self.send_error(404, "Project not found")
+			return self._send_html(self._project_page(name, files), send_body)
+
+		if len(parts) == 2 and parts[0] == "packages":
+			return self._send_package(parts[1], send_body)
+
+		self.send_error(404, "Not found")
+
+	def _root_page(self):
+
+		links = ['<a href="/simple/%s/">%s</a><br/>' % (name, name) for name in sorted(build_index(self.directory))]
+		return "<!DOCTYPE html>\n<html><head><title>Simple index</title></head><body>\n%s\n</body></html>\n" % "\n".join(links)
+
+	def _project_page(self, name, files):
+
+		links = []
+		for filename in files:
+			digest = self._file_hash(filename)
+			links.append('<a href="/packages/%s#sha256=%s">%s</a><br/>' % (urllib.parse.quote(filename), digest, html.escape(filename)))
+		return "<!DOCTYPE html>\n<html><head><title>Links for %s</title></head><body>\n<h1>Links for %s</h1>\n%s\n</body></html>\n" % (name, name, "\n".join(links))
+
+	def _file_hash(self, filename):
+
+		# Hashes are cached until the file changes
+		path = os.path.join(self.directory, filename)
+		stat = os.stat(path)
+		key = (filename, stat.st_size, stat.st_mtime)
+		with self.hashes_lock:
+			digest = self.hashes.get(key)
+		if digest is None:
+			sha256 = hashlib.sha256()
+			with open(path, "rb") as package_file:
+				for block in iter(lambda: package_file.read(HASH_BLOCK), b""):
+					sha256.update(block)
+			digest = sha256.hexdigest()
+			with self.hashes_lock:
+				self.hashes[key] = digest
+		return digest
+
+	def _send_html(self, page, send_body):
+
+		body = page.encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		if send_body:
+			self.wfile.write(body)
+
+	def _redirect(self, location):
+
+		self.send_response(301)
+		self.send_header("Location", location)
+		self.send_header("Content-Length", "0")
+		self.end_headers()
+
+	def _send_package(self, filename, send_body):
+
+		if os.path.basename(filename) != filename or project_name(filename) is None:
+			return self.send_error(404, "Not found")
+		path = os.path.join(self.directory, filename)
+		if not os.path.isfile(path):
+			return self.send_error(404, "Not found")
+
+		size = os.path.getsize(path)
+		start, end = 0, size - 1
+		status = 200
+
+		# Single byte range, used by pip to resume interrupted downloads
+		byte_range = self.headers.get("Range")
+		if byte_range:
+			match = re.match(r"^bytes=(\d*)-(\d*)$", byte_range.strip())
+			if match and (match.group(1) or match.group(2)):
+				if match.group(1):
+					start = int(match.group(1))
+					if match.group(2):
+						end = min(int(match.group(2)), size - 1)
+				else:
+					start = max(0, size - int(match.group(2)))
+				if start > end:
+					self.send_response(416)
+					self.send_header("Content-Range", "bytes */%d" % size)
+					self.send_header("Content-Length", "0")
+					self.end_headers()
+					return
+				status = 206
+
+		length = end - start + 1
+		self.send_response(status)
+		self.send_header("Content-Type", "application/octet-stream")
+		self.send_header("Accept-Ranges", "bytes")
+		self.send_header("Content-Length", str(length))
+		if status == 206:
+			self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, size))
+		self.end_headers()
+
+		if send_body and length > 0:
+			with open(path, "rb") as package_file:
+				self.wfile.flush()
+				self.connection.sendfile(package_file, start, length)
+
+
+
+def _print_line(stream, line):
+
+	if shell.verbose_logging:
+		print(line.rstrip("\n"))
+
+
+
+"""
+Function: 		main
+
+Description:	Entry point for 'checkDevNet.py wheelhouse'.
+				Fills the wheelhouse from the requirements file, then serves it.
+
+Arguments:		argv 	- command line arguments after 'wheelhouse'
+
+Return:			result 	- process exit code
+"""
+def main(argv):
+
+	parser = argparse.ArgumentParser(prog="checkDevNet.py wheelhouse",
+									description="Download the packages in a requirements file once and serve them to the room as a PEP 503 index")
+	parser.add_argument("-d", "--dir", default=DEFAULT_DIR, help="wheelhouse folder (default: %(default)s)")
+	parser.add_argument("-r", "--requirements", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt"),
+						help="requirements file to download (default: %(default)s)")
+	parser.add_argument("--platform", action="append", default=[], metavar="TAG",
+						help="also download binary wheels for this platform tag, e.g. win_amd64 or macosx_10_9_x86_64 (repeatable)")
+	parser.add_argument("--python-version", metavar="VERSION", help="Python version for --platform wheels, e.g. 36")
+	parser.add_argument("--bind", default=DEFAULT_BIND, help="address to serve on (default: %(default)s)")
+	parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to serve on (default: %(default)s)")
+	parser.add_argument("--no-download", action="store_true", help="serve the folder as it is")
+	parser.add_argument("--no-serve", action="store_true", help="only fill the folder")
+	parser.add_argument("-v", dest="verbose", action="store_true", help="print pip and request output")
+	args = parser.parse_args(argv)
+
+	shell.verbose_logging = args.verbose
+
+	if not args.no_download:
+		print(u"\nFilling wheelhouse %s from %s...\n" % (args.dir, args.requirements))
+		if not fill_wheelhouse(args.dir, args.requirements, args.platform, args.python_version):
+			print(u"\tSome packages could not be downloaded")
+			return 1
+
+	if not args.no_serve:
+		print(u"\nServing wheelhouse...\n")
+		serve(args.dir, args.bind, args.port)
+
+	return 0